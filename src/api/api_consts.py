@@ -1,3 +1,7 @@
 ERROR_MESSAGE = 'The new password cannot be the same as the current password.'
 VALIDATION_MESSAGE = '''Password must contain only Latin characters, symbols
 and numbers'''
+
+# Bumped when the representation of the disputes changes, so neither
+# the cache nor the clients keep the responses of the previous release.
+REPRESENTATION_VERSION = 3
@@ -0,0 +1,249 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+)
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.authentication import CachedTokenAuthentication, get_token_key
+from api.context import aload_dispute_context
+from api.events import get_last_event_id, wait_for_events
+from api.filters import DisputeFilterBackend, filter_comments_since, parse_id
+from api.pagination import CommentPagination, DisputePagination
+from api.serializers import (
+    CommentSerializer,
+    DisputeListSerializer,
+    DisputeSerializer,
+)
+from api.views import (
+    COMMENT_STATUS_ERRORS,
+    get_comment_queryset,
+    get_dispute_blocks,
+    get_dispute_prefetches,
+    get_sparse_context,
+)
+from disputes.models import Dispute
+
+PARSERS = (JSONParser(), MultiPartParser(), FormParser())
+
+LONG_POLL_MAX_TIMEOUT = 20
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    """Render the data like the JSON renderer of the API."""
+    return JsonResponse(
+        data,
+        status=status_code,
+        safe=False,
+        encoder=JSONEncoder,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def error_response(exc):
+    """Render an API exception like the exception handler of the API."""
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    response = json_response(data, exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = CachedTokenAuthentication.keyword
+    return response
+
+
+def async_api_view(*methods):
+    """
+    Turn a coroutine into an API view authenticated by token.
+
+    The view receives a DRF Request carrying the user, so the
+    filters, paginators and serializers of the API work unchanged.
+    API exceptions and Http404 are rendered as JSON errors.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise MethodNotAllowed(request.method)
+                key = get_token_key(request.headers.get('Authorization', ''))
+                if not key:
+                    raise NotAuthenticated()
+                user, _ = await CachedTokenAuthentication(
+                ).aauthenticate_credentials(key)
+                drf_request = Request(request, parsers=PARSERS)
+                drf_request.user = user
+                return await view(drf_request, *args, **kwargs)
+            except Http404:
+                return error_response(NotFound())
+            except APIException as exc:
+                return error_response(exc)
+
+        # csrf_exempt() of Django 4.1 would hide that the view is async.
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def serialize(serializer):
+    """
+    Return the data of the serializer rendered in a worker thread.
+
+    The user cards missing in the cache are loaded from the database
+    while rendering, which cannot run in the event loop.
+    """
+    return await sync_to_async(lambda: serializer.data)()
+
+
+def get_dispute_queryset(request, detail):
+    """Return the visible disputes with the blocks of the response."""
+    blocks = get_dispute_blocks(request.query_params, detail=detail)
+    return Dispute.objects.visible_to(request.user).prefetch_related(
+        *get_dispute_prefetches(blocks)
+    )
+
+
+def get_serializer_context(request):
+    """Return the context the serializers get from the viewsets."""
+    return {'request': request, **get_sparse_context(request.query_params)}
+
+
+@async_api_view('GET', 'POST')
+async def dispute_list(request):
+    """Async version of the list and the creation of disputes."""
+    if request.method == 'POST':
+        return await create_dispute(request)
+    queryset = DisputeFilterBackend().filter_queryset(
+        request, get_dispute_queryset(request, detail=False), None
+    )
+    paginator = DisputePagination()
+    page = await sync_to_async(paginator.paginate_queryset)(
+        queryset, request
+    )
+    serializer = DisputeListSerializer(
+        page, many=True, context=get_serializer_context(request)
+    )
+    return json_response(paginator.get_paginated_response(
+        await serialize(serializer)
+    ).data)
+
+
+@async_api_view('GET')
+async def dispute_detail(request, pk):
+    """Async version of the dispute detail."""
+    try:
+        dispute = await get_dispute_queryset(request, detail=True).aget(pk=pk)
+    except Dispute.DoesNotExist:
+        raise NotFound()
+    serializer = DisputeSerializer(
+        dispute, context=get_serializer_context(request)
+    )
+    return json_response(await serialize(serializer))
+
+
+async def create_dispute(request):
+    """Create a dispute like DisputeViewSet.create()."""
+    if request.user.is_mediator:
+        return json_response(
+            {'opponent': ['Mediator cannot create disputes.']},
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def save():
+        serializer = DisputeSerializer(data=request.data, context={
+            'creator_id': request.user.id,
+            'uploader_id': request.user.id,
+        })
+        if not serializer.is_valid():
+            return serializer.errors, status.HTTP_400_BAD_REQUEST
+        serializer.save(creator=request.user)
+        return serializer.data, status.HTTP_201_CREATED
+
+    # Parsing the upload and saving the files block, so they run
+    # in a worker thread while the loop serves other requests.
+    return json_response(*await sync_to_async(save)())
+
+
+@async_api_view('GET', 'POST')
+async def comment_list(request, dispute_id):
+    """Async version of the list and the creation of comments."""
+    context = await aload_dispute_context(request.user, dispute_id)
+    if not context.can_comment:
+        raise PermissionDenied()
+    if request.method == 'POST':
+        return await create_comment(request, context.dispute)
+
+    queryset = get_comment_queryset().filter(dispute=context.dispute)
+    since = request.query_params.get('since')
+    if since:
+        queryset = filter_comments_since(queryset, since)
+    paginator = CommentPagination()
+    page = await sync_to_async(paginator.paginate_queryset)(
+        queryset, request
+    )
+    serializer = CommentSerializer(
+        page, many=True, context={'request': request}
+    )
+    return json_response(paginator.get_paginated_response(
+        await serialize(serializer)
+    ).data)
+
+
+async def create_comment(request, dispute):
+    """Create a comment like CommentViewSet.create()."""
+    if dispute.status in COMMENT_STATUS_ERRORS:
+        return json_response(
+            {'detail': COMMENT_STATUS_ERRORS[dispute.status]},
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def save():
+        serializer = CommentSerializer(
+            data=request.data, context={'uploader_id': request.user.id}
+        )
+        if not serializer.is_valid():
+            return serializer.errors, status.HTTP_400_BAD_REQUEST
+        serializer.save(sender=request.user, dispute=dispute)
+        return serializer.data, status.HTTP_201_CREATED
+
+    return json_response(*await sync_to_async(save)())
+
+
+@async_api_view('GET')
+async def dispute_events(request, dispute_id):
+    """
+    Long-poll fallback of the dispute event stream.
+
+    Answers as soon as there are events after the 'after' id, or
+    with an empty list after 'timeout' seconds. The client sends the
+    returned 'last_event_id' as 'after' of the next request. The
+    request waits in the event loop, so it is served by the ASGI
+    application only.
+    """
+    context = await aload_dispute_context(request.user, dispute_id)
+    if not context.can_comment:
+        raise PermissionDenied()
+    after = request.query_params.get('after')
+    if after is None:
+        after = await sync_to_async(get_last_event_id)(dispute_id)
+    else:
+        after = parse_id(after, 'after')
+    timeout = request.query_params.get('timeout', '')
+    timeout = min(
+        int(timeout) if timeout.isdigit() else LONG_POLL_MAX_TIMEOUT,
+        LONG_POLL_MAX_TIMEOUT,
+    )
+    events = await wait_for_events(dispute_id, after, timeout)
+    return json_response({
+        'events': events,
+        'last_event_id': events[-1]['id'] if events else after,
+    })
@@ -0,0 +1,124 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from users.models import AuthToken, CustomUser
+
+# The fields of the token and its user kept in the cache. The password
+# hash stays in the database, the fields left out are deferred.
+TOKEN_FIELDS = ('key', 'user_id', 'expires_at')
+TOKEN_USER_FIELDS = tuple(
+    field.attname for field in CustomUser._meta.concrete_fields
+    if field.attname != 'password'
+)
+
+
+def get_token_cache_key(key):
+    """Return the cache key of a token without exposing the token."""
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'auth:token:{digest}'
+
+
+def forget_tokens(keys):
+    """Drop the cached users of the given tokens."""
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+def dump_token(token):
+    """Return the cached fields of the token and its user."""
+    return (
+        tuple(getattr(token, name) for name in TOKEN_FIELDS),
+        tuple(getattr(token.user, name) for name in TOKEN_USER_FIELDS),
+    )
+
+
+def load_token(data):
+    """Rebuild the token and its user from the cached fields."""
+    token_values, user_values = data
+    token = AuthToken.from_db(DEFAULT_DB_ALIAS, TOKEN_FIELDS, token_values)
+    token.user = CustomUser.from_db(
+        DEFAULT_DB_ALIAS, TOKEN_USER_FIELDS, user_values
+    )
+    return token
+
+
+def get_token_key(authorization):
+    """Return the key of an 'Authorization: Token <key>' header or ''."""
+    keyword, _, key = authorization.partition(' ')
+    if keyword != CachedTokenAuthentication.keyword:
+        return ''
+    return key.strip()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication keeping the resolved tokens in the cache.
+
+    A token is looked up together with its user once per
+    TOKEN_CACHE_TIMEOUT seconds instead of on every request. Only the
+    fields needed to authorize the request are cached, not the
+    password hash. The cached entry is dropped once a logout or
+    a change of the user is committed (see api.signals), so a new
+    password, role or deactivation applies at once.
+    """
+
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        """Return the user and the token, from the cache if possible."""
+        cache_key = get_token_cache_key(key)
+        data = cache.get(cache_key)
+        if data is not None:
+            return self.check_token(load_token(data))
+        try:
+            token = self.get_queryset().get(key=key)
+        except self.get_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        cache.set(cache_key, dump_token(token), self.get_cache_timeout(token))
+        return self.check_token(token)
+
+    async def aauthenticate_credentials(self, key):
+        """Async version of authenticate_credentials()."""
+        cache_key = get_token_cache_key(key)
+        data = await cache.aget(cache_key)
+        if data is not None:
+            return self.check_token(load_token(data))
+        try:
+            token = await self.get_queryset().aget(key=key)
+        except self.get_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        await cache.aset(
+            cache_key, dump_token(token), self.get_cache_timeout(token)
+        )
+        return self.check_token(token)
+
+    def get_queryset(self):
+        """Return the tokens with the cached fields of their users."""
+        return self.get_model().objects.select_related('user').only(
+            *TOKEN_FIELDS,
+            *(f'user__{name}' for name in TOKEN_USER_FIELDS),
+        )
+
+    def check_token(self, token):
+        """Return the user and the token if both are still valid."""
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        if token.is_expired:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        return (token.user, token)
+
+    def get_cache_timeout(self, token):
+        """Return the timeout not keeping the token past its expiry."""
+        timeout = settings.TOKEN_CACHE_TIMEOUT
+        if token.expires_at is not None:
+            remaining = (token.expires_at - timezone.now()).total_seconds()
+            timeout = max(0, min(timeout, int(remaining)))
+        return timeout
@@ -0,0 +1,192 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.api_consts import REPRESENTATION_VERSION
+from disputes.models import Comment, DisputeParticipant
+from users.versions import get_user_versions
+
+
+def get_fragment_variant(serializer_class, context):
+    """
+    Return the part of the fragment keys describing the representation.
+
+    The same dispute is rendered differently depending on the
+    serializer, the sparse fieldset, the expanded blocks and the host
+    the absolute file URLs are built for.
+    """
+    request = context['request']
+    variant = (
+        REPRESENTATION_VERSION,
+        serializer_class.__name__,
+        sorted(context.get('fields') or ()),
+        sorted(context.get('expand') or ()),
+        request.build_absolute_uri('/'),
+    )
+    return hashlib.md5(repr(variant).encode()).hexdigest()
+
+
+def get_fragment_key(variant, dispute_id, updated_at, user_versions):
+    """
+    Return the cache key of a serialized dispute.
+
+    user_versions are the (id, version) pairs of the users shown by
+    the dispute, so only a change of one of them replaces the key.
+    """
+    users = hashlib.md5(repr(user_versions).encode()).hexdigest()
+    return (
+        f'dispute:fragment:{variant}:{dispute_id}:'
+        f'{updated_at.timestamp()}:{users}'
+    )
+
+
+def get_dispute_fragments(rows, users, variant, build):
+    """
+    Return the serialized disputes of the rows in the order of the rows.
+
+    The rows are (id, updated_at) pairs of the disputes and users is
+    what get_dispute_users() returned for them. The representation of
+    a dispute does not depend on who requests it, so the fragments are
+    shared between all users and are looked up with one get_many().
+    'updated_at' is touched by the signals of the disputes app on
+    every change of the dispute, its comments, files and opponents,
+    and the version of a user on every change of the user, so a
+    changed dispute simply gets a new key. The entries embed user
+    cards and expire like them after USERS_CACHE_TIMEOUT seconds.
+
+    build(ids) is called once with the ids of the missing disputes
+    and returns (dispute, data) pairs. A dispute changed after the
+    rows were read may show other users, so it is returned but not
+    stored.
+    """
+    dispute_users, versions = users
+    keys = {
+        dispute_id: get_fragment_key(
+            variant, dispute_id, updated_at, [
+                (user_id, versions[user_id])
+                for user_id in dispute_users[dispute_id]
+            ]
+        )
+        for dispute_id, updated_at in rows
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {
+        dispute_id: cached[key]
+        for dispute_id, key in keys.items() if key in cached
+    }
+    missing = [
+        dispute_id for dispute_id in keys if dispute_id not in fragments
+    ]
+    if missing:
+        built = {}
+        updated = dict(rows)
+        for dispute, data in build(missing):
+            fragments[dispute.pk] = data
+            if dispute.updated_at == updated[dispute.pk]:
+                built[keys[dispute.pk]] = data
+        cache.set_many(built, settings.USERS_CACHE_TIMEOUT)
+    # Disputes deleted after the rows were read are left out.
+    return [
+        fragments[dispute_id] for dispute_id, _ in rows
+        if dispute_id in fragments
+    ]
+
+
+def get_dispute_users_key(dispute_id, updated_at):
+    """Return the cache key of the users shown by a dispute."""
+    return f'dispute:users:{dispute_id}:{updated_at.timestamp()}'
+
+
+def get_dispute_user_ids(rows):
+    """
+    Return the ids of the users shown by the disputes of the rows.
+
+    The rows are (id, updated_at) pairs of the disputes. The creator,
+    the opponents and the senders of the comments of a dispute only
+    change along with its 'updated_at', so they are cached under it,
+    and the missing disputes are read with one query.
+    """
+    keys = {
+        dispute_id: get_dispute_users_key(dispute_id, updated_at)
+        for dispute_id, updated_at in rows
+    }
+    cached = cache.get_many(keys.values())
+    user_ids = {
+        dispute_id: cached[key]
+        for dispute_id, key in keys.items() if key in cached
+    }
+    missing = [
+        dispute_id for dispute_id in keys if dispute_id not in user_ids
+    ]
+    if missing:
+        loaded = {dispute_id: set() for dispute_id in missing}
+        participants = DisputeParticipant.objects.filter(
+            dispute_id__in=missing
+        ).order_by().values_list('dispute_id', 'user_id')
+        senders = Comment.objects.filter(
+            dispute_id__in=missing
+        ).order_by().values_list('dispute_id', 'sender_id')
+        for dispute_id, user_id in participants.union(senders):
+            loaded[dispute_id].add(user_id)
+        loaded = {
+            dispute_id: sorted(ids) for dispute_id, ids in loaded.items()
+        }
+        user_ids.update(loaded)
+        cache.set_many(
+            {keys[dispute_id]: ids for dispute_id, ids in loaded.items()},
+            settings.USERS_CACHE_TIMEOUT,
+        )
+    return user_ids
+
+
+def get_dispute_users(rows):
+    """
+    Return the users shown by the disputes of the rows.
+
+    Returns the ids of the users by dispute id and the versions of
+    all of them by user id.
+    """
+    dispute_users = get_dispute_user_ids(rows)
+    user_ids = set()
+    for ids in dispute_users.values():
+        user_ids.update(ids)
+    return dispute_users, get_user_versions(user_ids)
+
+
+def get_user_card_key(user_id, version):
+    """Return the cache key of a serialized user."""
+    return f'user:card:{user_id}:{version}'
+
+
+def get_user_cards(user_ids, build):
+    """
+    Return the serialized users of the ids as a dict by id.
+
+    The cards are shared between all responses and are looked up
+    with one get_many(). They are keyed by the versions of their
+    users, so a change of a user only replaces the card of that user.
+    The versions are bumped once the change is committed, but a card
+    may still be built from a replica lagging behind, so the cards
+    expire after USERS_CACHE_TIMEOUT seconds. build(ids) is called
+    once with the ids missing in the cache and returns (user, data)
+    pairs.
+    """
+    versions = get_user_versions(user_ids)
+    keys = {
+        user_id: get_user_card_key(user_id, version)
+        for user_id, version in versions.items()
+    }
+    cached = cache.get_many(keys.values())
+    cards = {
+        user_id: cached[key]
+        for user_id, key in keys.items() if key in cached
+    }
+    missing = [user_id for user_id in keys if user_id not in cards]
+    if missing:
+        built = {}
+        for user, data in build(missing):
+            cards[user.pk] = data
+            built[keys[user.pk]] = data
+        cache.set_many(built, settings.USERS_CACHE_TIMEOUT)
+    return cards
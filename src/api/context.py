@@ -0,0 +1,80 @@
+from django.db.models import OuterRef, Subquery
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from disputes.models import Dispute, DisputeParticipant
+
+
+class DisputeContext:
+    """
+    Dispute addressed by the request and the role of the caller in it.
+
+    Attributes:
+        dispute: The Dispute instance with its creator loaded.
+        user: The user who sent the request.
+        role: The role of the user among the visible participants
+        of the dispute, or None if the user is not one of them.
+    """
+
+    def __init__(self, dispute, user, role):
+        """Initialize the DisputeContext."""
+        self.dispute = dispute
+        self.user = user
+        self.role = role
+
+    @property
+    def is_participant(self):
+        """Check whether the user is a visible participant."""
+        return self.role is not None
+
+    @property
+    def can_comment(self):
+        """Check whether the user may read and write comments."""
+        return self.is_participant or self.user.is_mediator
+
+
+def get_context_queryset(user):
+    """Return the disputes annotated with the role of the user."""
+    role = DisputeParticipant.objects.filter(
+        dispute=OuterRef('pk'),
+        user=user,
+        is_visible=True,
+    ).values('role')[:1]
+    return Dispute.objects.select_related('creator').annotate(
+        participant_role=Subquery(role)
+    )
+
+
+def load_dispute_context(user, dispute_id):
+    """
+    Load the dispute, its creator and the role of the user in one query.
+
+    Raises Http404 if the dispute does not exist.
+    """
+    dispute = get_object_or_404(get_context_queryset(user), id=dispute_id)
+    return DisputeContext(dispute, user, dispute.participant_role)
+
+
+async def aload_dispute_context(user, dispute_id):
+    """Async version of load_dispute_context()."""
+    try:
+        dispute = await get_context_queryset(user).aget(id=dispute_id)
+    except Dispute.DoesNotExist:
+        raise Http404('No Dispute matches the given query.')
+    return DisputeContext(dispute, user, dispute.participant_role)
+
+
+def get_dispute_context(request, dispute_id):
+    """
+    Return the dispute context of the request.
+
+    The context is loaded once and stored on the request, so the
+    permission classes and the view share the same lookup.
+    """
+    contexts = getattr(request, '_dispute_contexts', None)
+    if contexts is None:
+        contexts = request._dispute_contexts = {}
+    key = str(dispute_id)
+    if key not in contexts:
+        contexts[key] = load_dispute_context(request.user, dispute_id)
+    return contexts[key]
@@ -1,3 +1,5 @@
+import asyncio
+
 from django.http import HttpResponseForbidden
 
 
@@ -13,12 +15,27 @@ class PreventRegistrationMiddleware:
     is not allowed.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         """Initialize the PreventRegistrationMiddleware."""
         self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Let Django call the middleware without a thread switch
+            # under ASGI, the same way MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
 
     def __call__(self, request):
         """Check for registration access and handle the request."""
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
         if request.path.startswith('/auth/register/'):
             return HttpResponseForbidden("Registration is not allowed")
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        """Async version of __call__()."""
+        if request.path.startswith('/auth/register/'):
+            return HttpResponseForbidden("Registration is not allowed")
+        return await self.get_response(request)
@@ -0,0 +1,197 @@
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from disputes.models import get_original_name
+from disputes.previews import (
+    PREVIEW_CONTENT_TYPE,
+    PREVIEW_EXTENSION,
+    get_preview_name,
+    has_failed,
+    schedule_previews,
+)
+from disputes.storage import blob_storage
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Bytes read from the storage and sent at once by the fallback.
+BLOCK_SIZE = 64 * 1024
+
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range starts after the end of the file."""
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) of the single byte range of the Range header.
+
+    Returns None if the header is not a single byte range, so the
+    whole file is sent as allowed by RFC 9110. Raises
+    RangeNotSatisfiable if the range is outside of the file.
+
+    Example:
+    'bytes=100-' of a 1000 bytes file - (100, 999)
+    'bytes=-100' of a 1000 bytes file - (900, 999)
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        if not int(last) or not size:
+            raise RangeNotSatisfiable
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def get_content_disposition(filename):
+    """Return the Content-Disposition showing the file in the browser."""
+    return f"inline; filename*=UTF-8''{quote(filename)}"
+
+
+def read_range(content, start, length):
+    """Yield the bytes of the range and close the file."""
+    with content:
+        content.seek(start)
+        while length:
+            block = content.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def get_accel_response(name):
+    """
+    Hand the transfer of the stored file to nginx.
+
+    nginx serves the internal MEDIA_ACCEL_PREFIX location from
+    MEDIA_ROOT with its own support of ranges and sendfile, so the
+    worker is released as soon as the access was checked.
+    """
+    response = HttpResponse()
+    response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + name)
+    return response
+
+
+def get_file_response(request, storage, name, size, etag):
+    """
+    Send the stored file from the worker, where nginx is not in front.
+
+    Answers a single byte range with 206 Partial Content unless the
+    If-Range header names another version of the file.
+    """
+    size = size or storage.size(name)
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if 'Range' in request.headers and if_range in (None, etag):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    content = storage.open(name, 'rb')
+    if byte_range is None:
+        response = FileResponse(content)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(content, start, end - start + 1), status=206
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_stored_file(request, storage, name, size, content_type,
+                      filename, etag):
+    """
+    Return the response downloading a file of the storage.
+
+    The access has to be checked by the caller. A cached copy with
+    the ETag is confirmed with 304 Not Modified without reading the
+    storage. The file itself is sent by nginx with X-Accel-Redirect
+    if MEDIA_ACCEL_REDIRECT is enabled and by the worker otherwise.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if settings.MEDIA_ACCEL_REDIRECT:
+            response = get_accel_response(name)
+        else:
+            response = get_file_response(request, storage, name, size, etag)
+    if response.status_code in (200, 206):
+        response['Content-Type'] = content_type or DEFAULT_CONTENT_TYPE
+        response['Content-Disposition'] = get_content_disposition(filename)
+    if etag:
+        response['ETag'] = etag
+    # The file of a row may be replaced, so the copy is revalidated.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def serve_file(request, instance):
+    """
+    Return the response downloading the file of a FileDispute/Comment.
+
+    The checksum of the content is the ETag.
+    """
+    return serve_stored_file(
+        request,
+        instance.file.storage,
+        instance.file.name,
+        instance.size,
+        instance.content_type,
+        instance.original_name or get_original_name(instance.file.name),
+        quote_etag(instance.checksum) if instance.checksum else None,
+    )
+
+
+def serve_preview(request, instance, size):
+    """
+    Return the response downloading a preview of the file.
+
+    Returns None if the preview is not rendered yet, and queues its
+    rendering in that case. Raises Http404 if the content could not
+    be rendered.
+    """
+    name = get_preview_name(instance.checksum, size)
+    if not blob_storage.exists(name):
+        if has_failed(instance.checksum):
+            raise Http404('The file has no preview.')
+        schedule_previews([instance])
+        return None
+    stem = os.path.splitext(
+        instance.original_name or get_original_name(instance.file.name)
+    )[0]
+    return serve_stored_file(
+        request,
+        blob_storage,
+        name,
+        None,
+        PREVIEW_CONTENT_TYPE,
+        f'{stem}-{size}.{PREVIEW_EXTENSION}',
+        quote_etag(f'{instance.checksum}-{size}'),
+    )
@@ -0,0 +1,63 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from api.serializers import DisputeEventSerializer
+from disputes.models import DisputeEvent
+
+EVENT_BATCH_SIZE = 100
+
+# Seconds between the checks for new events.
+POLL_INTERVAL = 1
+
+
+def run_in_thread(function, *args):
+    """
+    Run a function using the ORM in a thread of the pool.
+
+    The connections of the thread are closed around the call like
+    around a request, so a thread does not keep them between calls.
+    """
+    def wrapper():
+        close_old_connections()
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=False)()
+
+
+def get_last_event_id(dispute_id):
+    """Return the id of the latest event of the dispute or 0."""
+    return DisputeEvent.objects.filter(
+        dispute_id=dispute_id
+    ).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def fetch_events(dispute_id, after):
+    """Return the serialized events of the dispute after the given id."""
+    events = DisputeEvent.objects.filter(
+        dispute_id=dispute_id, id__gt=after
+    ).order_by('id')[:EVENT_BATCH_SIZE]
+    return DisputeEventSerializer(events, many=True).data
+
+
+async def wait_for_events(dispute_id, after, timeout):
+    """
+    Return the events after the given id as soon as there are any.
+
+    The events are checked every POLL_INTERVAL seconds, an empty list
+    is returned when none appeared within the timeout. The wait does
+    not hold a thread, so it is only served by the ASGI application.
+    The checks run in the thread pool like those of the event stream
+    (see api.streams), not in the single thread shared by the sync
+    code, so the waits of many clients do not queue up behind it.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        events = await run_in_thread(fetch_events, dispute_id, after)
+        if events or loop.time() >= deadline:
+            return events
+        await asyncio.sleep(POLL_INTERVAL)
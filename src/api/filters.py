@@ -0,0 +1,159 @@
+from datetime import datetime, time
+
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from disputes.models import Comment, Dispute, DisputeParticipant
+
+# The largest value of the bigint primary keys.
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_timestamp(value, param):
+    """
+    Parse a date or a datetime from a query parameter.
+
+    Naive values are taken in the current time zone. Raises
+    ValidationError naming the parameter if the value is invalid,
+    including well-formed values such as '2024-02-30'.
+    """
+    try:
+        timestamp = parse_datetime(value)
+        if timestamp is None:
+            date = parse_date(value)
+            if date is not None:
+                timestamp = datetime.combine(date, time.min)
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        raise ValidationError({param: ['Expected a date or a timestamp.']})
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def parse_id(value, param):
+    """
+    Parse a primary key from a query parameter.
+
+    Raises ValidationError naming the parameter unless the value is
+    a decimal number which fits into the bigint primary keys.
+    """
+    if not (value.isascii() and value.isdigit()) or int(value) > MAX_ID:
+        raise ValidationError({param: ['Expected an id.']})
+    return int(value)
+
+
+def filter_comments_since(queryset, since):
+    """
+    Keep only the comments newer than the 'since' cursor.
+
+    The cursor is either the id of an already received comment
+    or a timestamp. Both are turned into a range condition on
+    (created_at, id), so a poll reads only the new comments. Raises
+    ValidationError if the cursor is neither.
+    """
+    if since.isdigit():
+        comment_id = parse_id(since, 'since')
+        anchor = Subquery(
+            queryset.filter(id=comment_id).values('created_at')[:1]
+        )
+        return queryset.filter(
+            Q(created_at__gt=anchor) | Q(created_at=anchor, id__gt=comment_id)
+        )
+
+    created_at = parse_timestamp(since, 'since')
+    return queryset.filter(created_at__gt=created_at)
+
+
+class DisputeFilterBackend(BaseFilterBackend):
+    """
+    Filter the disputes by the query parameters.
+
+    Every filter is answered by an index: the status and the creator
+    by the (status, created_at) and (creator, created_at) indexes,
+    the dates by the created_at and closed_at indexes, the opponent
+    by the participant index and the new comments by the
+    (dispute, created_at) index of the comments.
+    """
+
+    TIMESTAMP_FILTERS = {
+        'created_after': 'created_at__gte',
+        'created_before': 'created_at__lt',
+        'closed_after': 'closed_at__gte',
+        'closed_before': 'closed_at__lt',
+    }
+    PARAMS_DESCRIPTION = {
+        'status': 'Comma-separated statuses of the disputes.',
+        'created_after': 'Disputes created at or after the date.',
+        'created_before': 'Disputes created before the date.',
+        'closed_after': 'Disputes closed at or after the date.',
+        'closed_before': 'Disputes closed before the date.',
+        'creator': 'Id of the creator of the disputes.',
+        'opponent': 'Id of an opponent in the disputes.',
+        'has_new_comments_since': 'Disputes commented after the date.',
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        """Apply the filters present in the query string."""
+        params = request.query_params
+
+        if params.get('status'):
+            statuses = set(params['status'].split(','))
+            allowed = {status for status, _ in Dispute.DISPUTE_STATUS}
+            if not statuses <= allowed:
+                raise ValidationError(
+                    {'status': [f'Expected one of {sorted(allowed)}.']}
+                )
+            queryset = queryset.filter(status__in=statuses)
+
+        for param, lookup in self.TIMESTAMP_FILTERS.items():
+            if params.get(param):
+                queryset = queryset.filter(
+                    **{lookup: parse_timestamp(params[param], param)}
+                )
+
+        if params.get('creator'):
+            queryset = queryset.filter(
+                creator_id=parse_id(params['creator'], 'creator')
+            )
+
+        if params.get('opponent'):
+            queryset = queryset.filter(Exists(
+                DisputeParticipant.objects.filter(
+                    dispute=OuterRef('pk'),
+                    user_id=parse_id(params['opponent'], 'opponent'),
+                    role=DisputeParticipant.OPPONENT,
+                )
+            ))
+
+        if params.get('has_new_comments_since'):
+            queryset = queryset.filter(Exists(
+                Comment.objects.filter(
+                    dispute=OuterRef('pk'),
+                    created_at__gt=parse_timestamp(
+                        params['has_new_comments_since'],
+                        'has_new_comments_since',
+                    ),
+                )
+            ))
+        return queryset
+
+    def get_schema_fields(self, view):
+        """Describe the query parameters for the API schema."""
+        assert coreapi is not None, (
+            'coreapi must be installed to use `get_schema_fields()`'
+        )
+        return [
+            coreapi.Field(
+                name=name,
+                required=False,
+                location='query',
+                schema=coreschema.String(description=description),
+            )
+            for name, description in self.PARAMS_DESCRIPTION.items()
+        ]
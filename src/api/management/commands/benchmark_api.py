@@ -0,0 +1,107 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Compare the throughput of the WSGI and the ASGI deployments.
+
+    Sends the same number of concurrent GET requests to the sync
+    endpoint of the WSGI server, and to both the sync and the async
+    endpoints of the ASGI server, then prints the requests per second
+    and the latency percentiles of every run. The servers have to be
+    started separately, e.g. with gunicorn config.wsgi:application
+    and uvicorn config.asgi:application.
+    """
+
+    help = 'Benchmark concurrent requests under WSGI and ASGI.'
+
+    def add_arguments(self, parser):
+        """Add the server, endpoint and load arguments."""
+        parser.add_argument(
+            '--wsgi-url',
+            default='http://127.0.0.1:8000',
+            help='Base URL of the WSGI server.',
+        )
+        parser.add_argument(
+            '--asgi-url',
+            default='http://127.0.0.1:8001',
+            help='Base URL of the ASGI server.',
+        )
+        parser.add_argument(
+            '--token',
+            required=True,
+            help='API token used for the requests.',
+        )
+        parser.add_argument(
+            '--path',
+            default='/api/disputes/',
+            help='Path of the sync endpoint.',
+        )
+        parser.add_argument(
+            '--async-path',
+            default='/api/async/disputes/',
+            help='Path of the async endpoint.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Number of requests of every run.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Number of requests sent at the same time.',
+        )
+
+    def handle(self, *args, **options):
+        """Run the benchmark against every server and endpoint."""
+        runs = (
+            ('WSGI sync', options['wsgi_url'] + options['path']),
+            ('ASGI sync', options['asgi_url'] + options['path']),
+            ('ASGI async', options['asgi_url'] + options['async_path']),
+        )
+        headers = {'Authorization': f'Token {options["token"]}'}
+        self.stdout.write(
+            f'{"run":<12}{"req/s":>10}{"p50 ms":>10}'
+            f'{"p95 ms":>10}{"errors":>8}'
+        )
+        for name, url in runs:
+            try:
+                requests.get(url, headers=headers, timeout=10)
+            except requests.RequestException as error:
+                raise CommandError(f'{name}: {url} is unavailable: {error}')
+            elapsed, latencies, errors = self.run(
+                url, headers, options['requests'], options['concurrency']
+            )
+            percentiles = statistics.quantiles(latencies, n=20)
+            self.stdout.write(
+                f'{name:<12}{len(latencies) / elapsed:>10.1f}'
+                f'{statistics.median(latencies) * 1000:>10.1f}'
+                f'{percentiles[18] * 1000:>10.1f}{errors:>8}'
+            )
+
+    def run(self, url, headers, count, concurrency):
+        """Send the requests and return the time, latencies and errors."""
+        def send(_):
+            started = time.perf_counter()
+            try:
+                response = requests.get(url, headers=headers, timeout=60)
+                failed = response.status_code != 200
+            except requests.RequestException:
+                failed = True
+            return time.perf_counter() - started, failed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(send, range(count)))
+        elapsed = time.perf_counter() - started
+        latencies = [latency for latency, _ in results]
+        errors = sum(failed for _, failed in results)
+        return elapsed, latencies, errors
@@ -0,0 +1,272 @@
+import re
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from config.db_router import PRIMARY
+from disputes.models import Comment, Dispute, DisputeParticipant
+from users.models import CustomUser
+
+PG_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SCAN_RE = re.compile(r'SCAN (?:TABLE )?(\w+)')
+SEED_DESCRIPTION = 'Описание спора для проверки планов запросов.'
+
+# The requests are sent with a private cache emptied before each of them,
+# so every query of a cold request is explained and the shared cache is
+# neither read nor filled with the seeded data.
+EXPLAIN_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'explain-endpoints',
+    }
+}
+
+
+class Command(BaseCommand):
+    """
+    Explain the SQL generated by the read endpoints of the API.
+
+    Sends GET requests to the dispute and comment endpoints on behalf
+    of a mediator and a regular user, runs EXPLAIN for every SELECT
+    they produced on the primary and the replicas and flags the plans
+    containing sequential scans of tables with at least '--min-rows'
+    rows. The caches are bypassed (see EXPLAIN_CACHES).
+    With '--seed' the data is generated inside a transaction which
+    is rolled back at the end.
+    """
+
+    help = 'Run EXPLAIN on the SQL of the API endpoints.'
+
+    def add_arguments(self, parser):
+        """Add the seeding and reporting arguments."""
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Number of disputes to generate before explaining.',
+        )
+        parser.add_argument(
+            '--comments',
+            type=int,
+            default=10,
+            help='Number of comments generated for every dispute.',
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=1000,
+            help='Ignore sequential scans of tables with fewer rows.',
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan',
+            action='store_true',
+            help='Exit with an error if a sequential scan was found.',
+        )
+
+    def handle(self, *args, **options):
+        """Seed the data if requested and explain every endpoint."""
+        self.verbosity = options['verbosity']
+        self.min_rows = options['min_rows']
+        self.table_rows = {}
+        with transaction.atomic():
+            if options['seed']:
+                mediator, user = self.seed(
+                    options['seed'], options['comments']
+                )
+            else:
+                mediator, user = self.get_existing_users()
+            with override_settings(CACHES=EXPLAIN_CACHES):
+                seq_scans = self.explain_endpoints(mediator, user)
+            transaction.set_rollback(bool(options['seed']))
+
+        if seq_scans:
+            message = f'{seq_scans} queries use sequential scans.'
+            if options['fail_on_seq_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans.'))
+
+    def get_endpoints(self, user):
+        """Return (name, user, url) for every endpoint to explain."""
+        dispute = Dispute.objects.visible_to(user).first()
+        if dispute is None:
+            raise CommandError('The user does not see any dispute.')
+        last_comment = dispute.comments.last()
+        comments_url = f'/api/disputes/{dispute.id}/comments/'
+        endpoints = [
+            ('dispute list', '/api/disputes/'),
+            ('dispute list expanded',
+             '/api/disputes/?expand=comments,file,opponent'),
+            ('dispute detail', f'/api/disputes/{dispute.id}/'),
+            ('comment list', comments_url),
+        ]
+        if last_comment is not None:
+            endpoints.append((
+                'comment feed since',
+                f'{comments_url}?since={last_comment.id}',
+            ))
+        return endpoints
+
+    def explain_endpoints(self, mediator, user):
+        """Explain the endpoints and return the number of seq scans."""
+        seq_scans = 0
+        for caller in (mediator, user):
+            client = APIClient()
+            client.force_authenticate(caller)
+            for name, url in self.get_endpoints(caller):
+                cache.clear()
+                with ExitStack() as stack:
+                    contexts = [
+                        stack.enter_context(CaptureQueriesContext(database))
+                        for database in self.get_databases()
+                    ]
+                    response = client.get(url)
+                self.stdout.write(
+                    f'{name} as {caller.role}: GET {url} '
+                    f'-> {response.status_code}'
+                )
+                for context in contexts:
+                    for query in context.captured_queries:
+                        if query['sql'].lstrip().upper().startswith(
+                            'SELECT'
+                        ):
+                            seq_scans += self.explain(
+                                context.connection, query['sql']
+                            )
+        return seq_scans
+
+    def get_databases(self):
+        """
+        Return the connections of the databases the reads may go to.
+
+        These are the primary and the replicas the router picks from
+        (see config.db_router), other aliases are never queried.
+        """
+        aliases = dict.fromkeys([PRIMARY, *settings.DATABASE_REPLICAS])
+        return [connections[alias] for alias in aliases]
+
+    def explain(self, database, sql):
+        """Print the plan of the query and return 1 on a seq scan."""
+        with database.cursor() as cursor:
+            if database.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                scanned_tables = [
+                    match.group(1) for match in map(SQLITE_SCAN_RE.match, plan)
+                    if match and 'USING' not in match.string
+                ]
+            else:
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = [row[0] for row in cursor.fetchall()]
+                scanned_tables = [
+                    match.group(1) for match in map(PG_SCAN_RE.search, plan)
+                    if match
+                ]
+
+        seq_scan = any(
+            self.get_table_rows(database, table) >= self.min_rows
+            for table in scanned_tables
+        )
+        style = self.style.WARNING if seq_scan else self.style.SUCCESS
+        self.stdout.write(style(
+            '  SEQ SCAN' if seq_scan else '  OK'
+        ) + f'  [{database.alias}] {sql[:120]}')
+        if seq_scan or self.verbosity > 1:
+            for line in plan:
+                self.stdout.write(f'      {line}')
+        return int(seq_scan)
+
+    def get_table_rows(self, database, table):
+        """Return the number of rows in the table, estimated if possible."""
+        key = (database.alias, table)
+        if key not in self.table_rows:
+            with database.cursor() as cursor:
+                if database.vendor == 'postgresql':
+                    cursor.execute(
+                        'SELECT reltuples FROM pg_class WHERE relname = %s',
+                        [table],
+                    )
+                else:
+                    cursor.execute(
+                        f'SELECT COUNT(*) FROM '
+                        f'{database.ops.quote_name(table)}'
+                    )
+                row = cursor.fetchone()
+            self.table_rows[key] = row[0] if row else 0
+        return self.table_rows[key]
+
+    def get_existing_users(self):
+        """Return a mediator and a regular user from the database."""
+        mediator = CustomUser.objects.filter(role=CustomUser.MEDIATOR).first()
+        participant = DisputeParticipant.objects.filter(
+            role=DisputeParticipant.CREATOR
+        ).select_related('user').first()
+        if mediator is None or participant is None:
+            raise CommandError(
+                'No mediator or dispute found, use --seed to generate data.'
+            )
+        return mediator, participant.user
+
+    def seed(self, disputes_count, comments_count):
+        """Generate users, disputes and comments in bulk."""
+        users = [
+            self.build_user(number, CustomUser.USER) for number in range(10)
+        ]
+        users.append(self.build_user(len(users), CustomUser.MEDIATOR))
+        users = CustomUser.objects.bulk_create(users)
+        mediator, creators = users[-1], users[:-1]
+
+        disputes = Dispute.objects.bulk_create(
+            Dispute(
+                creator=creators[number % len(creators)],
+                description=SEED_DESCRIPTION,
+                status=Dispute.STARTED,
+                add_opponent=True,
+            )
+            for number in range(disputes_count)
+        )
+        DisputeParticipant.objects.bulk_create(
+            DisputeParticipant(
+                dispute=dispute,
+                user=dispute.creator,
+                role=DisputeParticipant.CREATOR,
+                is_visible=True,
+            )
+            for dispute in disputes
+        )
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    dispute=dispute,
+                    sender=dispute.creator,
+                    content=SEED_DESCRIPTION,
+                )
+                for dispute in disputes
+                for _ in range(comments_count)
+            ),
+            batch_size=1000,
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        return mediator, creators[0]
+
+    def build_user(self, number, role):
+        """Return an unsaved user with unique credentials."""
+        suffix = uuid.uuid4().hex[:12]
+        user = CustomUser(
+            email=f'explain-{suffix}@example.com',
+            first_name='Explain',
+            last_name=f'User{number}',
+            phone_number=f'+7{uuid.uuid4().int % 10 ** 10:010d}',
+            role=role,
+        )
+        user.set_unusable_password()
+        return user
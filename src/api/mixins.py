@@ -1,4 +1,17 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from rest_framework import mixins, viewsets
+from rest_framework.permissions import SAFE_METHODS
+
+from api.api_consts import REPRESENTATION_VERSION
+from config.db_router import (
+    enable_replica_reads,
+    is_stuck_to_primary,
+    primary_reads,
+    stick_to_primary,
+)
 
 
 class CreteListModelViewSet(
@@ -9,3 +22,111 @@ class CreteListModelViewSet(
     """Mixin viewset for GET and POST request."""
 
     pass
+
+
+class ReplicaReadMixin:
+    """
+    Serve the safe requests of the viewset from a read replica.
+
+    After a successful write the user reads from the primary for
+    REPLICA_STICKY_SECONDS, so they see their own changes while the
+    replicas catch up.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        """Handle the request and restore the primary reads after it."""
+        with primary_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        """Enable the replica once the user is known."""
+        super().perform_authentication(request)
+        if request.method in SAFE_METHODS and not (
+            request.user.is_authenticated
+            and is_stuck_to_primary(request.user.pk)
+        ):
+            enable_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Stick the user to the primary after a successful write."""
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            stick_to_primary(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class NotModified(Exception):
+    """Raised to answer the request with a ready 304 or 412 response."""
+
+    def __init__(self, response):
+        """Initialize NotModified with the response to return."""
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET requests with 304 Not Modified when nothing changed.
+
+    The viewset describes the current state of a response with
+    get_response_version(): the values the response is built from
+    and the time of their last change, or None if the response is
+    not versioned. The version is checked after the permissions and
+    before the queryset is evaluated, so an unchanged resource costs
+    neither the full queries nor the serialization.
+    """
+
+    def get_response_version(self):
+        """Return (values, last modified timestamp) or None."""
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        """Check the conditional headers once the user is allowed."""
+        super().initial(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return
+        version = self.get_response_version()
+        if version is None:
+            return
+        values, last_modified = version
+        digest = hashlib.sha256(repr(
+            (
+                REPRESENTATION_VERSION,
+                request.user.pk,
+                request.get_full_path(),
+                values,
+            )
+        ).encode()).hexdigest()
+        etag, last_modified = quote_etag(digest[:32]), int(last_modified)
+        self.response_validators = (etag, last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            raise NotModified(self.set_validators(response))
+
+    def handle_exception(self, exc):
+        """Return the prepared response of NotModified."""
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Add the validators to a successful versioned response."""
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        validators = getattr(self, 'response_validators', None)
+        if validators and response.status_code == 200:
+            self.set_validators(response)
+        return response
+
+    def set_validators(self, response):
+        """Set ETag and Last-Modified and ask to revalidate every time."""
+        etag, last_modified = self.response_validators
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
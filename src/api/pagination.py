@@ -1,9 +1,50 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
 
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
 
-class DisputePagination(PageNumberPagination):
-    """Custom class Pagination for disputes."""
 
-    page_size = 5
+class OptionalCountCursorPagination(CursorPagination):
+    """
+    Keyset pagination with opaque cursors and an optional total count.
+
+    Pages are fetched with a range condition on the ordering instead
+    of an OFFSET scan, so the cost of a page does not depend on how
+    deep the client has paged. The COUNT(*) query runs only when
+    the client asks for it with '?count=true'.
+    """
+
     page_size_query_param = 'page_size'
     max_page_size = 100
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate the queryset and count it if requested."""
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Return the page with links and the optional count."""
+        response_data = OrderedDict()
+        if self.count is not None:
+            response_data['count'] = self.count
+        response_data['next'] = self.get_next_link()
+        response_data['previous'] = self.get_previous_link()
+        response_data['results'] = data
+        return Response(response_data)
+
+
+class DisputePagination(OptionalCountCursorPagination):
+    """Custom class Pagination for disputes."""
+
+    page_size = 5
+    ordering = ('-created_at', 'id')
+
+
+class CommentPagination(OptionalCountCursorPagination):
+    """Custom class Pagination for comments of the dispute."""
+
+    page_size = 20
+    ordering = ('created_at', 'id')
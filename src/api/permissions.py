@@ -1,7 +1,6 @@
-from django.shortcuts import get_object_or_404
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
-from disputes.models import Dispute
+from api.context import get_dispute_context
 
 
 class IsCreatorOrMediatorOrOpponent(BasePermission):
@@ -20,7 +19,7 @@ class IsCreatorOrMediatorOrOpponent(BasePermission):
     def has_object_permission(self, request, view, obj):
         """Check whether the user has permission to access the object."""
         if (
-            obj.creator == request.user
+            obj.creator_id == request.user.id
             or request.user.is_mediator
             or request.method in SAFE_METHODS
         ):
@@ -37,14 +36,7 @@ class CommentsPermission(BasePermission):
 
     def has_permission(self, request, view):
         """Check whether the user has permission to access the request."""
+        if not request.user.is_authenticated:
+            return False
         dispute_id = view.kwargs.get('dispute_id')
-        dispute = get_object_or_404(Dispute, id=dispute_id)
-
-        user = request.user
-        is_opponent = dispute.opponent.filter(id=user.id).exists()
-
-        return (
-            (is_opponent and dispute.add_opponent)
-            or user == dispute.creator
-            or user.is_mediator
-        )
+        return get_dispute_context(request, dispute_id).can_comment
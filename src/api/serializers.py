@@ -1,11 +1,24 @@
-import os
-from urllib.parse import unquote
-
+from django.conf import settings
+from django.db import models
+from django.urls import reverse
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 from rest_framework.permissions import SAFE_METHODS
 
-from disputes.models import Comment, Dispute, FileComment, FileDispute
+from api.cache import get_user_cards
+from disputes.attachments import AttachmentError, atomic_attachments
+from disputes.models import (
+    Comment,
+    Dispute,
+    DisputeEvent,
+    FileComment,
+    FileDispute,
+    Upload,
+    get_original_name,
+)
+from disputes.previews import is_previewable
+from disputes.search import render_snippet
+from disputes.uploads import get_allowed_content_type
 from users.models import CustomUser
 
 
@@ -27,91 +40,246 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'phone_number', 'role']
 
 
-class BaseFileSerializer(serializers.ModelSerializer):
-    """Base serializer for the File"""
+def build_user_cards(user_ids):
+    """Serialize the users of the ids for the cache of user cards."""
+    users = list(CustomUser.objects.filter(pk__in=user_ids))
+    return zip(users, CustomUserSerializer(users, many=True).data)
+
+
+class UserCards:
+    """The user cards of one response, loaded in batches."""
+
+    def __init__(self):
+        self.cards = {}
+
+    def load(self, user_ids):
+        """Load the cards of the ids which were not loaded yet."""
+        missing = set(user_ids) - set(self.cards)
+        if missing:
+            self.cards.update(get_user_cards(missing, build_user_cards))
+
+    def get(self, user_id):
+        """Return the card of the user."""
+        self.load([user_id])
+        return self.cards.get(user_id)
+
+
+def get_response_user_cards(context):
+    """Return the user cards shared by the serializers of a response."""
+    return context.setdefault('user_cards', UserCards())
+
+
+class UserCardField(serializers.Field):
+    """
+    Read-only card of a user taken from the shared cache of user cards.
+
+    The source is the id of the user, e.g. 'creator_id', or with
+    many=True a manager of the users, e.g. 'opponent', so the user
+    rows themselves are not loaded. The root serializer loads the
+    cards of the whole response at once (see UserCardsMixin).
+    """
+
+    def __init__(self, many=False, **kwargs):
+        self.many = many
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_user_ids(self, instance):
+        """Return the ids of the users of the field in the instance."""
+        value = self.get_attribute(instance)
+        if value is None:
+            return []
+        if self.many:
+            return [user.pk for user in value.all()]
+        return [value]
+
+    def to_representation(self, value):
+        """Return the card or the list of cards of the users."""
+        cards = get_response_user_cards(self.context)
+        if self.many:
+            return [cards.get(user.pk) for user in value.all()]
+        return cards.get(value)
+
+
+class UserCardsMixin:
+    """
+    Load the user cards of the representation with one batched lookup.
+
+    Before the root serializer is rendered the ids of the users
+    shown by its UserCardFields and by the nested serializers using
+    this mixin are collected, and all the cards are loaded at once.
+    """
+
+    def get_user_ids(self, instance):
+        """Return the ids of the users shown in the representation."""
+        user_ids = self.get_extra_user_ids(instance)
+        for field in self._readable_fields:
+            if isinstance(field, UserCardField):
+                user_ids += field.get_user_ids(instance)
+            elif isinstance(getattr(field, 'child', None), UserCardsMixin):
+                items = field.get_attribute(instance)
+                if isinstance(items, models.Manager):
+                    items = items.all()
+                for item in items or ():
+                    user_ids += field.child.get_user_ids(item)
+        return user_ids
+
+    def get_extra_user_ids(self, instance):
+        """Return the ids of the users shown by the method fields."""
+        return []
 
-    size = serializers.SerializerMethodField()
-    filename = serializers.SerializerMethodField()
-    file = serializers.FileField()
-    MAX_FILENAME_LENGTH = 50
+    def to_representation(self, instance):
+        """Load the user cards if this is the root serializer."""
+        if self.parent is None:
+            get_response_user_cards(self.context).load(
+                self.get_user_ids(instance)
+            )
+        return super().to_representation(instance)
+
+
+class UserCardListSerializer(serializers.ListSerializer):
+    """List serializer loading the user cards of the whole list."""
+
+    def to_representation(self, data):
+        """Load the user cards of all items if this is the root."""
+        if self.parent is None:
+            items = data.all() if isinstance(data, models.Manager) else data
+            get_response_user_cards(self.context).load([
+                user_id for item in items
+                for user_id in self.child.get_user_ids(item)
+            ])
+        return super().to_representation(data)
+
+
+class FileDownloadField(serializers.Field):
+    """
+    URL of the protected download of the file of the row.
+
+    The files are not public, they are sent by the view_name view
+    after the access check (see api.downloads).
+    """
+
+    def __init__(self, view_name, **kwargs):
+        self.view_name = view_name
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
 
-    class Meta:
-        abstract = True
+    def to_representation(self, instance):
+        """Return the absolute URL of the download."""
+        if not instance.file:
+            return None
+        url = reverse(self.view_name, kwargs={'pk': instance.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
-    def get_size(self, obj):
-        """Calculate the size in bytes."""
-        if obj.file:
-            file_path = obj.file.path
-            if os.path.exists(file_path):
-                size_bytes = os.path.getsize(file_path)
-                return size_bytes
-        return 0
 
-    def get_filename(self, obj):
-        """Remove unreadbale characters in filename.
+class FilePreviewField(FileDownloadField):
+    """
+    URL of a downscaled preview of an image or the first PDF page.
 
-        Example:
-        Before - hot_dog_KXxIrPe.jpg
-        After - hot_dog.jpg",
-        """
-        if obj.file:
-            filename = obj.file.name
-
-            # Remove the directory path
-            parts = filename.split('/')
-            if parts:
-                # Get the last part, which is the filename
-                filename = parts[-1]
-
-                # Remove the last part of the filename
-                parts = filename.split('_')
-                if len(parts) >= 2:
-                    # If there are at least two parts,
-                    # join all except the last part
-                    return '_'.join(parts[:-1])
-                else:
-                    # If there's only one part, return the whole filename
-                    return filename
-
-            return filename  # Return the modified filename
+    None for the files without previews. The preview is rendered in
+    the background after the upload (see disputes.previews).
+    """
 
-        return ""
+    def __init__(self, view_name, size, **kwargs):
+        self.size = size
+        super().__init__(view_name, **kwargs)
 
     def to_representation(self, instance):
-        """
-        Modify the representation of the serialized data.
+        """Return the absolute URL of the preview."""
+        if not (
+            instance.file
+            and instance.checksum
+            and is_previewable(instance.content_type)
+        ):
+            return None
+        url = reverse(
+            self.view_name, kwargs={'pk': instance.pk, 'size': self.size}
+        )
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
 
-        This method decodes the 'file' field to convert
-        percent-encoded characters
-        back to readable characters
-        with support for Cyrillic.
+class BaseFileSerializer(serializers.ModelSerializer):
+    """Base serializer for the File"""
 
-        Args:
-            instance: The instance being serialized.
+    size = serializers.IntegerField(read_only=True)
+    filename = serializers.SerializerMethodField()
+    MAX_FILENAME_LENGTH = 50
 
-        Returns:
-            dict: A modified representation of the serialized data.
+    class Meta:
+        abstract = True
 
-        Example:
-        Before - "http://127.0.0.1:8000/media/
-        uploads/%D0%91%D0%BE%D1%80%D1%89.jpg"
+    def get_filename(self, obj):
+        """
+        Return the name the file was uploaded with.
 
-        After -  "http://127.0.0.1:8000/media/uploads/Борщ.jpg"
+        Files stored before the name was saved in the database
+        fall back to the name in the storage.
         """
-        data = super().to_representation(instance)
-        data['file'] = unquote(data['file'])
-        return data
+        if obj.original_name:
+            return obj.original_name
+        if obj.file:
+            return get_original_name(obj.file.name)
+        return ""
 
 
 class FileCommentSerializer(BaseFileSerializer):
     """Serializer for the File in comment."""
 
+    file = FileDownloadField('api:comment-file')
+    thumbnail = FilePreviewField('api:comment-file-preview', 'thumbnail')
+    preview = FilePreviewField('api:comment-file-preview', 'preview')
+
     class Meta:
         model = FileComment
-        fields = "__all__"
-
-
-class CommentSerializer(serializers.ModelSerializer):
+        exclude = ('original_name',)
+
+
+class UploadsField(serializers.ListField):
+    """
+    Ids of complete chunked uploads to attach, resolved with one query.
+
+    The uploads have to belong to the user passed in the 'uploader_id'
+    key of the context. The validated value is the list of uploads.
+    """
+
+    child = serializers.UUIDField()
+    default_error_messages = {
+        'does_not_exist': 'Invalid upload "{pk_value}".',
+        'incomplete': 'Upload "{pk_value}" is not complete.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs['write_only'] = True
+        kwargs.setdefault('required', False)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        """Load the uploads of the ids."""
+        upload_ids = list(dict.fromkeys(super().to_internal_value(data)))
+        uploads = Upload.objects.filter(
+            owner_id=self.context.get('uploader_id')
+        ).in_bulk(upload_ids)
+        for upload_id in upload_ids:
+            upload = uploads.get(upload_id)
+            if upload is None:
+                self.fail('does_not_exist', pk_value=upload_id)
+            if not upload.is_complete:
+                self.fail('incomplete', pk_value=upload_id)
+        return [uploads[upload_id] for upload_id in upload_ids]
+
+
+def attach_uploads(attachments, model, uploads, **fields):
+    """Attach the chunked uploads or report them as invalid."""
+    try:
+        attachments.add_uploads(model, uploads, **fields)
+    except AttachmentError as error:
+        raise serializers.ValidationError({'uploads': [str(error)]})
+
+
+class CommentSerializer(UserCardsMixin, serializers.ModelSerializer):
     """Serializer for the Comment model."""
 
     file = FileCommentSerializer(many=True, read_only=True)
@@ -120,7 +288,8 @@ class CommentSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
-    sender = CustomUserSerializer(read_only=True)
+    uploads = UploadsField()
+    sender = UserCardField(source='sender_id')
 
     class Meta:
         """
@@ -130,30 +299,26 @@ class CommentSerializer(serializers.ModelSerializer):
             model: The Comment model class to be serialized.
             fields: A string indicating to include all fields
             from the Comment model.
+            list_serializer_class: Loads the senders of all comments.
         """
 
         model = Comment
-        fields = ('id', 'sender', 'file', 'uploaded_files',
+        fields = ('id', 'sender', 'file', 'uploaded_files', 'uploads',
                   'content', 'dispute', 'created_at')
         read_only_fields = ('sender', 'dispute', 'created_at')
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if 'request' in self.context:
-            method = self.context['request'].method
-            if method in SAFE_METHODS:
-                self.fields['sender'] = CustomUserSerializer(read_only=True)
-        super().__init__(*args, **kwargs)
+        list_serializer_class = UserCardListSerializer
 
     def create(self, validated_data):
         """Create the comment."""
         uploaded_files = validated_data.pop('uploaded_files', None)
-        comment = Comment.objects.create(**validated_data)
-        if uploaded_files:
-            for file in uploaded_files:
-                FileComment.objects.create(
-                    comment=comment,
-                    file=file
+        uploads = validated_data.pop('uploads', None)
+        with atomic_attachments() as attachments:
+            comment = Comment.objects.create(**validated_data)
+            if uploaded_files:
+                attachments.add(FileComment, uploaded_files, comment=comment)
+            if uploads:
+                attach_uploads(
+                    attachments, FileComment, uploads, comment=comment
                 )
         return comment
 
@@ -161,12 +326,87 @@ class CommentSerializer(serializers.ModelSerializer):
 class FileDisputeSerializer(BaseFileSerializer):
     """Serializer for the File in dispute."""
 
+    file = FileDownloadField('api:dispute-file')
+    thumbnail = FilePreviewField('api:dispute-file-preview', 'thumbnail')
+    preview = FilePreviewField('api:dispute-file-preview', 'preview')
+
     class Meta:
         model = FileDispute
-        fields = "__all__"
+        exclude = ('original_name',)
+
 
+class SparseFieldsMixin:
+    """
+    Drop the fields which were not requested with '?fields='.
 
-class DisputeSerializer(serializers.ModelSerializer):
+    The view passes the requested names in the 'fields' key of
+    the serializer context. When it is empty all fields are kept.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested_fields = self.context.get('fields')
+        if requested_fields:
+            for field_name in set(self.fields) - set(requested_fields):
+                self.fields.pop(field_name)
+
+
+class OpponentField(serializers.ListField):
+    """
+    Ids of the opponents of a dispute, resolved with one query.
+
+    All submitted users are loaded with one IN query and have to be
+    active users who are not mediators. The creator of the dispute,
+    passed in the 'creator_id' key of the context, cannot be an
+    opponent. The validated value is the list of unique ids, so the
+    relation is written with one bulk insert.
+    """
+
+    child = serializers.IntegerField(min_value=1)
+    default_error_messages = {
+        'self': 'You cannot set yourself as an opponent.',
+        'does_not_exist': 'Invalid pk "{pk_value}" - object does not exist.',
+        'inactive': 'User "{pk_value}" is not active.',
+        'mediator': 'Mediator cannot be an opponent.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('allow_empty', False)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        """Validate the ids of the opponents."""
+        user_ids = list(dict.fromkeys(super().to_internal_value(data)))
+        if self.context.get('creator_id') in user_ids:
+            self.fail('self')
+        users = CustomUser.objects.only('id', 'role', 'is_active').in_bulk(
+            user_ids
+        )
+        for user_id in user_ids:
+            user = users.get(user_id)
+            if user is None:
+                self.fail('does_not_exist', pk_value=user_id)
+            if not user.is_active:
+                self.fail('inactive', pk_value=user_id)
+            if user.is_mediator:
+                self.fail('mediator')
+        return user_ids
+
+    def to_representation(self, value):
+        """Return the ids of the opponents."""
+        return [user.pk for user in value.all()]
+
+
+def find_last_comment(dispute):
+    """Return the last comment of the dispute, prefetched if possible."""
+    if hasattr(dispute, 'prefetched_last_comment'):
+        return next(iter(dispute.prefetched_last_comment), None)
+    return dispute.comments.last()
+
+
+class DisputeSerializer(
+    UserCardsMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """Serializer for the Dispute model."""
 
     last_comment = serializers.SerializerMethodField()
@@ -177,7 +417,9 @@ class DisputeSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
+    uploads = UploadsField()
     comments = CommentSerializer(many=True, read_only=True)
+    opponent = OpponentField()
 
     class Meta:
         """
@@ -187,6 +429,7 @@ class DisputeSerializer(serializers.ModelSerializer):
             model: The Dispute model class to be serialized.
             fields: A string indicating to include all fields
             from the Dispute model.
+            list_serializer_class: Loads the users of all disputes.
         """
 
         model = Dispute
@@ -202,7 +445,8 @@ class DisputeSerializer(serializers.ModelSerializer):
             'status',
             'comments',
             'last_comment',
-            'uploaded_files'
+            'uploaded_files',
+            'uploads',
         )
         read_only_fields = (
             'creator',
@@ -214,43 +458,133 @@ class DisputeSerializer(serializers.ModelSerializer):
             'comments',
             'last_comment',
         )
+        list_serializer_class = UserCardListSerializer
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if 'request' in self.context:
             method = self.context['request'].method
             if method in SAFE_METHODS:
-                self.fields['creator'] = CustomUserSerializer(read_only=True)
-                self.fields['opponent'] = CustomUserSerializer(many=True)
+                self.fields['creator'] = UserCardField(source='creator_id')
+                self.fields['opponent'] = UserCardField(many=True)
         super().__init__(*args, **kwargs)
 
     def get_last_comment(self, obj):
         """Get the last comment."""
-        last_comment = obj.comments.last()  # Получаем последний комментарий
+        last_comment = find_last_comment(obj)
         if last_comment:
-            return CommentSerializer(last_comment).data
+            return CommentSerializer(last_comment, context={
+                'user_cards': get_response_user_cards(self.context),
+            }).data
         return None
 
+    def get_extra_user_ids(self, instance):
+        """Return the sender of the last comment."""
+        if 'last_comment' in self.fields:
+            last_comment = find_last_comment(instance)
+            if last_comment:
+                return [last_comment.sender_id]
+        return []
+
     def create(self, validated_data):
         """Create the dispute."""
         uploaded_files = validated_data.pop('uploaded_files', None)
+        uploads = validated_data.pop('uploads', None)
         opponent = validated_data.pop('opponent', None)
-        dispute = Dispute.objects.create(**validated_data)
-        if uploaded_files:
-            for file in uploaded_files:
-                FileDispute.objects.create(
-                    dispute=dispute,
-                    file=file
+        with atomic_attachments() as attachments:
+            dispute = Dispute.objects.create(**validated_data)
+            if uploaded_files:
+                attachments.add(FileDispute, uploaded_files, dispute=dispute)
+            if uploads:
+                attach_uploads(
+                    attachments, FileDispute, uploads, dispute=dispute
                 )
-        if opponent:
-            dispute.opponent.add(*opponent)
-            dispute.save()
+            if opponent:
+                dispute.opponent.add(*opponent)
         return dispute
 
 
+class DisputeListSerializer(
+    UserCardsMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
+    """
+    Compact serializer for the list of disputes.
+
+    Leaves out the full comment thread and the files, and gives
+    the opponents as ids. The nested blocks listed in
+    EXPANDABLE_FIELDS are added back when they are requested
+    with '?expand=' (passed in the 'expand' key of the context).
+    """
+
+    EXPANDABLE_FIELDS = ('comments', 'opponent', 'file')
+
+    creator = UserCardField(source='creator_id')
+    last_comment = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Dispute
+        fields = (
+            'id',
+            'creator',
+            'description',
+            'created_at',
+            'closed_at',
+            'opponent',
+            'add_opponent',
+            'status',
+            'last_comment',
+        )
+        read_only_fields = fields
+        list_serializer_class = UserCardListSerializer
+
+    def get_fields(self):
+        """Add the nested blocks requested with '?expand='."""
+        fields = super().get_fields()
+        expand = self.context.get('expand', ())
+        if 'comments' in expand:
+            fields['comments'] = CommentSerializer(many=True, read_only=True)
+        if 'file' in expand:
+            fields['file'] = FileDisputeSerializer(many=True, read_only=True)
+        if 'opponent' in expand:
+            fields['opponent'] = UserCardField(many=True)
+        return fields
+
+    get_last_comment = DisputeSerializer.get_last_comment
+    get_extra_user_ids = DisputeSerializer.get_extra_user_ids
+
+
+class DisputeSearchSerializer(UserCardsMixin, serializers.ModelSerializer):
+    """Serializer for the full-text search hits of disputes."""
+
+    creator = UserCardField(source='creator_id')
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+    snippet = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Dispute
+        fields = (
+            'id',
+            'creator',
+            'description',
+            'created_at',
+            'closed_at',
+            'status',
+            'rank',
+            'snippet',
+        )
+        read_only_fields = fields
+        list_serializer_class = UserCardListSerializer
+
+    def get_snippet(self, dispute):
+        """Return the escaped snippet with the matched words marked."""
+        return render_snippet(dispute.search_snippet)
+
+
 class PatchDisputeSerializer(serializers.ModelSerializer):
     """Serializer for PATCH request of the Dispute model."""
 
+    opponent = OpponentField()
+
     class Meta:
         """
         Meta class DisputetSerializer.
@@ -280,3 +614,51 @@ class PatchDisputeSerializer(serializers.ModelSerializer):
             'closed_at',
             'comments'
         )
+
+
+class DisputeEventSerializer(serializers.ModelSerializer):
+    """Serializer for the events of the dispute."""
+
+    class Meta:
+        model = DisputeEvent
+        fields = ('id', 'kind', 'payload', 'created_at')
+        read_only_fields = fields
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    """Serializer for the chunked uploads."""
+
+    is_complete = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Upload
+        fields = (
+            'id',
+            'filename',
+            'content_type',
+            'size',
+            'offset',
+            'checksum',
+            'is_complete',
+            'created_at',
+        )
+        read_only_fields = ('content_type', 'offset', 'checksum')
+
+    def validate_size(self, size):
+        """Reject empty and too large files before they are sent."""
+        if not 0 < size <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'The size has to be from 1 to '
+                f'{settings.UPLOAD_MAX_SIZE} bytes.'
+            )
+        return size
+
+    def validate(self, attrs):
+        """Allow only the types of files which can be checked."""
+        content_type = get_allowed_content_type(attrs['filename'])
+        if content_type is None:
+            raise serializers.ValidationError(
+                {'filename': ['This type of file is not allowed.']}
+            )
+        attrs['content_type'] = content_type
+        return attrs
@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.authentication import forget_tokens
+from users.models import AuthToken, CustomUser
+
+
+def forget_on_commit(keys, using):
+    """
+    Drop the cached tokens once the transaction is committed.
+
+    A request reading the token in the meantime would cache the old
+    state again, like the user versions (see users.signals).
+    """
+    transaction.on_commit(lambda: forget_tokens(keys), using=using)
+
+
+@receiver(post_delete, sender=AuthToken)
+def forget_deleted_token(sender, instance, using, **kwargs):
+    """Stop accepting a token after logout or purge."""
+    forget_on_commit([instance.key], using)
+
+
+@receiver(post_save, sender=CustomUser)
+def forget_user_tokens(sender, instance, created, using, update_fields=None,
+                       **kwargs):
+    """Reload the user of the tokens after the user was changed."""
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    forget_on_commit(
+        list(
+            AuthToken.objects.using(using).filter(user=instance)
+            .values_list('key', flat=True)
+        ),
+        using,
+    )
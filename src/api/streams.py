@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import json
+import re
+import secrets
+from http import HTTPStatus
+from urllib.parse import parse_qs
+
+from django.core.cache import cache
+from django.http import Http404
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication, get_token_key
+from api.context import load_dispute_context
+from api.events import (
+    POLL_INTERVAL,
+    fetch_events,
+    get_last_event_id,
+    run_in_thread,
+)
+from users.models import AuthToken
+
+STREAM_PATH_RE = re.compile(r'^/api/disputes/(?P<dispute_id>\d+)/stream/$')
+
+# Seconds of silence after which a comment line keeps the stream open.
+HEARTBEAT_INTERVAL = 15
+
+# Seconds after which the stream is closed. The browser reconnects
+# with the Last-Event-ID header and the access is checked again.
+STREAM_MAX_DURATION = 300
+
+# Seconds between the checks of the access during the stream, so a
+# participant removed from the dispute or a user logged out stops
+# receiving its events before the stream ends.
+ACCESS_CHECK_INTERVAL = 30
+
+RECONNECT_DELAY_MS = 3000
+
+# Seconds a ticket of the stream stays valid after it was issued or
+# last opened a stream, enough for the browser to reconnect.
+STREAM_TICKET_TIMEOUT = STREAM_MAX_DURATION + 60
+
+
+def get_ticket_cache_key(ticket):
+    """Return the cache key of a ticket of the stream."""
+    return f'stream:ticket:{ticket}'
+
+
+def get_key_digest(key):
+    """Return the digest of a token key kept instead of the key."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def issue_stream_ticket(token, dispute_id):
+    """
+    Return a new ticket opening the event stream of the dispute.
+
+    The ticket is passed in the URL, so it only opens the stream of
+    the dispute, and only for as long as the token it was issued for
+    is valid. It expires STREAM_TICKET_TIMEOUT seconds after its last
+    use.
+    """
+    ticket = secrets.token_urlsafe(32)
+    cache.set(get_ticket_cache_key(ticket), {
+        'dispute_id': dispute_id,
+        'user_id': token.user_id,
+        'digest': get_key_digest(token.key),
+    }, STREAM_TICKET_TIMEOUT)
+    return ticket
+
+
+def redeem_stream_ticket(ticket, dispute_id):
+    """
+    Return the user of a ticket of the stream of the dispute.
+
+    Raises AuthenticationFailed if the ticket has expired, belongs to
+    another dispute or its token is no longer valid.
+    """
+    cache_key = get_ticket_cache_key(ticket)
+    entry = cache.get(cache_key)
+    if entry is None or entry['dispute_id'] != dispute_id:
+        raise AuthenticationFailed(_('Invalid ticket.'))
+    token = AuthToken.objects.select_related('user').filter(
+        user_id=entry['user_id']
+    ).first()
+    if token is None or get_key_digest(token.key) != entry['digest']:
+        raise AuthenticationFailed(_('Invalid token.'))
+    user, _token = CachedTokenAuthentication().check_token(token)
+    cache.touch(cache_key, STREAM_TICKET_TIMEOUT)
+    return user
+
+
+def authenticate(headers, query, dispute_id):
+    """
+    Return the user of the stream or raise AuthenticationFailed.
+
+    The token is taken from the Authorization header. EventSource
+    cannot send headers, so a browser passes a ticket of the stream
+    in the query instead: tokens in URLs would end up in the logs.
+    """
+    key = get_token_key(headers.get('authorization', ''))
+    if key:
+        user, _token = CachedTokenAuthentication(
+        ).authenticate_credentials(key)
+        return user
+    ticket = query.get('ticket', [''])[0]
+    if not ticket:
+        raise AuthenticationFailed(_('Invalid ticket.'))
+    return redeem_stream_ticket(ticket, dispute_id)
+
+
+def authorize(headers, query, dispute_id):
+    """
+    Return the HTTP status denying the stream or None to open it.
+
+    The checks are those of CommentsPermission: the caller has to be
+    a visible participant of the dispute or a mediator.
+    """
+    try:
+        user = authenticate(headers, query, dispute_id)
+    except AuthenticationFailed:
+        return HTTPStatus.UNAUTHORIZED
+    try:
+        context = load_dispute_context(user, dispute_id)
+    except Http404:
+        return HTTPStatus.NOT_FOUND
+    return None if context.can_comment else HTTPStatus.FORBIDDEN
+
+
+def format_event(event):
+    """Return the event in the text/event-stream format."""
+    return (
+        f'id: {event["id"]}\n'
+        f'event: {event["kind"]}\n'
+        f'data: {json.dumps(event, ensure_ascii=False)}\n\n'
+    )
+
+
+async def send_error(send, status):
+    """Send a JSON error response."""
+    body = json.dumps({'detail': status.phrase}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_for_disconnect(receive):
+    """Return when the client has closed the connection."""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def dispute_event_stream(scope, receive, send):
+    """
+    Stream the events of a dispute as Server-Sent Events.
+
+    ASGI application serving GET /api/disputes/<id>/stream/. The
+    stream starts after the Last-Event-ID header or 'last_event_id'
+    query parameter, or after the latest event if neither is sent,
+    and polls the indexed event table every POLL_INTERVAL seconds.
+    Every stream thus runs a query per second for at most
+    STREAM_MAX_DURATION seconds. The access is checked when the
+    stream opens and again every ACCESS_CHECK_INTERVAL seconds, the
+    stream ends once it is lost.
+    """
+    if scope['method'] != 'GET':
+        await send_error(send, HTTPStatus.METHOD_NOT_ALLOWED)
+        return
+    dispute_id = int(STREAM_PATH_RE.match(scope['path'])['dispute_id'])
+    headers = {
+        name.decode('latin-1').lower(): value.decode('latin-1')
+        for name, value in scope['headers']
+    }
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+
+    error = await run_in_thread(authorize, headers, query, dispute_id)
+    if error:
+        await send_error(send, error)
+        return
+
+    last_event_id = headers.get(
+        'last-event-id', query.get('last_event_id', [''])[0]
+    )
+    if last_event_id.isdigit():
+        last_event_id = int(last_event_id)
+    else:
+        last_event_id = await run_in_thread(get_last_event_id, dispute_id)
+
+    await send({
+        'type': 'http.response.start',
+        'status': HTTPStatus.OK,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': f'retry: {RECONNECT_DELAY_MS}\n\n'.encode(),
+        'more_body': True,
+    })
+
+    loop = asyncio.get_running_loop()
+    started = last_sent = last_checked = loop.time()
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        while loop.time() - started < STREAM_MAX_DURATION:
+            if loop.time() - last_checked >= ACCESS_CHECK_INTERVAL:
+                if await run_in_thread(authorize, headers, query, dispute_id):
+                    break
+                last_checked = loop.time()
+            events = await run_in_thread(
+                fetch_events, dispute_id, last_event_id
+            )
+            chunk = ''.join(format_event(event) for event in events)
+            if events:
+                last_event_id = events[-1]['id']
+            elif loop.time() - last_sent >= HEARTBEAT_INTERVAL:
+                chunk = ': heartbeat\n\n'
+            if chunk:
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk.encode(),
+                    'more_body': True,
+                })
+                last_sent = loop.time()
+            done, _ = await asyncio.wait({disconnected}, timeout=POLL_INTERVAL)
+            if done:
+                return
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from api.tests.utils import create_dispute, create_user
+from disputes.models import Dispute
+from users.models import AuthToken
+
+
+class AsyncViewsTests(TestCase):
+    """The async views render the user cards with a cold cache."""
+
+    def setUp(self):
+        """Create a started dispute with comments and an empty cache."""
+        cache.clear()
+        self.user = create_user()
+        self.token = AuthToken.objects.create(user=self.user)
+        self.dispute = create_dispute(
+            self.user, [create_user()], files=1, comments=2
+        )
+        Dispute.objects.filter(pk=self.dispute.pk).update(
+            status=Dispute.STARTED
+        )
+
+    def get(self, url):
+        """Send a GET with the token of the user and return the data."""
+        return self.async_client.get(
+            url, AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    async def test_dispute_list(self):
+        """The list renders the creators and opponents."""
+        response = await self.get(reverse('api:async-dispute-list'))
+        self.assertEqual(response.status_code, 200)
+        dispute = response.json()['results'][0]
+        self.assertEqual(dispute['creator']['id'], self.user.pk)
+
+    async def test_dispute_detail(self):
+        """The detail renders the users of the dispute and comments."""
+        response = await self.get(
+            reverse('api:async-dispute-detail', args=[self.dispute.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['creator']['id'], self.user.pk)
+        self.assertEqual(len(data['opponent']), 1)
+        self.assertEqual(data['comments'][0]['sender']['id'], self.user.pk)
+
+    async def test_comment_list(self):
+        """The comments render their senders."""
+        response = await self.get(
+            reverse('api:async-comment-list', args=[self.dispute.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        senders = {
+            comment['sender']['id'] for comment in response.json()['results']
+        }
+        self.assertEqual(senders, {self.user.pk})
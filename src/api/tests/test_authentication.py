@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from api.authentication import get_token_cache_key, load_token
+from api.tests.utils import create_user
+from users.models import AuthToken
+
+
+class CachedTokenTests(APITestCase):
+    """The cached tokens follow the logouts and the changes of users."""
+
+    def setUp(self):
+        """Create the token of a user and a client sending it."""
+        cache.clear()
+        self.user = create_user()
+        self.token = AuthToken.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('api:disputes-list')
+
+    def get_status(self):
+        """Return the status of a request with the token."""
+        return self.client.get(self.url).status_code
+
+    def test_cached_fields(self):
+        """The token is served from the cache without the password."""
+        self.assertEqual(self.get_status(), 200)
+        cached = cache.get(get_token_cache_key(self.token.key))
+        self.assertNotIn(self.user.password, str(cached))
+        token = load_token(cached)
+        self.assertEqual(token.user.email, self.user.email)
+        self.assertIn('password', token.user.get_deferred_fields())
+
+    def test_deactivation(self):
+        """A deactivated user is refused once the change is committed."""
+        self.assertEqual(self.get_status(), 200)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.is_active = False
+            self.user.save()
+            self.assertEqual(self.get_status(), 200)
+        self.assertTrue(callbacks)
+        self.assertEqual(self.get_status(), 401)
+
+    def test_logout(self):
+        """A deleted token is refused once the deletion is committed."""
+        self.assertEqual(self.get_status(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.get_status(), 401)
+
+    def test_expiry(self):
+        """An expired token is refused."""
+        AuthToken.objects.filter(pk=self.token.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.get_status(), 401)
+
+    def test_purge(self):
+        """The purge deletes the expired tokens and forgets them."""
+        expired = AuthToken.objects.create(
+            user=create_user(),
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(self.get_status(), 200)
+        cache.set(get_token_cache_key(expired.key), 'stale')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(AuthToken.objects.purge_expired(), 1)
+        self.assertFalse(AuthToken.objects.filter(pk=expired.pk).exists())
+        self.assertIsNone(cache.get(get_token_cache_key(expired.key)))
+        self.assertEqual(self.get_status(), 200)
@@ -0,0 +1,67 @@
+from django.urls import reverse
+
+from api.tests.utils import APIQueriesTestCase, create_user
+from users.autocomplete import UserPrefixIndex
+from users.models import CustomUser
+
+
+class UserPrefixIndexTests(APIQueriesTestCase):
+    """The users are found by the beginnings of their fields."""
+
+    def setUp(self):
+        """Index a few users with similar names."""
+        super().setUp()
+        self.index = UserPrefixIndex([
+            (1, 'Анна', 'Петрова', 'anna@example.com', CustomUser.USER),
+            (2, 'Пётр', 'Иванов', 'petr@example.com', CustomUser.USER),
+            (3, 'Иван', 'Петров', 'ivan@example.com', CustomUser.USER),
+            (4, 'Петр', 'Сидоров', 'sidorov@example.com', CustomUser.USER),
+        ], version=0)
+
+    def search(self, query, limit=10, exclude=()):
+        """Return the ids of the users found by the query."""
+        return [
+            card['id'] for card in self.index.search(query, limit, exclude)
+        ]
+
+    def test_prefix(self):
+        """Exact matches come first, then the prefixes by the fields."""
+        self.assertEqual(self.search('петр'), [2, 4, 3, 1])
+        self.assertEqual(self.search('Пётр'), [2, 4, 3, 1])
+        self.assertEqual(self.search('sid'), [4])
+        self.assertEqual(self.search('x'), [])
+        self.assertEqual(self.search(' '), [])
+
+    def test_terms(self):
+        """Every word of the query has to match a field of the user."""
+        self.assertEqual(self.search('петр иван'), [2, 3])
+        self.assertEqual(self.search('петров анна'), [1])
+
+    def test_exclude(self):
+        """The excluded users are skipped."""
+        self.assertEqual(self.search('петр', exclude=(2, 3)), [4, 1])
+
+    def test_limit(self):
+        """At most limit users are returned."""
+        self.assertEqual(self.search('петр', limit=2), [2, 4])
+        self.assertEqual(self.search('петр', limit=0), [])
+
+
+class AutocompleteTests(APIQueriesTestCase):
+    """The autocomplete suggests the users who can be opponents."""
+
+    def test_opponents_only(self):
+        """The user, inactive users and mediators are not suggested."""
+        opponent = create_user()
+        create_user(CustomUser.MEDIATOR)
+        inactive = create_user()
+        inactive.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            inactive.save()
+        response = self.client.get(
+            reverse('api:users-autocomplete'), {'q': 'Фамилия'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [card['id'] for card in response.data], [opponent.pk]
+        )
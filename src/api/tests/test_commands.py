@@ -0,0 +1,40 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.tests.utils import create_dispute, create_user
+from users.models import CustomUser
+
+
+class ExplainEndpointsTests(TestCase):
+    """The command explains the queries of cold requests."""
+
+    def setUp(self):
+        """Create a mediator and a commented dispute of a user."""
+        cache.clear()
+        create_user(CustomUser.MEDIATOR)
+        create_dispute(create_user(), [create_user()], comments=2)
+
+    def explain(self, **options):
+        """Run the command and return its output."""
+        stdout = StringIO()
+        call_command('explain_endpoints', stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_cold_requests(self):
+        """Every run explains the same queries without the shared cache."""
+        output = self.explain()
+        self.assertIn('dispute list as mediator: GET /api/disputes/', output)
+        self.assertIn('No sequential scans.', output)
+        self.assertIn('  OK  [default] SELECT', output)
+        self.assertEqual(self.explain(), output)
+        self.assertIsNone(cache.get('users:directory:version'))
+
+    def test_seed(self):
+        """The seeded data is rolled back."""
+        users = CustomUser.objects.count()
+        output = self.explain(seed=2, comments=1)
+        self.assertIn('comment feed since as user', output)
+        self.assertEqual(CustomUser.objects.count(), users)
@@ -0,0 +1,112 @@
+from django.db import connection
+from django.urls import reverse
+
+from api.filters import MAX_ID
+from api.tests.utils import (
+    TEXT,
+    APIQueriesTestCase,
+    create_dispute,
+    create_user,
+)
+from disputes.models import Comment, Dispute
+
+
+class CommentQueriesTests(APIQueriesTestCase):
+    """The dispute is looked up once for the permissions and the view."""
+
+    # The dispute with the role of the user, the users shown by the
+    # dispute, the comments, their files and the user cards.
+    LIST_QUERIES = 5
+
+    def setUp(self):
+        """Create a started dispute where the user is an opponent."""
+        super().setUp()
+        self.dispute = create_dispute(
+            create_user(), [self.user], comments=5
+        )
+        Dispute.objects.filter(pk=self.dispute.pk).update(
+            status=Dispute.STARTED
+        )
+        self.url = reverse('api:comments-list', args=[self.dispute.pk])
+
+    def get_create_queries(self):
+        """
+        Return the number of queries of a new comment.
+
+        The dispute with the role of the user, the savepoint and its
+        release, the comment, the search document, the event, the
+        'updated_at' of the dispute, the user card and the files of
+        the comment. SQLite rebuilds the search document with two
+        statements.
+        """
+        return 10 if connection.vendor == 'sqlite' else 9
+
+    def test_list_queries(self):
+        """The comments are listed with a fixed number of queries."""
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_create_queries(self):
+        """A comment is created with a single lookup of the dispute."""
+        with self.assertNumQueries(self.get_create_queries()):
+            response = self.client.post(self.url, {'content': TEXT})
+        self.assertEqual(response.status_code, 201)
+
+    def test_forbidden_queries(self):
+        """A user outside of the dispute is refused after the lookup."""
+        self.client.force_authenticate(create_user())
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+
+class CommentCursorTests(APIQueriesTestCase):
+    """The 'since' cursor of the comments feed."""
+
+    def setUp(self):
+        """Create a dispute with three comments."""
+        super().setUp()
+        self.dispute = create_dispute(self.user, comments=3)
+        self.comments = list(self.dispute.comments.order_by('id'))
+        self.url = reverse('api:comments-list', args=[self.dispute.pk])
+
+    def get_ids(self, since):
+        """Return the ids of the comments after the cursor."""
+        response = self.client.get(self.url, {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return [comment['id'] for comment in response.data['results']]
+
+    def test_id_cursor(self):
+        """The comments after the received one are returned."""
+        self.assertEqual(
+            self.get_ids(self.comments[0].pk),
+            [comment.pk for comment in self.comments[1:]],
+        )
+        self.assertEqual(self.get_ids(self.comments[-1].pk), [])
+
+    def test_timestamp_cursor(self):
+        """The comments created after the timestamp are returned."""
+        Comment.objects.filter(pk=self.comments[0].pk).update(
+            created_at='2000-01-01T00:00:00Z'
+        )
+        self.assertEqual(
+            self.get_ids('2010-01-01'),
+            [comment.pk for comment in self.comments[1:]],
+        )
+
+    def test_invalid_cursors(self):
+        """Invalid cursors are answered with 400."""
+        for since in (
+            '2024-13-45T00:00',
+            '2024-02-30',
+            'latest',
+            str(MAX_ID + 1),
+            '99999999999999999999999',
+            '١٢',
+        ):
+            with self.subTest(since=since):
+                response = self.client.get(self.url, {'since': since})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('since', response.data)
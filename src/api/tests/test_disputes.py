@@ -0,0 +1,202 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from api.tests.utils import (
+    TEXT,
+    APIQueriesTestCase,
+    create_dispute,
+    create_user,
+)
+from disputes.models import Comment
+from users.versions import get_directory_version
+
+
+class DisputeQueriesTests(APIQueriesTestCase):
+    """The number of queries of the disputes does not grow with the page."""
+
+    # The page rows, the users shown by the disputes, the disputes, the
+    # opponents, the last comments, their files and the user cards.
+    LIST_QUERIES = 7
+    # The dispute row, the users shown by it, the dispute, the
+    # opponents, the files, the comments with their files, the last
+    # comment with its files and the user cards.
+    DETAIL_QUERIES = 10
+
+    def setUp(self):
+        """Create more disputes than the largest page."""
+        super().setUp()
+        opponent = create_user()
+        self.disputes = [
+            create_dispute(self.user, [opponent], files=2, comments=2)
+            for _ in range(25)
+        ]
+
+    def test_list_queries(self):
+        """A page of 5 or 20 disputes is loaded with the same queries."""
+        for page_size in (5, 20):
+            with self.subTest(page_size=page_size):
+                cache.clear()
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    response = self.client.get(
+                        reverse('api:disputes-list'),
+                        {'page_size': page_size},
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_retrieve_queries(self):
+        """A dispute is loaded with its nested blocks in fixed queries."""
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.client.get(
+                reverse('api:disputes-detail', args=[self.disputes[0].pk])
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['comments']), 2)
+
+    def test_cached_list_queries(self):
+        """A page of cached disputes reads only the rows of the page."""
+        url = reverse('api:disputes-list')
+        self.client.get(url, {'page_size': 20})
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'page_size': 20})
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_other_user_change(self):
+        """A change of a user not shown keeps the cached disputes."""
+        url = reverse('api:disputes-list')
+        self.client.get(url, {'page_size': 20})
+        other = create_user()
+        other.last_name = 'Другая'
+        with self.captureOnCommitCallbacks(execute=True):
+            other.save()
+        with self.assertNumQueries(1):
+            self.client.get(url, {'page_size': 20})
+
+
+class UserVersionTests(APIQueriesTestCase):
+    """The validators follow the versions of the users shown only."""
+
+    def setUp(self):
+        """Create a dispute of the user with an opponent."""
+        super().setUp()
+        self.opponent = create_user()
+        self.other = create_user()
+        dispute = create_dispute(self.user, [self.opponent])
+        self.url = reverse('api:disputes-detail', args=[dispute.pk])
+
+    def get_etag(self):
+        """Return the ETag of the dispute."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def rename(self, user):
+        """Rename the user and commit the change."""
+        user.last_name = 'Другая'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+    def test_other_user(self):
+        """A change of a user not shown keeps the ETag."""
+        etag = self.get_etag()
+        self.rename(self.other)
+        self.assertEqual(self.get_etag(), etag)
+
+    def test_shown_user(self):
+        """A change of the opponent changes the ETag and the card."""
+        etag = self.get_etag()
+        self.rename(self.opponent)
+        self.assertNotEqual(self.get_etag(), etag)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['opponent'][0]['last_name'], 'Другая')
+
+    def test_bump_on_commit(self):
+        """The version is bumped once the change is committed."""
+        etag = self.get_etag()
+        self.opponent.last_name = 'Другая'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.opponent.save()
+        self.assertEqual(self.get_etag(), etag)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.get_etag(), etag)
+
+    def test_directory_version(self):
+        """The autocomplete is rebuilt after a change of its fields only."""
+        version = get_directory_version()
+        self.other.phone_number = '+79009999999'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.save()
+        self.assertEqual(get_directory_version(), version)
+        self.rename(self.other)
+        self.assertNotEqual(get_directory_version(), version)
+
+
+class ConditionalGetTests(APIQueriesTestCase):
+    """Unchanged responses are confirmed with 304 Not Modified."""
+
+    def setUp(self):
+        """Create a dispute of the user with an opponent."""
+        super().setUp()
+        self.dispute = create_dispute(self.user, [create_user()])
+        self.urls = (
+            reverse('api:disputes-list'),
+            reverse('api:disputes-detail', args=[self.dispute.pk]),
+            reverse('api:comments-list', args=[self.dispute.pk]),
+            reverse('api:users-me'),
+        )
+
+    def get_etags(self):
+        """Return the ETags of the URLs."""
+        etags = []
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etags.append(response['ETag'])
+        return etags
+
+    def test_not_modified(self):
+        """The ETag of an unchanged response is answered with 304."""
+        for url, etag in zip(self.urls, self.get_etags()):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.content)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='"x"')
+                self.assertEqual(response.status_code, 200)
+
+    def test_dispute_edit(self):
+        """An edit of the dispute changes the ETags of the dispute."""
+        etags = self.get_etags()
+        response = self.client.patch(
+            self.urls[1], {'description': f'{TEXT} Новое.'}
+        )
+        self.assertEqual(response.status_code, 201)
+        new_etags = self.get_etags()
+        for url, etag, new_etag in zip(self.urls[:3], etags, new_etags):
+            with self.subTest(url=url):
+                self.assertNotEqual(new_etag, etag)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(new_etags[3], etags[3])
+
+    def test_new_comment(self):
+        """A new comment changes the ETags of the dispute."""
+        etags = self.get_etags()
+        Comment.objects.create(
+            dispute=self.dispute, sender=self.user, content=TEXT
+        )
+        for etag, new_etag in zip(etags[:3], self.get_etags()):
+            self.assertNotEqual(new_etag, etag)
+
+    def test_profile_edit(self):
+        """An edit of the user changes the ETag of the profile."""
+        etag = self.get_etags()[3]
+        self.user.first_name = 'Другое'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.urls[3], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+
+from api.tests.utils import APIQueriesTestCase, create_dispute, create_user
+from disputes.models import FileDispute
+from users.models import CustomUser
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT=False)
+class FileDownloadTests(APIQueriesTestCase):
+    """The files are sent to the users who see their dispute."""
+
+    def setUp(self):
+        """Create a dispute of the user with a file."""
+        super().setUp()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        media_root = override_settings(MEDIA_ROOT=location)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.dispute = create_dispute(self.user, files=1)
+        self.file = FileDispute.objects.get(dispute=self.dispute)
+        self.content = self.file.file.read()
+        self.url = reverse('api:dispute-file', args=[self.file.pk])
+
+    def test_download(self):
+        """The participant gets the whole file with its ETag."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['ETag'], f'"{self.file.checksum}"')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertIn('file.txt', response['Content-Disposition'])
+
+    def test_access(self):
+        """An outsider does not find the file, a mediator downloads it."""
+        self.client.force_authenticate(create_user())
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_authenticate(create_user(CustomUser.MEDIATOR))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_range(self):
+        """A byte range is answered with 206 Partial Content."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1-2')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(
+            response['Content-Range'], f'bytes 1-2/{len(self.content)}'
+        )
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content[1:3]
+        )
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_not_modified(self):
+        """A cached copy with the ETag is confirmed with 304."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=True)
+    def test_accel_redirect(self):
+        """With nginx in front only the internal location is returned."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_ACCEL_PREFIX + self.file.file.name,
+        )
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(response.content, b'')
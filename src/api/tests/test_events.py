@@ -0,0 +1,177 @@
+import asyncio
+from http import HTTPStatus
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.streams import authorize, dispute_event_stream
+from api.tests.utils import create_dispute, create_user
+from disputes.models import DisputeEvent
+from users.models import AuthToken
+
+
+class DisputeEventsTests(TransactionTestCase):
+    """
+    The long-poll of the dispute events runs in the event loop.
+
+    The events are read in the threads of the pool with their own
+    connections, so the data of the tests is committed.
+    """
+
+    def setUp(self):
+        """Create a dispute of the user with an event."""
+        cache.clear()
+        self.user = create_user()
+        self.token = AuthToken.objects.create(user=self.user)
+        self.outsider = AuthToken.objects.create(user=create_user())
+        self.dispute = create_dispute(self.user)
+        self.event = DisputeEvent.objects.create(
+            dispute=self.dispute, kind=DisputeEvent.STATUS_CHANGED
+        )
+        self.url = reverse('api:dispute-events', args=[self.dispute.pk])
+
+    def get(self, token=None, **params):
+        """Send a GET of the events with the token of the user."""
+        token = token or self.token
+        return self.async_client.get(
+            self.url, params, AUTHORIZATION=f'Token {token.key}'
+        )
+
+    async def test_events(self):
+        """The events after the cursor are returned at once."""
+        response = await self.get(after=0)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [event['id'] for event in data['events']], [self.event.pk]
+        )
+        self.assertEqual(data['last_event_id'], self.event.pk)
+
+    async def test_timeout(self):
+        """Without new events the cursor is returned after the timeout."""
+        response = await self.get(timeout=0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {'events': [], 'last_event_id': self.event.pk}
+        )
+
+    async def test_errors(self):
+        """Invalid cursors, outsiders and anonymous users are refused."""
+        response = await self.get(after='latest')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('after', response.json())
+
+        response = await self.get(token=self.outsider)
+        self.assertEqual(response.status_code, 403)
+
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+
+class DisputeStreamTests(TransactionTestCase):
+    """The event stream checks the access while it is open."""
+
+    def setUp(self):
+        """Create a dispute of the user."""
+        cache.clear()
+        self.user = create_user()
+        self.token = AuthToken.objects.create(user=self.user)
+        self.dispute = create_dispute(self.user)
+        self.messages = []
+
+    async def receive(self):
+        """Wait for the client, which never disconnects."""
+        await asyncio.Event().wait()
+
+    async def send(self, message):
+        """Keep the message and log out after the stream opened."""
+        self.messages.append(message)
+        if message['type'] == 'http.response.body' and len(
+            self.messages
+        ) == 2:
+            await sync_to_async(self.token.delete)()
+
+    @mock.patch('api.streams.ACCESS_CHECK_INTERVAL', 0)
+    @mock.patch('api.streams.POLL_INTERVAL', 0.01)
+    async def test_access_lost(self):
+        """The stream ends once its token was deleted."""
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': f'/api/disputes/{self.dispute.pk}/stream/',
+            'query_string': b'',
+            'headers': [
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+        }
+        await asyncio.wait_for(
+            dispute_event_stream(scope, self.receive, self.send), timeout=5
+        )
+        self.assertEqual(self.messages[0]['status'], HTTPStatus.OK)
+        self.assertEqual(
+            self.messages[-1], {'type': 'http.response.body', 'body': b''}
+        )
+
+
+class StreamTicketTests(TestCase):
+    """The event stream opens with a ticket instead of the token."""
+
+    def setUp(self):
+        """Create a dispute of the user and the client of the user."""
+        cache.clear()
+        self.user = create_user()
+        self.token = AuthToken.objects.create(user=self.user)
+        self.dispute = create_dispute(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user, self.token)
+
+    def get_ticket(self, dispute):
+        """Issue a ticket of the stream of the dispute."""
+        response = self.client.post(
+            reverse('api:dispute-stream-ticket', args=[dispute.pk])
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data['ticket']
+
+    def authorize(self, dispute, **query):
+        """Return the status denying the stream of the dispute."""
+        query = {name: [value] for name, value in query.items()}
+        return authorize({}, query, dispute.pk)
+
+    def test_ticket(self):
+        """A ticket opens the stream of its dispute only."""
+        ticket = self.get_ticket(self.dispute)
+        self.assertIsNone(self.authorize(self.dispute, ticket=ticket))
+        other = create_dispute(self.user)
+        self.assertEqual(
+            self.authorize(other, ticket=ticket), HTTPStatus.UNAUTHORIZED
+        )
+
+    def test_token_in_query(self):
+        """The token is not accepted in the query."""
+        self.assertEqual(
+            self.authorize(self.dispute, token=self.token.key),
+            HTTPStatus.UNAUTHORIZED,
+        )
+
+    def test_logout(self):
+        """The ticket stops working with its token."""
+        ticket = self.get_ticket(self.dispute)
+        self.token.delete()
+        AuthToken.objects.create(user=self.user)
+        self.assertEqual(
+            self.authorize(self.dispute, ticket=ticket),
+            HTTPStatus.UNAUTHORIZED,
+        )
+
+    def test_outsider(self):
+        """Only the participants of the dispute get a ticket."""
+        self.client.force_authenticate(create_user())
+        response = self.client.post(
+            reverse('api:dispute-stream-ticket', args=[self.dispute.pk])
+        )
+        self.assertEqual(response.status_code, 403)
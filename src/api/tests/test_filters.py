@@ -0,0 +1,99 @@
+from django.urls import reverse
+
+from api.filters import MAX_ID
+from api.tests.utils import (
+    TEXT,
+    APIQueriesTestCase,
+    create_dispute,
+    create_user,
+)
+from disputes.models import Dispute
+from disputes.search import MARK_START, MARK_STOP
+
+
+class DisputeFilterTests(APIQueriesTestCase):
+    """The filters of the dispute list."""
+
+    def setUp(self):
+        """Create a dispute of the user and one of another creator."""
+        super().setUp()
+        self.opponent = create_user()
+        self.own = create_dispute(self.user, [self.opponent])
+        self.other = create_dispute(create_user(), [self.user])
+        self.url = reverse('api:disputes-list')
+
+    def get_ids(self, **params):
+        """Return the ids of the disputes listed with the filters."""
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return {dispute['id'] for dispute in response.data['results']}
+
+    def test_filters(self):
+        """The creator, opponent and date filters select the disputes."""
+        self.assertEqual(self.get_ids(creator=self.user.pk), {self.own.pk})
+        self.assertEqual(
+            self.get_ids(opponent=self.opponent.pk), {self.own.pk}
+        )
+        self.assertEqual(
+            self.get_ids(created_after='2000-01-01'),
+            {self.own.pk, self.other.pk},
+        )
+        self.assertEqual(self.get_ids(created_before='2000-01-01'), set())
+
+    def test_invalid_values(self):
+        """Invalid values are answered with 400 naming the parameter."""
+        invalid = [
+            ('created_after', '2024-02-30'),
+            ('created_before', '2024-13-45T00:00'),
+            ('closed_after', 'yesterday'),
+            ('has_new_comments_since', '2024-01-01T25:00'),
+            ('creator', '99999999999999999999999'),
+            ('creator', str(MAX_ID + 1)),
+            ('opponent', '-1'),
+            ('opponent', '١٢'),
+            ('status', 'unknown'),
+        ]
+        for param, value in invalid:
+            with self.subTest(param=param, value=value):
+                response = self.client.get(self.url, {param: value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.data)
+
+    def test_largest_id(self):
+        """The largest bigint id is a valid filter value."""
+        self.assertEqual(self.get_ids(creator=MAX_ID), set())
+
+
+class DisputeSearchTests(APIQueriesTestCase):
+    """The search of the disputes by their texts."""
+
+    def setUp(self):
+        """Create a dispute of the user with markup in the text."""
+        super().setUp()
+        self.dispute = Dispute.objects.create(
+            creator=self.user,
+            description=f'{TEXT} Перевозчик <img src=x onerror=alert(1)>',
+        )
+        self.url = reverse('api:disputes-search')
+
+    def test_snippet_escaped(self):
+        """The text of the snippet is escaped around the marked words."""
+        response = self.client.get(self.url, {'q': 'Перевозчик'})
+        self.assertEqual(response.status_code, 200)
+        [hit] = response.data
+        self.assertEqual(hit['id'], self.dispute.pk)
+        self.assertIn('<mark>Перевозчик</mark>', hit['snippet'])
+        self.assertIn('&lt;img src=x onerror=alert', hit['snippet'])
+        self.assertNotIn('<img', hit['snippet'])
+
+    def test_markers_in_text(self):
+        """Markers typed in the text do not let markup through."""
+        self.dispute.description = (
+            f'{TEXT} {MARK_START}<b>{MARK_STOP} Перевозчик {MARK_STOP}'
+        )
+        self.dispute.save()
+        response = self.client.get(self.url, {'q': 'Перевозчик'})
+        snippet = response.data[0]['snippet']
+        self.assertEqual(snippet.count('<mark>'), snippet.count('</mark>'))
+        self.assertNotIn('<b>', snippet)
+        self.assertNotIn(MARK_STOP, snippet)
@@ -0,0 +1,52 @@
+from django.urls import reverse
+
+from api.tests.utils import APIQueriesTestCase, create_dispute
+from disputes.models import Dispute
+
+
+class DisputePaginationTests(APIQueriesTestCase):
+    """The disputes are paged with cursors in a stable order."""
+
+    def setUp(self):
+        """Create a few disputes of the user."""
+        super().setUp()
+        for _ in range(7):
+            create_dispute(self.user)
+        self.url = reverse('api:disputes-list')
+        self.expected = list(
+            Dispute.objects.order_by('-created_at', 'id')
+            .values_list('id', flat=True)
+        )
+
+    def get_page(self, url, **params):
+        """Return the page of the URL."""
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages(self):
+        """The next cursors walk all disputes once, newest first."""
+        page = self.get_page(self.url, page_size=3)
+        self.assertNotIn('count', page)
+        self.assertIsNone(page['previous'])
+        ids = [dispute['id'] for dispute in page['results']]
+        while page['next']:
+            page = self.get_page(page['next'])
+            self.assertLessEqual(len(page['results']), 3)
+            ids += [dispute['id'] for dispute in page['results']]
+        self.assertEqual(ids, self.expected)
+
+    def test_new_dispute(self):
+        """A dispute created meanwhile does not shift the next page."""
+        page = self.get_page(self.url, page_size=3)
+        create_dispute(self.user)
+        page = self.get_page(page['next'])
+        self.assertEqual(
+            [dispute['id'] for dispute in page['results']],
+            self.expected[3:6],
+        )
+
+    def test_count(self):
+        """The total is counted on request only."""
+        page = self.get_page(self.url, page_size=3, count='true')
+        self.assertEqual(page['count'], 7)
@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.tests.utils import TEXT, create_dispute, create_user
+from config.db_router import PRIMARY
+from disputes.models import Dispute
+
+REPLICA = 'replica_test'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The safe requests read from the replica unless the user wrote.
+
+    The replica mirrors the test database over its own connection, so
+    the data is committed and the queries are told apart by the
+    connection which ran them.
+    """
+
+    databases = {PRIMARY, REPLICA}
+
+    def setUp(self):
+        """Create a started dispute of the user."""
+        cache.clear()
+        self.user = create_user()
+        self.dispute = create_dispute(self.user)
+        Dispute.objects.filter(pk=self.dispute.pk).update(
+            status=Dispute.STARTED
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        """Send a GET and return the queries of the primary and replica."""
+        with CaptureQueriesContext(connections[PRIMARY]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_reads_from_replica(self):
+        """The list and the detail of the disputes read the replica."""
+        for url in (
+            reverse('api:disputes-list'),
+            reverse('api:disputes-detail', args=[self.dispute.pk]),
+            reverse('api:comments-list', args=[self.dispute.pk]),
+        ):
+            with self.subTest(url=url):
+                primary, replica = self.get(url)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+
+    def test_sticks_to_primary_after_write(self):
+        """After a write the user reads from the primary, others not."""
+        url = reverse('api:comments-list', args=[self.dispute.pk])
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.post(url, {'content': TEXT})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(replica), 0)
+
+        primary, replica = self.get(url)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        self.client.force_authenticate(create_user(role='mediator'))
+        primary, replica = self.get(url)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
@@ -0,0 +1,68 @@
+from django.test import TestCase
+from rest_framework import serializers
+
+from api.serializers import OpponentField
+from api.tests.utils import create_user
+from users.models import CustomUser
+
+
+class OpponentSerializer(serializers.Serializer):
+    """Serializer with the opponents only."""
+
+    opponent = OpponentField()
+
+
+class OpponentFieldTests(TestCase):
+    """The opponents are checked with one query whatever their number."""
+
+    def setUp(self):
+        """Create the creator and a few possible opponents."""
+        self.creator = create_user()
+        self.opponents = [create_user() for _ in range(3)]
+        self.inactive = create_user()
+        self.inactive.is_active = False
+        self.inactive.save()
+        self.mediator = create_user(CustomUser.MEDIATOR)
+
+    def validate(self, user_ids):
+        """Return the serializer validated with the ids."""
+        serializer = OpponentSerializer(
+            data={'opponent': user_ids},
+            context={'creator_id': self.creator.pk},
+        )
+        serializer.is_valid()
+        return serializer
+
+    def test_valid(self):
+        """The unique ids of the opponents are validated in one query."""
+        user_ids = [user.pk for user in self.opponents]
+        with self.assertNumQueries(1):
+            serializer = self.validate(user_ids + user_ids[:1])
+        self.assertEqual(serializer.errors, {})
+        self.assertEqual(serializer.validated_data['opponent'], user_ids)
+
+    def test_self(self):
+        """The creator is refused without a query."""
+        with self.assertNumQueries(0):
+            serializer = self.validate(
+                [self.opponents[0].pk, self.creator.pk]
+            )
+        self.assertEqual(
+            serializer.errors['opponent'],
+            [OpponentField.default_error_messages['self']],
+        )
+
+    def test_invalid_users(self):
+        """Unknown, inactive users and mediators are refused in one query."""
+        missing = CustomUser.objects.order_by('-pk').first().pk + 1
+        for user_id, message in (
+            (missing, f'Invalid pk "{missing}" - object does not exist.'),
+            (self.inactive.pk, f'User "{self.inactive.pk}" is not active.'),
+            (self.mediator.pk, 'Mediator cannot be an opponent.'),
+        ):
+            with self.subTest(message=message):
+                with self.assertNumQueries(1):
+                    serializer = self.validate(
+                        [self.opponents[0].pk, user_id, self.opponents[1].pk]
+                    )
+                self.assertEqual(serializer.errors['opponent'], [message])
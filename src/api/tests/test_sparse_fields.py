@@ -0,0 +1,65 @@
+from django.urls import reverse
+
+from api.tests.utils import APIQueriesTestCase, create_dispute, create_user
+
+
+class SparseFieldsTests(APIQueriesTestCase):
+    """The dispute responses are shaped with '?fields=' and '?expand='."""
+
+    def setUp(self):
+        """Create a dispute of the user with an opponent and comments."""
+        super().setUp()
+        self.opponent = create_user()
+        self.dispute = create_dispute(
+            self.user, [self.opponent], files=1, comments=2
+        )
+        self.list_url = reverse('api:disputes-list')
+        self.detail_url = reverse(
+            'api:disputes-detail', args=[self.dispute.pk]
+        )
+
+    def get(self, url, **params):
+        """Return the response of a GET with the parameters."""
+        return self.client.get(url, params)
+
+    def get_item(self, **params):
+        """Return the dispute of the list page."""
+        response = self.get(self.list_url, **params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]
+
+    def test_compact_list(self):
+        """The list leaves out the threads and the files by default."""
+        item = self.get_item()
+        self.assertNotIn('comments', item)
+        self.assertNotIn('file', item)
+        self.assertEqual(item['opponent'], [self.opponent.pk])
+        self.assertEqual(item['last_comment']['sender']['id'], self.user.pk)
+
+    def test_expand(self):
+        """The expanded blocks are added to the list items."""
+        item = self.get_item(expand='comments,file,opponent')
+        self.assertEqual(len(item['comments']), 2)
+        self.assertEqual(len(item['file']), 1)
+        self.assertEqual(item['opponent'][0]['id'], self.opponent.pk)
+
+    def test_fields(self):
+        """Only the requested fields are returned."""
+        item = self.get_item(fields='id,status')
+        self.assertEqual(set(item), {'id', 'status'})
+
+        response = self.get(self.detail_url, fields='id,comments')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'id', 'comments'})
+
+    def test_unknown_fields(self):
+        """Unknown names are refused with 400 naming the parameter."""
+        for url, param, value in (
+            (self.list_url, 'fields', 'id,secret'),
+            (self.list_url, 'expand', 'creator'),
+            (self.detail_url, 'fields', 'passwords'),
+        ):
+            with self.subTest(url=url, param=param):
+                response = self.get(url, **{param: value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.data)
@@ -0,0 +1,112 @@
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api.tests.utils import APIQueriesTestCase
+from disputes.models import Upload
+from disputes.uploads import receive_part
+
+CONTENT = b'%PDF-' + bytes(range(256)) * 4
+
+
+class InterruptedStream(io.BytesIO):
+    """Stream of a client which disconnects after its bytes."""
+
+    def read(self, size=-1):
+        """Return the bytes and then fail like a lost connection."""
+        block = super().read(size)
+        if not block:
+            raise OSError('The client disconnected.')
+        return block
+
+
+class UploadTests(APIQueriesTestCase):
+    """The chunked uploads are received in resumable parts."""
+
+    def setUp(self):
+        """Receive the parts into an empty directory."""
+        super().setUp()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        chunk_dir = override_settings(UPLOAD_CHUNK_DIR=location)
+        chunk_dir.enable()
+        self.addCleanup(chunk_dir.disable)
+        response = self.client.post(reverse('api:uploads-list'), {
+            'filename': 'claim.pdf', 'size': len(CONTENT),
+        })
+        self.assertEqual(response.status_code, 201)
+        self.upload = Upload.objects.get(pk=response.data['id'])
+        self.url = reverse('api:uploads-detail', args=[self.upload.pk])
+
+    def send(self, start, content):
+        """Send the part of the file starting at start."""
+        end = start + len(content) - 1
+        return self.client.patch(
+            self.url,
+            content,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(CONTENT)}',
+        )
+
+    def test_parts(self):
+        """The parts complete the upload with the checksum of the file."""
+        response = self.send(0, CONTENT[:100])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['offset'], 100)
+        response = self.send(100, CONTENT[100:])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_complete'])
+        self.assertEqual(
+            response.data['checksum'], hashlib.sha256(CONTENT).hexdigest()
+        )
+
+    def test_resume(self):
+        """The bytes of an interrupted part are kept and continued."""
+        stream = InterruptedStream(CONTENT[:300])
+        with self.assertRaises(OSError):
+            receive_part(self.upload, stream, 0, len(CONTENT))
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.offset, 300)
+        self.assertIsNone(self.upload.receiving_until)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['offset'], 300)
+        response = self.send(300, CONTENT[300:])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['checksum'], hashlib.sha256(CONTENT).hexdigest()
+        )
+
+    def test_offset_mismatch(self):
+        """A part not starting at the offset is refused with the offset."""
+        self.send(0, CONTENT[:100])
+        response = self.send(50, CONTENT[50:150])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 100)
+
+    def test_part_in_progress(self):
+        """A part is refused while another one is received."""
+        Upload.objects.filter(pk=self.upload.pk).update(
+            receiving_until=timezone.now() + timedelta(minutes=1)
+        )
+        response = self.send(0, CONTENT[:100])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 0)
+
+        Upload.objects.filter(pk=self.upload.pk).update(
+            receiving_until=timezone.now() - timedelta(minutes=1)
+        )
+        response = self.send(0, CONTENT[:100])
+        self.assertEqual(response.status_code, 200)
+
+    def test_signature(self):
+        """A file whose content does not match its type is deleted."""
+        response = self.send(0, b'\x89PNG\r\n\x1a\n' + CONTENT[8:])
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(Upload.objects.filter(pk=self.upload.pk).exists())
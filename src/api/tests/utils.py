@@ -0,0 +1,58 @@
+from itertools import count
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from rest_framework.test import APIClient, APITestCase
+
+from disputes.models import Comment, Dispute, FileComment, FileDispute
+from users.models import CustomUser
+
+TEXT = 'Текст спора достаточной длины для проверки.'
+
+_numbers = count(1)
+
+
+def create_user(role=CustomUser.USER):
+    """Create a user with a unique email and phone number."""
+    number = next(_numbers)
+    return CustomUser.objects.create_user(
+        email=f'user{number}@example.com',
+        password='password',
+        first_name='Имя',
+        last_name='Фамилия',
+        phone_number=f'+7900{number:07d}',
+        role=role,
+    )
+
+
+def create_dispute(creator, opponents=(), files=0, comments=0):
+    """Create a dispute with visible opponents, files and comments."""
+    dispute = Dispute.objects.create(
+        creator=creator, description=TEXT, add_opponent=True
+    )
+    dispute.opponent.add(*opponents)
+    for number in range(files):
+        FileDispute.objects.create(
+            dispute=dispute,
+            file=ContentFile(f'{dispute.pk}-{number}'.encode(), 'file.txt'),
+        )
+    for number in range(comments):
+        comment = Comment.objects.create(
+            dispute=dispute, sender=creator, content=TEXT
+        )
+        FileComment.objects.create(
+            comment=comment,
+            file=ContentFile(f'{comment.pk}-{number}'.encode(), 'file.txt'),
+        )
+    return dispute
+
+
+class APIQueriesTestCase(APITestCase):
+    """Test case of the API with the caches emptied before every test."""
+
+    def setUp(self):
+        """Clear the shared cache and create the authenticated client."""
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
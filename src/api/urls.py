@@ -4,7 +4,16 @@ from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 from rest_framework.routers import DefaultRouter
 
-from .views import CommentViewSet, CustomUserViewSet, DisputeViewSet
+from . import async_views
+from .views import (
+    CommentFileDownloadView,
+    CommentViewSet,
+    CustomUserViewSet,
+    DisputeFileDownloadView,
+    DisputeStreamTicketView,
+    DisputeViewSet,
+    UploadViewSet,
+)
 
 app_name = 'api'
 
@@ -17,6 +26,7 @@ router.register(
     CommentViewSet,
     basename='comments'
 )
+router.register('uploads', UploadViewSet, basename='uploads')
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -34,6 +44,24 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(router.urls)),
+    path('disputes/<int:dispute_id>/events/', async_views.dispute_events,
+         name='dispute-events'),
+    path('disputes/<int:dispute_id>/stream/ticket/',
+         DisputeStreamTicketView.as_view(), name='dispute-stream-ticket'),
+    path('files/disputes/<int:pk>/', DisputeFileDownloadView.as_view(),
+         name='dispute-file'),
+    path('files/comments/<int:pk>/', CommentFileDownloadView.as_view(),
+         name='comment-file'),
+    path('files/disputes/<int:pk>/<slug:size>/',
+         DisputeFileDownloadView.as_view(), name='dispute-file-preview'),
+    path('files/comments/<int:pk>/<slug:size>/',
+         CommentFileDownloadView.as_view(), name='comment-file-preview'),
+    path('async/disputes/', async_views.dispute_list,
+         name='async-dispute-list'),
+    path('async/disputes/<int:pk>/', async_views.dispute_detail,
+         name='async-dispute-detail'),
+    path('async/disputes/<int:dispute_id>/comments/',
+         async_views.comment_list, name='async-comment-list'),
     re_path(r'^swagger(?P<format>\.json|\.yaml)$',
             schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger',
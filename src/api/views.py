@@ -1,26 +1,84 @@
+import re
 from datetime import datetime
 
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
-from rest_framework import filters, status
+from rest_framework import filters, mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.views import APIView
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
-from api.mixins import CreteListModelViewSet
-from api.pagination import DisputePagination
+from api.cache import (
+    get_dispute_fragments,
+    get_dispute_users,
+    get_fragment_variant,
+)
+from api.context import get_dispute_context
+from api.downloads import serve_file, serve_preview
+from api.filters import DisputeFilterBackend, filter_comments_since
+from api.mixins import (
+    ConditionalGetMixin,
+    CreteListModelViewSet,
+    ReplicaReadMixin,
+)
+from api.pagination import CommentPagination, DisputePagination
 from api.permissions import CommentsPermission, IsCreatorOrMediatorOrOpponent
 from api.serializers import (
     CommentSerializer,
     CustomUserSerializer,
+    DisputeListSerializer,
+    DisputeSearchSerializer,
     DisputeSerializer,
     PatchDisputeSerializer,
+    UploadSerializer,
+)
+from api.streams import STREAM_TICKET_TIMEOUT, issue_stream_ticket
+from disputes.models import (
+    Comment,
+    Dispute,
+    FileComment,
+    FileDispute,
+    Upload,
 )
-from disputes.models import Comment, Dispute
+from disputes.previews import PREVIEW_SIZES, is_previewable
+from disputes.search import search_disputes
+from disputes.uploads import UploadError, receive_part
+from users.autocomplete import get_index
 from users.models import CustomUser
 
 
-class CustomUserViewSet(UserViewSet):
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 25
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+
+DISPUTE_BLOCKS = ('opponent', 'file', 'comments', 'last_comment')
+
+# Seconds after which a preview being rendered is requested again.
+PREVIEW_RETRY_AFTER = 5
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+UPLOAD_ERROR_STATUSES = {
+    UploadError.OFFSET: status.HTTP_409_CONFLICT,
+    UploadError.BUSY: status.HTTP_409_CONFLICT,
+    UploadError.SIZE: status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    UploadError.TYPE: status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+}
+
+COMMENT_STATUS_ERRORS = {
+    'closed': 'Cannot add a comment to a closed dispute.',
+    'not_started': 'Cannot add a comment to a not started dispute.',
+}
+
+
+class CustomUserViewSet(ReplicaReadMixin, ConditionalGetMixin, UserViewSet):
     """A viewset that provides CRUD operations for users."""
 
     queryset = CustomUser.objects.all()
@@ -28,35 +86,139 @@ class CustomUserViewSet(UserViewSet):
     filter_backends = (filters.SearchFilter,)
     search_fields = ('first_name', 'last_name')
 
+    def get_response_version(self):
+        """Version the profile of the current user."""
+        if self.action == 'me':
+            updated_at = self.request.user.updated_at
+            return updated_at, updated_at.timestamp()
+        return None
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Suggest users by the beginning of their name or email.
+
+        Used to pick opponents: returns at most 'limit' compact user
+        cards ranked by the match, without the requesting user.
+        """
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else AUTOCOMPLETE_DEFAULT_LIMIT
+        return Response(get_index().search(
+            request.query_params.get('q', ''),
+            min(limit, AUTOCOMPLETE_MAX_LIMIT),
+            exclude=(request.user.id,),
+        ))
+
+
+def get_comment_queryset():
+    """
+    Return comments with their files loaded in bulk.
 
-def check_opponent(func):
+    The senders are rendered from the cache of user cards, so the
+    users are not joined.
     """
-    Ensure the request user does not set themselves as an opponent.
+    return Comment.objects.prefetch_related('file')
+
 
-    A decorator that checks if
-    the request user is attempting to
-    set themselves as an opponent.
+def get_shown_users_version(users):
     """
+    Return the versions of the users returned by get_dispute_users().
 
-    def wrapper(self, request, *args, **kwargs):
-        opponent_ids = request.data.get('opponent', [])
-        opponent_ids = [int(opponent_id) for opponent_id in opponent_ids]
-        if request.user.id in opponent_ids:
-            return Response(
-                {'opponent': ['You cannot set yourself as an opponent.']},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+    The versions are a sorted list of (user id, version) pairs for the
+    ETag and their latest time for Last-Modified, so the validators
+    only change with the users who are actually shown.
+    """
+    _, versions = users
+    versions = sorted(versions.items())
+    return versions, max([version for _, version in versions], default=0)
 
-        return func(self, request, *args, **kwargs)
 
-    return wrapper
+def parse_query_list(value):
+    """Split a comma-separated query parameter into a set of names."""
+    if not value:
+        return set()
+    return {name.strip() for name in value.split(',') if name.strip()}
 
 
-class DisputeViewSet(ModelViewSet):
+def get_sparse_context(query_params):
+    """
+    Return the serializer context of '?fields=' and '?expand='.
+
+    Raises ValidationError naming the parameter if it lists a field
+    the disputes do not have, so a typo is not silently ignored.
+    """
+    context = {
+        'fields': parse_query_list(query_params.get('fields')),
+        'expand': parse_query_list(query_params.get('expand')),
+    }
+    known = {
+        'fields': set(DisputeSerializer.Meta.fields),
+        'expand': set(DisputeListSerializer.EXPANDABLE_FIELDS),
+    }
+    errors = {}
+    for param, names in context.items():
+        unknown = names - known[param]
+        if unknown:
+            errors[param] = [f'Unknown fields: {", ".join(sorted(unknown))}.']
+    if errors:
+        raise ValidationError(errors)
+    return context
+
+
+def get_dispute_blocks(query_params, detail):
+    """Return the nested blocks a dispute response is going to contain."""
+    if detail:
+        blocks = set(DISPUTE_BLOCKS)
+    else:
+        blocks = {'opponent', 'last_comment'}
+        blocks |= (parse_query_list(query_params.get('expand'))
+                   & set(DisputeListSerializer.EXPANDABLE_FIELDS))
+    fields = parse_query_list(query_params.get('fields'))
+    if fields:
+        blocks &= fields
+    return blocks
+
+
+def get_dispute_prefetches(blocks=DISPUTE_BLOCKS):
+    """
+    Return the prefetch plan used to serialize a page of disputes.
+
+    Every requested nested block of the dispute is loaded with
+    one query for the whole page, so the number of queries does
+    not depend on the page size. The last comment of every dispute
+    is fetched separately into the 'prefetched_last_comment' attribute.
+    """
+    prefetches = []
+    if 'opponent' in blocks:
+        prefetches.append(
+            Prefetch('opponent', queryset=CustomUser.objects.only('id'))
+        )
+    if 'file' in blocks:
+        prefetches.append(Prefetch('file'))
+    if 'comments' in blocks:
+        prefetches.append(
+            Prefetch('comments', queryset=get_comment_queryset())
+        )
+    if 'last_comment' in blocks:
+        latest_comment = Comment.objects.filter(
+            dispute=OuterRef('dispute')
+        ).order_by('-created_at', '-id').values('id')[:1]
+        prefetches.append(Prefetch(
+            'comments',
+            queryset=get_comment_queryset().filter(
+                id=Subquery(latest_comment)
+            ),
+            to_attr='prefetched_last_comment'
+        ))
+    return prefetches
+
+
+class DisputeViewSet(ReplicaReadMixin, ConditionalGetMixin, ModelViewSet):
     """A viewset that provides CRUD operations for disputes."""
 
     serializer_class = DisputeSerializer
     pagination_class = DisputePagination
+    filter_backends = (DisputeFilterBackend,)
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = (IsCreatorOrMediatorOrOpponent,)
     parser_class = [MultiPartParser, FormParser]
@@ -65,14 +227,149 @@ class DisputeViewSet(ModelViewSet):
         """Change the queryset for DisputeViewSet."""
         user = self.request.user
         if user.is_authenticated:
-            if user.is_mediator:
-                return Dispute.objects.all()
-            else:
-                return (user.disputes_creator.all()
-                        | user.disputes_opponent.filter(add_opponent=True)
-                        ).distinct()
-
-    @check_opponent
+            queryset = Dispute.objects.visible_to(user)
+            return queryset.prefetch_related(
+                *get_dispute_prefetches(self.get_dispute_blocks())
+            )
+
+    def get_page_rows(self):
+        """
+        Return (id, updated_at) of the disputes of the requested page.
+
+        The rows are read with a light query over the same filters and
+        cursor as the list, once per request, and the paginator keeps
+        the state of the page for the links of the response.
+        """
+        if not hasattr(self, '_page_rows'):
+            page = self.paginate_queryset(
+                self.filter_queryset(
+                    Dispute.objects.visible_to(self.request.user)
+                ).values('id', 'created_at', 'updated_at')
+            )
+            self._page_rows = [
+                (row['id'], row['updated_at']) for row in page
+            ]
+        return self._page_rows
+
+    def get_detail_rows(self):
+        """Return (id, updated_at) of the requested dispute if visible."""
+        if not hasattr(self, '_detail_rows'):
+            self._detail_rows = list(
+                Dispute.objects.visible_to(self.request.user)
+                .filter(pk=self.kwargs['pk'])
+                .values_list('id', 'updated_at')
+            )
+        return self._detail_rows
+
+    def get_rows_users(self, rows):
+        """Return the users shown by the rows, once per request."""
+        if not hasattr(self, '_rows_users'):
+            self._rows_users = get_dispute_users(rows)
+        return self._rows_users
+
+    def get_response_version(self):
+        """
+        Version the list page and the detail of the disputes.
+
+        The list is versioned by the ids and 'updated_at' of the
+        disputes of the requested page, the detail by 'updated_at' of
+        the dispute. Both depend on the versions of the users shown.
+        """
+        if self.action == 'list':
+            rows = self.get_page_rows()
+            values = (rows, self.paginator.count)
+        elif self.action == 'retrieve':
+            rows = self.get_detail_rows()
+            if not rows:
+                return None
+            values = (rows,)
+        else:
+            return None
+        users_version, users_modified = get_shown_users_version(
+            self.get_rows_users(rows)
+        )
+        return values + (users_version,), max(
+            [users_modified]
+            + [updated_at.timestamp() for _, updated_at in rows]
+        )
+
+    def get_fragments(self, rows):
+        """
+        Return the cached representations of the disputes of the rows.
+
+        Only the disputes missing in the cache are loaded with their
+        nested blocks and serialized.
+        """
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+
+        def build(dispute_ids):
+            disputes = list(self.get_queryset().filter(pk__in=dispute_ids))
+            for dispute in disputes:
+                self.check_object_permissions(self.request, dispute)
+            serializer = serializer_class(disputes, many=True, context=context)
+            return zip(disputes, serializer.data)
+
+        return get_dispute_fragments(
+            rows,
+            self.get_rows_users(rows),
+            get_fragment_variant(serializer_class, context),
+            build,
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Assemble the page of disputes from the cached fragments."""
+        return self.get_paginated_response(
+            self.get_fragments(self.get_page_rows())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the dispute from the cached fragments."""
+        fragments = self.get_fragments(self.get_detail_rows())
+        if not fragments:
+            raise NotFound()
+        return Response(fragments[0])
+
+    def get_dispute_blocks(self):
+        """Return the nested blocks the response is going to contain."""
+        return get_dispute_blocks(
+            self.request.query_params, detail=self.action != 'list'
+        )
+
+    def get_serializer_class(self):
+        """Use the compact serializer for the list of disputes."""
+        if self.action == 'list':
+            return DisputeListSerializer
+        return DisputeSerializer
+
+    def get_serializer_context(self):
+        """Pass the requested sparse fieldset and expansions."""
+        context = super().get_serializer_context()
+        if self.request.method in SAFE_METHODS:
+            context.update(get_sparse_context(self.request.query_params))
+        return context
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Search the disputes by the text of descriptions and comments.
+
+        Returns at most 'limit' hits ordered by relevance, with
+        highlighted snippets. The same visibility rules and
+        filters apply as for the list of disputes.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This parameter is required.']})
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else SEARCH_DEFAULT_LIMIT
+
+        queryset = self.filter_queryset(
+            Dispute.objects.visible_to(request.user)
+        )
+        hits = search_disputes(queryset, query)[:min(limit, SEARCH_MAX_LIMIT)]
+        return Response(DisputeSearchSerializer(hits, many=True).data)
+
     def create(self, request, *args, **kwargs):
         """Change the POST request for DisputeViewSet."""
         if request.user.is_mediator:
@@ -81,13 +378,15 @@ class DisputeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        serializer = DisputeSerializer(data=request.data)
+        serializer = DisputeSerializer(data=request.data, context={
+            'creator_id': request.user.id,
+            'uploader_id': request.user.id,
+        })
         if serializer.is_valid():
             serializer.save(creator=self.request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @check_opponent
     def partial_update(self, request, pk=None):
         """Change the PATCH request for DisputeViewSet."""
         dispute = self.get_object()
@@ -101,7 +400,7 @@ class DisputeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if user != dispute.creator and 'description' in data:
+        if user.id != dispute.creator_id and 'description' in data:
             return Response(
                 {'description': ['Mediator cannot change description.']},
                 status=status.HTTP_400_BAD_REQUEST
@@ -119,7 +418,7 @@ class DisputeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if dispute.creator == user and dispute.status != 'not_started':
+        if dispute.creator_id == user.id and dispute.status != 'not_started':
             return Response(
                 {'status': [('Author cannot make changes if '
                              'status is not "not_started".')]},
@@ -131,7 +430,12 @@ class DisputeViewSet(ModelViewSet):
         else:
             dispute.closed_at = None
 
-        serializer = PatchDisputeSerializer(dispute, data=data, partial=True)
+        serializer = PatchDisputeSerializer(
+            dispute,
+            data=data,
+            partial=True,
+            context={'creator_id': dispute.creator_id},
+        )
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -157,7 +461,9 @@ class DisputeViewSet(ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CommentViewSet(CreteListModelViewSet):
+class CommentViewSet(
+    ReplicaReadMixin, ConditionalGetMixin, CreteListModelViewSet
+):
     """
     A viewset that provides CRUD operations for comments.
 
@@ -168,33 +474,198 @@ class CommentViewSet(CreteListModelViewSet):
 
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    pagination_class = CommentPagination
     parser_class = [MultiPartParser, FormParser]
     permission_classes = (CommentsPermission,)
 
+    def get_dispute_context(self):
+        """Return the dispute context shared with the permissions."""
+        return get_dispute_context(self.request, self.kwargs.get('dispute_id'))
+
+    def get_response_version(self):
+        """Version the comments by 'updated_at' of their dispute."""
+        if self.action != 'list':
+            return None
+        dispute = self.get_dispute_context().dispute
+        users_version, users_modified = get_shown_users_version(
+            get_dispute_users([(dispute.pk, dispute.updated_at)])
+        )
+        return (
+            (dispute.pk, dispute.updated_at, users_version),
+            max(dispute.updated_at.timestamp(), users_modified),
+        )
+
     def get_queryset(self):
         """Change the queryset for CommentViewSet."""
-        dispute_id = self.kwargs.get('dispute_id')
-        dispute = get_object_or_404(Dispute, id=dispute_id)
-        return dispute.comments.all()
+        dispute = self.get_dispute_context().dispute
+        queryset = get_comment_queryset().filter(dispute=dispute)
+        since = self.request.query_params.get('since')
+        if since:
+            queryset = filter_comments_since(queryset, since)
+        return queryset
 
     def create(self, request, *args, **kwargs):
         """Change the POST request for CommentViewSet."""
-        dispute_id = self.kwargs.get('dispute_id')
-        dispute = get_object_or_404(Dispute, id=dispute_id)
+        dispute = self.get_dispute_context().dispute
 
-        if dispute.status == 'closed':
+        if dispute.status in COMMENT_STATUS_ERRORS:
             return Response(
-                {'detail': 'Cannot add a comment to a closed dispute.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        if dispute.status == 'not_started':
-            return Response(
-                {'detail': 'Cannot add a comment to a not started dispute.'},
+                {'detail': COMMENT_STATUS_ERRORS[dispute.status]},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        serializer = CommentSerializer(data=request.data)
+        serializer = CommentSerializer(
+            data=request.data, context={'uploader_id': request.user.id}
+        )
         if serializer.is_valid():
             serializer.save(sender=self.request.user, dispute=dispute)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DisputeStreamTicketView(APIView):
+    """
+    Ticket opening the event stream of a dispute.
+
+    EventSource cannot send the Authorization header, so the browser
+    asks for a ticket first and passes it as 'ticket' in the URL of
+    the stream instead of the token.
+    """
+
+    permission_classes = (CommentsPermission,)
+
+    def post(self, request, dispute_id):
+        """Issue a ticket of the stream for the token of the request."""
+        return Response({
+            'ticket': issue_stream_ticket(request.auth, dispute_id),
+            'expires_in': STREAM_TICKET_TIMEOUT,
+        }, status=status.HTTP_201_CREATED)
+
+
+class UploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    """
+    Chunked, resumable uploads of files.
+
+    POST creates an upload from the name and the size of the file,
+    so disallowed types and sizes are rejected before any content is
+    sent. The content follows in PATCH requests, each carrying the
+    next part of the file as the raw body and its position in the
+    Content-Range header, e.g. 'bytes 0-1048575/5242880'. After an
+    interruption GET returns the offset to continue from. The id of
+    a complete upload is attached with 'uploads' of a new dispute or
+    comment.
+    """
+
+    serializer_class = UploadSerializer
+    http_method_names = ['get', 'post', 'patch', 'delete']
+
+    def get_queryset(self):
+        """Return the uploads of the user."""
+        user = self.request.user
+        if user.is_authenticated:
+            return Upload.objects.filter(owner=user)
+        return Upload.objects.none()
+
+    def perform_create(self, serializer):
+        """Save the owner of the upload."""
+        serializer.save(owner=self.request.user)
+
+    def partial_update(self, request, pk=None):
+        """Receive the next part of the file."""
+        match = CONTENT_RANGE_RE.match(
+            request.headers.get('Content-Range', '')
+        )
+        if match is None:
+            return Response(
+                {'detail': 'The Content-Range header is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start, end, size = map(int, match.groups())
+        length = end - start + 1
+        if length < 1 or request.META.get('CONTENT_LENGTH') != str(length):
+            return Response(
+                {'detail': 'Content-Range does not match the body.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # The part is read outside of a transaction, the upload is
+        # claimed for it by disputes.uploads.receive_part().
+        upload = get_object_or_404(self.get_queryset(), pk=pk)
+        if size != upload.size:
+            return Response(
+                {'detail': 'The size of the file has changed.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            receive_part(upload, request.stream, start, length)
+        except UploadError as error:
+            if error.code == UploadError.TYPE:
+                upload.delete()
+            return Response(
+                {'detail': error.message, 'offset': upload.offset},
+                status=UPLOAD_ERROR_STATUSES[error.code],
+            )
+        return Response(self.get_serializer(upload).data)
+
+
+class FileDownloadView(ReplicaReadMixin, APIView):
+    """
+    Download of a dispute or comment file by the participants.
+
+    The file is visible to the users who see its dispute, as in the
+    DisputeViewSet and the CommentsPermission, which is checked
+    together with the lookup of the file in one query. The transfer
+    itself is handed to nginx (see api.downloads). With 'size' one
+    of the PREVIEW_SIZES the downscaled preview of an image or a PDF
+    is sent instead, or 404 with Retry-After while it is rendered.
+    """
+
+    model = None
+    dispute_lookup = None
+
+    def get(self, request, pk, size=None):
+        """Check the access to the file and send it or its preview."""
+        files = self.model.objects.only(
+            'file', 'size', 'original_name', 'content_type', 'checksum'
+        )
+        if not request.user.is_mediator:
+            files = files.filter(**{
+                f'{self.dispute_lookup}__participants__user': request.user,
+                f'{self.dispute_lookup}__participants__is_visible': True,
+            })
+        instance = get_object_or_404(files, pk=pk)
+        if not instance.file:
+            raise NotFound
+        if size is None:
+            return serve_file(request, instance)
+        if size not in PREVIEW_SIZES or not (
+            instance.checksum and is_previewable(instance.content_type)
+        ):
+            raise NotFound
+        response = serve_preview(request, instance, size)
+        if response is None:
+            return Response(
+                {'detail': 'The preview is not ready yet.'},
+                status=status.HTTP_404_NOT_FOUND,
+                headers={'Retry-After': str(PREVIEW_RETRY_AFTER)},
+            )
+        return response
+
+
+class DisputeFileDownloadView(FileDownloadView):
+    """Download of a file of a dispute."""
+
+    model = FileDispute
+    dispute_lookup = 'dispute'
+
+
+class CommentFileDownloadView(FileDownloadView):
+    """Download of a file of a comment."""
+
+    model = FileComment
+    dispute_lookup = 'comment__dispute'
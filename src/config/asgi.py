@@ -3,5 +3,20 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Persistent connections are kept per thread, and the async views run
+# their queries in the threads of the event loop executor, where they
+# would be left open. Only the WSGI workers keep the connections.
+os.environ['CONN_MAX_AGE'] = '0'
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up by get_asgi_application().
+from api.streams import STREAM_PATH_RE, dispute_event_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Serve the dispute event streams and pass the rest to Django."""
+    if scope['type'] == 'http' and STREAM_PATH_RE.match(scope['path']):
+        await dispute_event_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,75 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary in the block unless replicas are enabled."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def enable_replica_reads():
+    """
+    Send the reads of the current request to a replica.
+
+    The replica is picked once, so all the queries of the request
+    see the same state of the data.
+    """
+    if settings.DATABASE_REPLICAS:
+        _read_alias.set(random.choice(settings.DATABASE_REPLICAS))
+
+
+def get_sticky_key(user_id):
+    """Return the cache key marking the recent writes of a user."""
+    return f'db:primary:{user_id}'
+
+
+def stick_to_primary(user_id):
+    """Keep the reads of a user on the primary after a write."""
+    if settings.DATABASE_REPLICAS:
+        cache.set(
+            get_sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS
+        )
+
+
+def is_stuck_to_primary(user_id):
+    """Check if the user has written recently."""
+    return bool(cache.get(get_sticky_key(user_id)))
+
+
+class PrimaryReplicaRouter:
+    """
+    Route the reads of safe API requests to the read replicas.
+
+    Reads go to one of DATABASE_REPLICAS only inside a request which
+    called enable_replica_reads(), everything else, including the
+    writes and the migrations, uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        """Return the replica of the request if enabled."""
+        return _read_alias.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary."""
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations, the replicas hold the same data."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Migrate the primary only, the replicas copy its schema."""
+        return db == PRIMARY
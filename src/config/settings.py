@@ -24,13 +24,13 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'rest_framework.authtoken',
     'corsheaders',
     'djoser',
     'drf_yasg',
     'disputes.apps.DisputesConfig',
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
@@ -75,9 +75,59 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Kept by the WSGI workers only, config.asgi sets it to 0.
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas of the default database, 'host[:port]' separated by commas.
+# Safe requests of the API read from them, see config.db_router.
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+    filter(None, os.getenv('REPLICA_DB_HOSTS', '').split(',')), start=1
+):
+    host, _, port = address.strip().partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# A second connection to the primary, never read from unless it is put
+# into DATABASE_REPLICAS. The routing tests use it as the replica, in
+# the tests it mirrors the test database.
+DATABASES['replica_test'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
+
+DATABASE_ROUTERS = ['config.db_router.PrimaryReplicaRouter']
+
+# The tests read from the primary, see config.test_runner.
+TEST_RUNNER = 'config.test_runner.TestRunner'
+
+# Seconds the reads of a user stay on the primary after their write.
+REPLICA_STICKY_SECONDS = 5
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -116,6 +166,38 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# The attachments are downloaded through api.downloads after the access
+# check. With MEDIA_ACCEL_REDIRECT the file is sent by nginx from its
+# internal MEDIA_ACCEL_PREFIX location, otherwise by the worker. It is
+# enabled by the deployments in infra, which serve that location.
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', 'False') == 'True'
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Chunked uploads: the parts are appended to files in UPLOAD_CHUNK_DIR
+# until the upload is complete and attached to a dispute or comment.
+UPLOAD_CHUNK_DIR = os.getenv(
+    'UPLOAD_CHUNK_DIR', os.path.join(BASE_DIR, 'chunks')
+)
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 30 * 1024 * 1024))
+# A part is received under a lease, a part not finished in this time
+# is considered lost and the upload may be continued by another one.
+UPLOAD_PART_LEASE_SECONDS = int(
+    os.getenv('UPLOAD_PART_LEASE_SECONDS', 10 * 60)
+)
+
+# Background jobs run by 'manage.py runworkers' (see jobs.queue). A job
+# running longer than JOB_LEASE_SECONDS is considered lost and rerun.
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+JOB_LEASE_SECONDS = 10 * 60
+
+# Periodic jobs: the task names and the seconds between their runs.
+JOB_SCHEDULE = {
+    'users.purge_expired_tokens': 60 * 60,
+    'disputes.purge_stale_uploads': 60 * 60,
+    'disputes.purge_dispute_events': 24 * 60 * 60,
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 USER_FIELD = 100
@@ -147,7 +229,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S',
 
@@ -164,5 +246,17 @@ DJOSER = {
         'user': ['rest_framework.permissions.IsAuthenticated'],
         'user_list': ['rest_framework.permissions.IsAuthenticated'],
     },
-    'HIDE_USERS': False
+    'HIDE_USERS': False,
+    'TOKEN_MODEL': 'users.models.AuthToken',
 }
+
+# Days after the login when the API tokens expire, 0 for never.
+TOKEN_TTL_DAYS = int(os.getenv('TOKEN_TTL_DAYS', '0'))
+
+# Seconds the users resolved by their tokens are kept in the cache.
+TOKEN_CACHE_TIMEOUT = 60
+
+# Seconds the data built from the users, the user cards and the dispute
+# fragments, is kept in the cache. It is versioned by the users, the
+# timeout only bounds how long data from a lagging replica is served.
+USERS_CACHE_TIMEOUT = 10 * 60
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner reading from the primary.
+
+    The replicas configured in the environment are not used by the
+    tests, the routing tests enable the 'replica_test' mirror instead.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        """Disable the replicas for the tests."""
+        super().setup_test_environment(**kwargs)
+        settings.DATABASE_REPLICAS = []
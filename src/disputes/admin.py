@@ -1,6 +1,13 @@
 from django.contrib import admin
 
-from disputes.models import Comment, Dispute, FileComment, FileDispute
+from disputes.models import (
+    Blob,
+    Comment,
+    Dispute,
+    FileComment,
+    FileDispute,
+    Upload,
+)
 
 
 class DisputeAdmin(admin.ModelAdmin):
@@ -31,3 +38,5 @@ admin.site.register(Dispute, DisputeAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(FileDispute)
 admin.site.register(FileComment)
+admin.site.register(Upload)
+admin.site.register(Blob)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DisputesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'disputes'
+
+    def ready(self):
+        """Connect the signal handlers of the app."""
+        import disputes.signals  # noqa: F401
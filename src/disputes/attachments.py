@@ -0,0 +1,138 @@
+import os
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.db import transaction
+
+from disputes.blobs import collect_blobs, retain_blobs
+from disputes.models import Upload
+from disputes.previews import schedule_previews_on_commit
+from disputes.uploads import get_part_path
+
+
+def fill_file(instance, upload):
+    """Fill the metadata of an uploaded file and return its name."""
+    instance.file = upload
+    instance.fill_metadata(os.path.basename(upload.name))
+    return upload.name
+
+
+def store_file(instance, upload):
+    """Write an uploaded file to the storage."""
+    instance.file.save(upload.name, upload, save=False)
+
+
+def fill_upload(instance, upload):
+    """Fill the metadata of a complete chunked upload."""
+    # The metadata was computed while the parts were received.
+    instance.size = upload.size
+    instance.original_name = upload.filename
+    instance.content_type = upload.content_type
+    instance.checksum = upload.checksum
+    return upload.filename
+
+
+def store_upload(instance, upload):
+    """Write a complete chunked upload to the storage."""
+    with open(get_part_path(upload), 'rb') as part:
+        instance.file.save(upload.filename, File(part), save=False)
+
+
+class AttachmentError(Exception):
+    """The uploads cannot be attached."""
+
+
+class Attachments:
+    """
+    Files of disputes and comments saved in one transaction.
+
+    Created by atomic_attachments(), which deletes the stored blobs
+    again if the transaction is rolled back and nothing else
+    references them.
+    """
+
+    def __init__(self):
+        self.stored = []
+
+    def add(self, model, uploads, **fields):
+        """
+        Store the uploaded files and insert their rows with one query.
+
+        The fields, e.g. dispute=dispute, are set on every row.
+        bulk_create() sends no post_save signals, so the caller is
+        responsible for touching the dispute and for the blob
+        references; when the dispute or the comment is created in the
+        same transaction it is new anyway.
+        """
+        return self.save(model, fill_file, store_file, uploads, fields)
+
+    def add_uploads(self, model, uploads, **fields):
+        """
+        Attach complete chunked uploads like add() and delete them.
+
+        The uploads are locked first, so an upload attached by a
+        concurrent request raises AttachmentError. The part files
+        are removed after the commit (see disputes.signals).
+        """
+        ids = [upload.pk for upload in uploads]
+        locked = Upload.objects.select_for_update().filter(pk__in=ids)
+        if len(locked.values_list('pk', flat=True)) != len(ids):
+            raise AttachmentError('The upload was already attached.')
+        instances = self.save(
+            model, fill_upload, store_upload, uploads, fields
+        )
+        Upload.objects.filter(pk__in=ids).delete()
+        return instances
+
+    def save(self, model, fill, store, sources, fields):
+        """
+        Store the files of the sources and insert their rows.
+
+        The blob names depend on the checksums, so the metadata is
+        filled first and the blobs are referenced before they are
+        written (see disputes.blobs.retain_blobs()).
+        """
+        instances = [model(**fields) for _ in sources]
+        if not instances:
+            return []
+        filenames = [
+            fill(instance, source)
+            for instance, source in zip(instances, sources)
+        ]
+        field = model._meta.get_field('file')
+        names = [
+            field.generate_filename(instance, filename)
+            for instance, filename in zip(instances, filenames)
+        ]
+        retain_blobs(names)
+        self.stored.extend(names)
+        for instance, source in zip(instances, sources):
+            store(instance, source)
+            instance._loaded_file_name = instance.file.name
+        schedule_previews_on_commit(instances)
+        return model.objects.bulk_create(instances)
+
+    def discard(self):
+        """Delete the stored blobs which are not referenced."""
+        collect_blobs(self.stored)
+        self.stored = []
+
+
+@contextmanager
+def atomic_attachments():
+    """
+    Run the block in a transaction and yield Attachments to save files.
+
+    If the block fails the transaction is rolled back and the files
+    written to the storage are deleted, so neither half-created rows
+    nor orphaned files are left behind. The transaction is durable: the
+    files are collected in a transaction of their own, which could not
+    run inside an outer transaction aborted by the error.
+    """
+    attachments = Attachments()
+    try:
+        with transaction.atomic(durable=True):
+            yield attachments
+    except Exception:
+        attachments.discard()
+        raise
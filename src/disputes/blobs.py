@@ -0,0 +1,71 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from disputes.models import Blob
+from disputes.previews import delete_previews
+from disputes.storage import blob_storage, get_blob_checksum, is_blob_name
+from jobs.queue import enqueue_on_commit
+
+
+def count_blobs(names):
+    """Count the blob names, other stored names are left out."""
+    return Counter(name for name in names if is_blob_name(name))
+
+
+def retain_blobs(names):
+    """
+    Add a reference to the blobs of the names.
+
+    Has to be called before a blob is written: the update locks the
+    row of the blob until the transaction ends, so the blob is not
+    collected between being written and being referenced. A row
+    deleted by a concurrent collection is created again.
+    """
+    for name, count in count_blobs(names).items():
+        blobs = Blob.objects.filter(name=name)
+        while not blobs.update(references=F('references') + count):
+            Blob.objects.bulk_create([Blob(name=name)], ignore_conflicts=True)
+
+
+def release_blobs(names):
+    """
+    Remove a reference from the blobs of the names.
+
+    The blobs left without references are collected by a job after
+    the commit, so a rolled back deletion keeps them.
+    """
+    counts = count_blobs(names)
+    for name, count in counts.items():
+        Blob.objects.filter(name=name).update(
+            references=Greatest(F('references') - count, 0)
+        )
+    if counts:
+        enqueue_on_commit('disputes.collect_blobs', names=list(counts))
+
+
+def collect_blobs(names):
+    """
+    Delete the blobs of the names which are not referenced.
+
+    The referenced blobs are locked, so a blob referenced by a
+    concurrent transaction is kept. A name without a row is a blob
+    written by a rolled back transaction and is deleted as well. The
+    previews of the content go with the blob, they are rendered again
+    if another blob has the same content.
+    """
+    names = set(count_blobs(names))
+    if not names:
+        return
+    with transaction.atomic():
+        referenced = set(
+            Blob.objects.select_for_update()
+            .filter(name__in=names, references__gt=0)
+            .values_list('name', flat=True)
+        )
+        Blob.objects.filter(name__in=names, references=0).delete()
+        for name in names - referenced:
+            blob_storage.delete(name)
+            delete_previews(get_blob_checksum(name))
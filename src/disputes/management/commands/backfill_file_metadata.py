@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from disputes.models import FileComment, FileDispute, get_original_name
+
+METADATA_FIELDS = ('size', 'original_name', 'content_type', 'checksum')
+
+
+class Command(BaseCommand):
+    """
+    Fill the metadata of files uploaded before it was stored.
+
+    Walks FileDispute and FileComment rows without a checksum in
+    primary key order, reads every file from the storage once and
+    saves a batch of rows with a single bulk update.
+    """
+
+    help = 'Fill size, name, content type and checksum of stored files.'
+
+    def add_arguments(self, parser):
+        """Add the batch size argument."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows read and updated at a time.',
+        )
+
+    def handle(self, *args, **options):
+        """Backfill the metadata of both file models."""
+        for model in (FileDispute, FileComment):
+            updated = self.backfill(model, options['batch_size'])
+            self.stdout.write(
+                f'{model.__name__}: {updated} files updated.'
+            )
+
+    def backfill(self, model, batch_size):
+        """Backfill the rows of one model and return their number."""
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(checksum='', pk__gt=last_pk)
+                .exclude(file='').exclude(file=None)
+                .order_by('pk')[:batch_size]
+            )
+            if not batch:
+                return updated
+            last_pk = batch[-1].pk
+            for instance in batch:
+                try:
+                    with instance.file.open('rb'):
+                        instance.fill_metadata(get_original_name(
+                            instance.file.name, instance.file.storage
+                        ))
+                except FileNotFoundError:
+                    self.stderr.write(
+                        f'{model.__name__} {instance.pk}: '
+                        f'{instance.file.name} is missing.'
+                    )
+            model.objects.bulk_update(batch, METADATA_FIELDS)
+            updated += len(batch)
@@ -0,0 +1,122 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from disputes.blobs import release_blobs, retain_blobs
+from disputes.models import FileComment, FileDispute, get_original_name
+from disputes.storage import blob_storage, get_blob_name, is_blob_name
+
+MOVED_FIELDS = ('file', 'size', 'original_name', 'content_type', 'checksum')
+
+# The names of the blobs as get_blob_name() builds them now.
+BLOB_NAME_RE = r'^blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}$'
+
+
+class Command(BaseCommand):
+    """
+    Move the files stored before the blob storage into blobs.
+
+    Walks FileDispute and FileComment rows with a file outside the
+    blob directory, or in a blob named with the extension of the file,
+    in primary key order. The checksum is computed if it is missing,
+    the content is copied to its blob unless the blob already exists,
+    and a batch of rows is updated and referenced in one transaction.
+    The old blobs are released in it and collected by a job, the other
+    old files are deleted at the end, so the original names of the
+    rows are derived while all of them exist (see get_original_name()).
+    """
+
+    help = 'Move stored files to the content-addressed blob storage.'
+
+    def add_arguments(self, parser):
+        """Add the batch size, dry run and keep arguments."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows read and updated at a time.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the files and the bytes saved.',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the old files after they are moved.',
+        )
+
+    def handle(self, *args, **options):
+        """Move the files of both file models."""
+        seen = set()
+        old_names = []
+        for model in (FileDispute, FileComment):
+            moved, saved = self.move(model, seen, old_names, options)
+            self.stdout.write(
+                f'{model.__name__}: {moved} files moved, '
+                f'{saved} bytes deduplicated.'
+            )
+        if not options['keep']:
+            for old_name in old_names:
+                blob_storage.delete(old_name)
+
+    def move(self, model, seen, old_names, options):
+        """Move the files of one model, return their number and savings."""
+        moved = 0
+        saved = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk)
+                .exclude(file='').exclude(file=None)
+                .exclude(file__regex=BLOB_NAME_RE)
+                .order_by('pk')[:options['batch_size']]
+            )
+            if not batch:
+                return moved, saved
+            last_pk = batch[-1].pk
+            instances = [
+                instance for instance in batch
+                if self.fill(model, instance)
+            ]
+            names = [
+                get_blob_name(instance.checksum) for instance in instances
+            ]
+            for instance, name in zip(instances, names):
+                if name in seen or blob_storage.exists(name):
+                    saved += instance.size
+                seen.add(name)
+            moved += len(instances)
+            if options['dry_run'] or not instances:
+                continue
+            names_before = [instance.file.name for instance in instances]
+            with transaction.atomic():
+                # Referenced before they are written, see retain_blobs().
+                retain_blobs(names)
+                for instance, name in zip(instances, names):
+                    with instance.file.open('rb') as content:
+                        blob_storage.save(name, content)
+                    instance.file.name = name
+                model.objects.bulk_update(instances, MOVED_FIELDS)
+                release_blobs(names_before)
+            old_names += [
+                name for name in names_before if not is_blob_name(name)
+            ]
+
+    def fill(self, model, instance):
+        """Fill the missing metadata, return whether the file exists."""
+        try:
+            if not instance.checksum:
+                with instance.file.open('rb'):
+                    instance.fill_metadata(get_original_name(
+                        instance.file.name, instance.file.storage
+                    ))
+            elif not blob_storage.exists(instance.file.name):
+                raise FileNotFoundError
+        except FileNotFoundError:
+            self.stderr.write(
+                f'{model.__name__} {instance.pk}: '
+                f'{instance.file.name} is missing.'
+            )
+            return False
+        return True
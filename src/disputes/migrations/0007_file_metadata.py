@@ -0,0 +1,53 @@
+# Generated by Django 4.1 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disputes', '0006_alter_comment_options_alter_dispute_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filecomment',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Контрольная сумма SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='filecomment',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Тип содержимого'),
+        ),
+        migrations.AddField(
+            model_name='filecomment',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Исходное имя файла'),
+        ),
+        migrations.AddField(
+            model_name='filecomment',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Размер в байтах'),
+        ),
+        migrations.AddField(
+            model_name='filedispute',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Контрольная сумма SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='filedispute',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Тип содержимого'),
+        ),
+        migrations.AddField(
+            model_name='filedispute',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Исходное имя файла'),
+        ),
+        migrations.AddField(
+            model_name='filedispute',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Размер в байтах'),
+        ),
+    ]
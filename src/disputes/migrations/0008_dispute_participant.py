@@ -0,0 +1,64 @@
+# Generated by Django 4.1 on 2026-10-18 18:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_participants(apps, schema_editor):
+    Dispute = apps.get_model('disputes', 'Dispute')
+    DisputeParticipant = apps.get_model('disputes', 'DisputeParticipant')
+    Opponent = Dispute.opponent.through
+
+    participants = [
+        DisputeParticipant(dispute_id=dispute_id, user_id=creator_id,
+                           role='creator', is_visible=True)
+        for dispute_id, creator_id
+        in Dispute.objects.values_list('id', 'creator_id').iterator()
+    ]
+    participants += [
+        DisputeParticipant(dispute_id=dispute_id, user_id=user_id,
+                           role='opponent', is_visible=add_opponent)
+        for dispute_id, user_id, add_opponent in Opponent.objects.values_list(
+            'dispute_id', 'customuser_id', 'dispute__add_opponent'
+        ).iterator()
+    ]
+    DisputeParticipant.objects.bulk_create(
+        participants, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('disputes', '0007_file_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisputeParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('creator', 'Создатель'), ('opponent', 'Оппонент')], max_length=20, verbose_name='Роль в споре')),
+                ('is_visible', models.BooleanField(default=False, verbose_name='Спор доступен участнику')),
+                ('dispute', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='disputes.dispute', verbose_name='Спор')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='dispute_participants', to=settings.AUTH_USER_MODEL, verbose_name='Участник')),
+            ],
+            options={
+                'verbose_name': 'Участник спора',
+                'verbose_name_plural': 'Участники спора',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='disputeparticipant',
+            index=models.Index(fields=['user', 'is_visible', 'dispute'], name='participant_user_visible_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='disputeparticipant',
+            constraint=models.UniqueConstraint(fields=('dispute', 'user'), name='unique_dispute_participant'),
+        ),
+        migrations.RunPython(fill_participants, migrations.RunPython.noop),
+    ]
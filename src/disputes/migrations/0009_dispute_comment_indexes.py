@@ -0,0 +1,29 @@
+# Generated by Django 4.1 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disputes', '0008_dispute_participant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['dispute', 'created_at', 'id'], name='comment_dispute_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['-created_at', 'id'], name='dispute_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['status', '-created_at'], name='dispute_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['creator', '-created_at'], name='dispute_creator_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disputes', '0009_dispute_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dispute',
+            index=models.Index(fields=['closed_at'], name='dispute_closed_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# The statements are kept here as they were when the search was added,
+# so later changes of disputes.search do not change this migration.
+PG_INDEX = '''
+    UPDATE disputes_dispute AS dispute
+    SET search_vector =
+        setweight(to_tsvector('russian', dispute.description), 'A')
+        || setweight(to_tsvector('english', dispute.description), 'A')
+        || setweight(to_tsvector('russian', comments.content), 'B')
+        || setweight(to_tsvector('english', comments.content), 'B')
+    FROM (
+        SELECT source.id,
+            COALESCE(string_agg(comment.content, ' '), '') AS content
+        FROM disputes_dispute AS source
+        LEFT JOIN disputes_comment AS comment
+            ON comment.dispute_id = source.id
+        GROUP BY source.id
+    ) AS comments
+    WHERE dispute.id = comments.id
+'''
+
+SQLITE_INDEX = '''
+    INSERT INTO disputes_dispute_fts (rowid, description, comments)
+    SELECT dispute.id, dispute.description, COALESCE((
+        SELECT group_concat(comment.content, ' ')
+        FROM disputes_comment AS comment
+        WHERE comment.dispute_id = dispute.id
+    ), '')
+    FROM disputes_dispute AS dispute
+'''
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE disputes_dispute ADD COLUMN search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX dispute_search_idx ON disputes_dispute '
+            'USING GIN (search_vector)'
+        )
+        schema_editor.execute(PG_INDEX)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE disputes_dispute_fts '
+            'USING fts5(description, comments)'
+        )
+        schema_editor.execute(SQLITE_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE disputes_dispute DROP COLUMN search_vector'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE disputes_dispute_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disputes', '0010_dispute_closed_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
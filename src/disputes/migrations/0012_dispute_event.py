@@ -0,0 +1,32 @@
+# Generated by Django 4.1 on 2026-10-18 19:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disputes', '0011_dispute_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisputeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('kind', models.CharField(choices=[('comment_created', 'Новый комментарий'), ('status_changed', 'Изменение статуса'), ('opponent_added', 'Добавлен оппонент')], max_length=30, verbose_name='Тип события')),
+                ('payload', models.JSONField(default=dict, verbose_name='Данные события')),
+                ('dispute', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='disputes.dispute', verbose_name='Спор')),
+            ],
+            options={
+                'verbose_name': 'Событие спора',
+                'verbose_name_plural': 'События спора',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='disputeevent',
+            index=models.Index(fields=['dispute', 'id'], name='event_dispute_id_idx'),
+        ),
+    ]
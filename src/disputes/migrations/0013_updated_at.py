@@ -0,0 +1,32 @@
+# Generated by Django 4.1 on 2026-10-18 19:18
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_updated_at(apps, schema_editor):
+    Dispute = apps.get_model('disputes', 'Dispute')
+    Comment = apps.get_model('disputes', 'Comment')
+    last_comment = Comment.objects.filter(
+        dispute=OuterRef('pk')
+    ).order_by('-created_at').values('created_at')[:1]
+    Dispute.objects.update(
+        updated_at=Coalesce(Subquery(last_comment), F('created_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disputes', '0012_dispute_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispute',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
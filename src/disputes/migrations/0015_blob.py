@@ -0,0 +1,36 @@
+# Generated by Django 4.1 on 2026-10-18 19:34
+
+import disputes.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disputes', '0014_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя в хранилище')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Количество ссылок')),
+            ],
+            options={
+                'verbose_name': 'Содержимое файла',
+                'verbose_name_plural': 'Содержимое файлов',
+            },
+        ),
+        migrations.AlterField(
+            model_name='filecomment',
+            name='file',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=disputes.storage.get_blob_storage, upload_to=disputes.storage.get_attachment_name, verbose_name='Файл'),
+        ),
+        migrations.AlterField(
+            model_name='filedispute',
+            name='file',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=disputes.storage.get_blob_storage, upload_to=disputes.storage.get_attachment_name, verbose_name='Файл'),
+        ),
+    ]
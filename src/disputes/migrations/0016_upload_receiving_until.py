@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disputes', '0015_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='receiving_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Часть принимается до'),
+        ),
+    ]
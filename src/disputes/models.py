@@ -1,12 +1,48 @@
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinLengthValidator
 from django.db import models
 
 from config.settings import MAX_LENGTH, MIN_LENGTH
+from disputes.storage import get_attachment_name, get_blob_storage
 from disputes.validators import text_validator
 
 User = get_user_model()
 
+# Django appends "_" and seven random characters to the name
+# of a file when a file with the same name already exists.
+STORAGE_SUFFIX_RE = re.compile(
+    r'^(?P<stem>.+)_[A-Za-z0-9]{7}(?P<ext>\.[^.]*)?$'
+)
+
+
+def get_original_name(name, storage=None):
+    """
+    Return the name of the stored file without the directory and suffix.
+
+    A name such as 'tax_receipt.pdf' looks the same as one with the
+    random suffix, so the suffix is stripped only if the storage
+    holds the file whose name Django avoided by adding it. Without
+    the storage the name is returned as stored.
+
+    Example:
+    Before - uploads/hot_dog_KXxIrPe.jpg, uploads/hot_dog.jpg exists
+    After - hot_dog.jpg
+    """
+    filename = os.path.basename(name)
+    match = STORAGE_SUFFIX_RE.match(filename)
+    if match is None or storage is None:
+        return filename
+    original_name = match.group('stem') + (match.group('ext') or '')
+    if storage.exists(os.path.join(os.path.dirname(name), original_name)):
+        return original_name
+    return filename
+
 
 class BaseModel(models.Model):
     """Base model."""
@@ -20,8 +56,33 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class DisputeQuerySet(models.QuerySet):
+    """QuerySet of the Dispute model."""
+
+    def visible_to(self, user):
+        """
+        Return the disputes the user has access to.
+
+        Mediators see every dispute. Other users see the disputes
+        they created and the disputes they were added to as opponents,
+        which is a single lookup in the participant index.
+        """
+        if user.is_mediator:
+            return self
+        return self.filter(
+            participants__user=user,
+            participants__is_visible=True,
+        )
+
+
 class Dispute(BaseModel):
-    """Dispute model."""
+    """
+    Dispute model.
+
+    'updated_at' changes with the dispute and whenever its comments,
+    files or opponents change (see disputes.signals), so it is the
+    version of everything shown about the dispute.
+    """
 
     MAX_LENGTH_TITLE = 50
     MAX_LENGTH_STATUS = 20
@@ -51,6 +112,10 @@ class Dispute(BaseModel):
         blank=True,
         null=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
     status = models.CharField(
         max_length=MAX_LENGTH_STATUS,
         choices=DISPUTE_STATUS,
@@ -64,14 +129,127 @@ class Dispute(BaseModel):
     )
     add_opponent = models.BooleanField(default=False)
 
+    objects = DisputeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Спор'
         verbose_name_plural = 'Споры'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', 'id'],
+                name='dispute_created_idx',
+            ),
+            models.Index(
+                fields=['status', '-created_at'],
+                name='dispute_status_created_idx',
+            ),
+            models.Index(
+                fields=['creator', '-created_at'],
+                name='dispute_creator_created_idx',
+            ),
+            models.Index(
+                fields=['closed_at'],
+                name='dispute_closed_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Спор от {self.creator}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the values loaded from the database."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Save the dispute and remember the saved values."""
+        super().save(*args, **kwargs)
+        deferred_fields = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred_fields
+        }
+
+    def is_changed(self, field_name):
+        """
+        Check whether the field differs from the loaded value.
+
+        A field deferred with only() or defer() and not set since is
+        unchanged, a field of a new dispute is changed.
+        """
+        loaded_values = getattr(self, '_loaded_values', {})
+        if field_name in loaded_values:
+            return loaded_values[field_name] != getattr(self, field_name)
+        return field_name not in self.get_deferred_fields()
+
+
+class DisputeParticipant(models.Model):
+    """
+    Participant of the dispute.
+
+    Denormalized access index with one row per creator and opponent
+    of every dispute. Opponent rows are visible only while the
+    dispute has 'add_opponent' set. The rows are kept in sync by
+    the signals in disputes.signals.
+    """
+
+    MAX_LENGTH_ROLE = 20
+
+    CREATOR = 'creator'
+    OPPONENT = 'opponent'
+
+    PARTICIPANT_ROLES = [
+        (CREATOR, 'Создатель'),
+        (OPPONENT, 'Оппонент'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='dispute_participants',
+        verbose_name='Участник',
+        db_index=False,
+    )
+    dispute = models.ForeignKey(
+        Dispute,
+        on_delete=models.CASCADE,
+        related_name='participants',
+        verbose_name='Спор',
+        db_index=False,
+    )
+    role = models.CharField(
+        max_length=MAX_LENGTH_ROLE,
+        choices=PARTICIPANT_ROLES,
+        verbose_name='Роль в споре',
+    )
+    is_visible = models.BooleanField(
+        default=False,
+        verbose_name='Спор доступен участнику',
+    )
+
+    class Meta:
+        verbose_name = 'Участник спора'
+        verbose_name_plural = 'Участники спора'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dispute', 'user'],
+                name='unique_dispute_participant',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'is_visible', 'dispute'],
+                name='participant_user_visible_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} в {self.dispute}'
+
 
 class Comment(BaseModel):
     """Comment model."""
@@ -97,24 +275,168 @@ class Comment(BaseModel):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['dispute', 'created_at', 'id'],
+                name='comment_dispute_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Комментарий от {self.sender}'
 
 
+class DisputeEvent(BaseModel):
+    """
+    Event of the dispute delivered to the participants.
+
+    The rows are written by the signals in disputes.signals in the
+    transaction of the change and read in the id order by the event
+    stream and the long-poll endpoint of the API.
+    """
+
+    MAX_LENGTH_KIND = 30
+
+    COMMENT_CREATED = 'comment_created'
+    STATUS_CHANGED = 'status_changed'
+    OPPONENT_ADDED = 'opponent_added'
+
+    EVENT_KINDS = [
+        (COMMENT_CREATED, 'Новый комментарий'),
+        (STATUS_CHANGED, 'Изменение статуса'),
+        (OPPONENT_ADDED, 'Добавлен оппонент'),
+    ]
+
+    dispute = models.ForeignKey(
+        Dispute,
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name='Спор',
+        db_index=False,
+    )
+    kind = models.CharField(
+        max_length=MAX_LENGTH_KIND,
+        choices=EVENT_KINDS,
+        verbose_name='Тип события',
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name='Данные события',
+    )
+
+    class Meta:
+        verbose_name = 'Событие спора'
+        verbose_name_plural = 'События спора'
+        indexes = [
+            models.Index(
+                fields=['dispute', 'id'],
+                name='event_dispute_id_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} в {self.dispute}'
+
+
+class Blob(BaseModel):
+    """
+    Content stored once for all attachments with the same checksum.
+
+    'references' is the number of FileDispute and FileComment rows
+    using the blob (see disputes.blobs). A blob without references
+    is deleted from the storage.
+    """
+
+    name = models.CharField(
+        max_length=255,
+        primary_key=True,
+        verbose_name='Имя в хранилище',
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество ссылок',
+    )
+
+    class Meta:
+        verbose_name = 'Содержимое файла'
+        verbose_name_plural = 'Содержимое файлов'
+
+    def __str__(self):
+        return self.name
+
+
 class File(models.Model):
-    """Abstract model for files."""
+    """
+    Abstract model for files.
+
+    The size, the original name, the content type and the checksum
+    are stored when the file is uploaded, so reading them does not
+    touch the storage. The content is stored under its checksum by
+    disputes.storage, so the same file uploaded again is stored once.
+    """
+
+    MAX_LENGTH_NAME = 255
+    MAX_LENGTH_CONTENT_TYPE = 100
+    CHECKSUM_LENGTH = 64
 
     file = models.FileField(
-        upload_to='uploads/',
+        upload_to=get_attachment_name,
+        storage=get_blob_storage,
+        max_length=255,
         blank=True,
         null=True,
         verbose_name='Файл',
     )
+    size = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Размер в байтах',
+    )
+    original_name = models.CharField(
+        max_length=MAX_LENGTH_NAME,
+        blank=True,
+        verbose_name='Исходное имя файла',
+    )
+    content_type = models.CharField(
+        max_length=MAX_LENGTH_CONTENT_TYPE,
+        blank=True,
+        verbose_name='Тип содержимого',
+    )
+    checksum = models.CharField(
+        max_length=CHECKSUM_LENGTH,
+        blank=True,
+        verbose_name='Контрольная сумма SHA-256',
+    )
 
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the name of the stored file."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_file_name = instance.file.name or ''
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Store the metadata of a newly uploaded file."""
+        if self.file and not self.file._committed:
+            self.fill_metadata(os.path.basename(self.file.name))
+        super().save(*args, **kwargs)
+
+    def fill_metadata(self, original_name):
+        """Read the file once and fill its metadata fields."""
+        checksum = hashlib.sha256()
+        for chunk in self.file.chunks():
+            checksum.update(chunk)
+        self.size = self.file.size
+        self.original_name = original_name[:self.MAX_LENGTH_NAME]
+        self.content_type = (
+            mimetypes.guess_type(original_name)[0]
+            or getattr(self.file.file, 'content_type', None)
+            or ''
+        )[:self.MAX_LENGTH_CONTENT_TYPE]
+        self.checksum = checksum.hexdigest()
+
 
 class FileDispute(File):
     """File of dispute model."""
@@ -140,3 +462,68 @@ class FileComment(File):
 
     def __str__(self):
         return f'Файл в {self.comment}'
+
+
+class Upload(BaseModel):
+    """
+    File uploaded in parts and not attached yet.
+
+    The received bytes are appended to a file in UPLOAD_CHUNK_DIR
+    (see disputes.uploads). 'offset' is the number of bytes received,
+    so an interrupted upload is resumed from there. While a part is
+    received 'receiving_until' holds the end of its lease. A complete
+    upload is attached to a dispute or a comment by its id and deleted.
+    """
+
+    MAX_LENGTH_NAME = 255
+    MAX_LENGTH_CONTENT_TYPE = 100
+    CHECKSUM_LENGTH = 64
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+    )
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='uploads',
+        verbose_name='Владелец',
+    )
+    filename = models.CharField(
+        max_length=MAX_LENGTH_NAME,
+        verbose_name='Имя файла',
+    )
+    content_type = models.CharField(
+        max_length=MAX_LENGTH_CONTENT_TYPE,
+        verbose_name='Тип содержимого',
+    )
+    size = models.PositiveBigIntegerField(
+        verbose_name='Размер в байтах',
+    )
+    offset = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Получено байт',
+    )
+    checksum = models.CharField(
+        max_length=CHECKSUM_LENGTH,
+        blank=True,
+        verbose_name='Контрольная сумма SHA-256',
+    )
+    receiving_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Часть принимается до',
+    )
+
+    class Meta:
+        verbose_name = 'Загрузка'
+        verbose_name_plural = 'Загрузки'
+
+    def __str__(self):
+        return f'Загрузка {self.filename}'
+
+    @property
+    def is_complete(self):
+        """Check whether all bytes of the file were received."""
+        return self.offset == self.size
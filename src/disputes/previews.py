@@ -0,0 +1,214 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.core.cache import cache
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from disputes.storage import BLOB_PERMISSIONS, blob_storage
+from jobs.queue import enqueue
+
+PREVIEW_DIR = 'previews'
+
+# Longest side of every kind of preview, in pixels.
+PREVIEW_SIZES = {
+    'thumbnail': 320,
+    'preview': 1280,
+}
+
+IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/gif')
+PDF_TYPE = 'application/pdf'
+
+# The first page of a PDF is rendered by pdftoppm of poppler-utils,
+# the PDFs get no previews where it is not installed.
+PDFTOPPM = shutil.which('pdftoppm')
+PDF_TIMEOUT = 30
+
+if features.check('webp'):
+    PREVIEW_FORMAT, PREVIEW_EXTENSION = 'WEBP', 'webp'
+    PREVIEW_CONTENT_TYPE = 'image/webp'
+else:
+    PREVIEW_FORMAT, PREVIEW_EXTENSION = 'JPEG', 'jpg'
+    PREVIEW_CONTENT_TYPE = 'image/jpeg'
+PREVIEW_QUALITY = 80
+
+# Seconds a content which could not be rendered is not tried again.
+PREVIEW_FAILURE_TIMEOUT = 24 * 60 * 60
+
+# Errors of a content which cannot be rendered, unlike e.g. a full disk.
+RENDER_ERRORS = (
+    Image.UnidentifiedImageError,
+    Image.DecompressionBombError,
+    subprocess.CalledProcessError,
+    subprocess.TimeoutExpired,
+)
+
+
+def is_previewable(content_type):
+    """Check whether previews are made for files of the content type."""
+    return content_type in IMAGE_TYPES or (
+        content_type == PDF_TYPE and PDFTOPPM is not None
+    )
+
+
+def get_preview_name(checksum, size):
+    """
+    Return the name of a preview of the content with the checksum.
+
+    The previews are cached by the checksum next to the blobs, so
+    the same content is rendered once whichever file it belongs to.
+
+    Example:
+    previews/9f/86/9f86d081884c7d65...0f00a08-thumbnail.webp
+    """
+    return (
+        f'{PREVIEW_DIR}/{checksum[:2]}/{checksum[2:4]}/'
+        f'{checksum}-{size}.{PREVIEW_EXTENSION}'
+    )
+
+
+def get_failure_key(checksum):
+    """Return the cache key marking a content which was not rendered."""
+    return f'preview:failed:{checksum}'
+
+
+def has_failed(checksum):
+    """Check whether rendering the previews of the content failed."""
+    return bool(cache.get(get_failure_key(checksum)))
+
+
+def get_job_key(checksum):
+    """Return the key of the job rendering the content."""
+    return f'previews:{checksum}'
+
+
+def open_pdf_page(path, size):
+    """Render the first page of the PDF at the size as an image."""
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'page')
+        subprocess.run(
+            [
+                PDFTOPPM, '-png', '-singlefile', '-f', '1', '-l', '1',
+                '-scale-to', str(size), path, root,
+            ],
+            check=True,
+            capture_output=True,
+            timeout=PDF_TIMEOUT,
+        )
+        with Image.open(f'{root}.png') as page:
+            page.load()
+            return page.copy()
+
+
+def save_preview(image, path):
+    """Write the preview to a temporary file and move it to the path."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix='.tmp-'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as preview:
+            image.save(
+                preview, PREVIEW_FORMAT, quality=PREVIEW_QUALITY
+            )
+        os.chmod(temporary_path, BLOB_PERMISSIONS)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def render_previews(path, content_type, targets):
+    """
+    Render the previews of the file at the path.
+
+    The targets are (path, size) pairs, the previews are made from
+    the largest to the smallest one by downscaling the image in place.
+    """
+    largest = max(size for _, size in targets)
+    if content_type == PDF_TYPE:
+        image = open_pdf_page(path, largest)
+    else:
+        image = Image.open(path)
+        # Decode a JPEG at a reduced scale if it is much larger.
+        image.draft('RGB', (largest, largest))
+    with image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+            image.mode == 'P' and 'transparency' in image.info
+        )
+        image = image.convert(
+            'RGBA' if has_alpha and PREVIEW_FORMAT == 'WEBP' else 'RGB'
+        )
+        for target, size in sorted(targets, key=lambda pair: -pair[1]):
+            image.thumbnail((size, size))
+            save_preview(image, target)
+
+
+def get_missing_targets(checksum):
+    """Return the (path, size) pairs of the previews not rendered yet."""
+    return [
+        (blob_storage.path(get_preview_name(checksum, name)), size)
+        for name, size in PREVIEW_SIZES.items()
+        if not blob_storage.exists(get_preview_name(checksum, name))
+    ]
+
+
+def render_file_previews(checksum, name, content_type):
+    """
+    Render the missing previews of the stored file, run as a job.
+
+    A content which cannot be rendered is remembered for
+    PREVIEW_FAILURE_TIMEOUT instead of being retried, other errors
+    are retried by the job queue.
+    """
+    try:
+        targets = get_missing_targets(checksum)
+        if targets and blob_storage.exists(name):
+            render_previews(blob_storage.path(name), content_type, targets)
+    except RENDER_ERRORS:
+        cache.set(get_failure_key(checksum), True, PREVIEW_FAILURE_TIMEOUT)
+
+
+def schedule_previews(instances):
+    """
+    Queue the rendering of the missing previews of the files.
+
+    The instances are FileDispute and FileComment rows. The request
+    does not wait for the previews, they appear on the disk when a
+    worker has rendered them. The job is keyed by the checksum, so a
+    content is not queued again while its job is waiting, running or
+    retried, however long that takes. The content which failed is not
+    tried again for PREVIEW_FAILURE_TIMEOUT.
+    """
+    for instance in instances:
+        checksum = instance.checksum
+        if (
+            not instance.file
+            or not checksum
+            or not is_previewable(instance.content_type)
+            or has_failed(checksum)
+            or not get_missing_targets(checksum)
+        ):
+            continue
+        enqueue(
+            'disputes.render_previews',
+            key=get_job_key(checksum),
+            checksum=checksum,
+            name=instance.file.name,
+            content_type=instance.content_type,
+        )
+
+
+def schedule_previews_on_commit(instances):
+    """Render the previews once the files are committed."""
+    transaction.on_commit(lambda: schedule_previews(instances))
+
+
+def delete_previews(checksum):
+    """Delete the previews of the content with the checksum."""
+    for name in PREVIEW_SIZES:
+        blob_storage.delete(get_preview_name(checksum, name))
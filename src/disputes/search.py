@@ -0,0 +1,211 @@
+import html
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, CharField, FloatField
+from django.db.models.expressions import RawSQL
+
+# On PostgreSQL every dispute has a 'search_vector' tsvector column built
+# with both the russian and the english configurations and covered by
+# a GIN index. On SQLite the same documents are kept in the FTS5 table,
+# so the search also works in local runs. Neither is declared on the
+# Dispute model (see migration 0011), they are maintained by this module.
+FTS_TABLE = 'disputes_dispute_fts'
+
+# The matched words are delimited by control characters which do not
+# occur in the texts, the snippet is escaped before they are replaced
+# with the <mark> tags (see render_snippet()).
+MARK_START = '\x02'
+MARK_STOP = '\x03'
+
+MARKED_RE = re.compile(
+    f'{MARK_START}([^{MARK_START}{MARK_STOP}]+){MARK_STOP}'
+    f'|([^{MARK_START}{MARK_STOP}]+|.)',
+    re.DOTALL,
+)
+
+HEADLINE_OPTIONS = (
+    f'StartSel={MARK_START}, StopSel={MARK_STOP}, '
+    'MaxWords=25, MinWords=10, MaxFragments=2'
+)
+
+PG_QUERY = (
+    "(websearch_to_tsquery('russian', %s)"
+    " || websearch_to_tsquery('english', %s))"
+)
+
+PG_UPDATE = '''
+    UPDATE disputes_dispute AS dispute
+    SET search_vector =
+        setweight(to_tsvector('russian', dispute.description), 'A')
+        || setweight(to_tsvector('english', dispute.description), 'A')
+        || setweight(to_tsvector('russian', comments.content), 'B')
+        || setweight(to_tsvector('english', comments.content), 'B')
+    FROM (
+        SELECT source.id,
+            COALESCE(string_agg(comment.content, ' '), '') AS content
+        FROM disputes_dispute AS source
+        LEFT JOIN disputes_comment AS comment
+            ON comment.dispute_id = source.id
+        {where}
+        GROUP BY source.id
+    ) AS comments
+    WHERE dispute.id = comments.id
+'''
+
+PG_APPEND = '''
+    UPDATE disputes_dispute
+    SET search_vector = COALESCE(search_vector, '')
+        || setweight(to_tsvector('russian', %s), 'B')
+        || setweight(to_tsvector('english', %s), 'B')
+    WHERE id = %s
+'''
+
+SQLITE_INSERT = '''
+    INSERT INTO disputes_dispute_fts (rowid, description, comments)
+    SELECT dispute.id, dispute.description, COALESCE((
+        SELECT group_concat(comment.content, ' ')
+        FROM disputes_comment AS comment
+        WHERE comment.dispute_id = dispute.id
+    ), '')
+    FROM disputes_dispute AS dispute
+    {where}
+'''
+
+
+def rebuild_dispute_documents(dispute_ids):
+    """Rebuild the search documents of the given disputes."""
+    dispute_ids = list(dispute_ids)
+    if not dispute_ids:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                PG_UPDATE.format(where='WHERE source.id = ANY(%s)'),
+                [dispute_ids],
+            )
+        else:
+            placeholders = ', '.join(['%s'] * len(dispute_ids))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                dispute_ids,
+            )
+            cursor.execute(
+                SQLITE_INSERT.format(
+                    where=f'WHERE dispute.id IN ({placeholders})'
+                ),
+                dispute_ids,
+            )
+
+
+def append_comment(comment):
+    """
+    Add a new comment to the search document of its dispute.
+
+    On PostgreSQL only the comment itself is converted to a tsvector,
+    so a new comment does not re-read the whole thread.
+    """
+    if connection.vendor != 'postgresql':
+        rebuild_dispute_documents([comment.dispute_id])
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            PG_APPEND,
+            [comment.content, comment.content, comment.dispute_id],
+        )
+
+
+def remove_dispute_documents(dispute_ids):
+    """Remove the search documents of deleted disputes."""
+    dispute_ids = list(dispute_ids)
+    if not dispute_ids or connection.vendor != 'sqlite':
+        return
+    placeholders = ', '.join(['%s'] * len(dispute_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            dispute_ids,
+        )
+
+
+def build_fts_query(query):
+    """Quote every word of the query as an FTS5 phrase."""
+    return ' '.join(
+        '"{}"'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def search_disputes(queryset, query):
+    """
+    Return the disputes of the queryset matching the query.
+
+    The disputes are annotated with 'search_rank' and with
+    'search_snippet', a fragment of the raw text where the matched
+    words are delimited by MARK_START and MARK_STOP, and ordered by
+    the rank. The snippet is turned into HTML by render_snippet().
+    """
+    if connection.vendor == 'postgresql':
+        matches = RawSQL(
+            f'"disputes_dispute"."search_vector" @@ {PG_QUERY}',
+            [query, query],
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f'ts_rank_cd("disputes_dispute"."search_vector", {PG_QUERY})',
+            [query, query],
+            output_field=FloatField(),
+        )
+        snippet = RawSQL(
+            f'''ts_headline('russian', "disputes_dispute"."description"
+                || ' ' || COALESCE((
+                    SELECT string_agg(comment.content, ' ')
+                    FROM disputes_comment AS comment
+                    WHERE comment.dispute_id = "disputes_dispute"."id"
+                ), ''), {PG_QUERY}, %s)''',
+            [query, query, HEADLINE_OPTIONS],
+            output_field=CharField(),
+        )
+    else:
+        fts_query = build_fts_query(query)
+        matches = RawSQL(
+            f'"disputes_dispute"."id" IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)',
+            [fts_query],
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = "disputes_dispute"."id")',
+            [fts_query],
+            output_field=FloatField(),
+        )
+        snippet = RawSQL(
+            f"(SELECT snippet({FTS_TABLE}, -1, %s, %s, '…', 25) "
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = "disputes_dispute"."id")',
+            [MARK_START, MARK_STOP, fts_query],
+            output_field=CharField(),
+        )
+    return queryset.filter(matches).annotate(
+        search_rank=rank,
+        search_snippet=snippet,
+    ).order_by('-search_rank', '-created_at')
+
+
+def render_snippet(snippet):
+    """
+    Return the snippet as HTML with the matched words in <mark> tags.
+
+    The text is escaped, so the tags added here are the only markup.
+    Stray markers typed by the users themselves are dropped.
+    """
+    if snippet is None:
+        return None
+    parts = []
+    for marked, text in MARKED_RE.findall(snippet):
+        if marked:
+            parts.append(f'<mark>{html.escape(marked)}</mark>')
+        else:
+            parts.append(html.escape(text.strip(MARK_START + MARK_STOP)))
+    return ''.join(parts)
@@ -0,0 +1,295 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from disputes import search
+from disputes.blobs import release_blobs, retain_blobs
+from disputes.models import (
+    Comment,
+    Dispute,
+    DisputeEvent,
+    DisputeParticipant,
+    FileComment,
+    FileDispute,
+    Upload,
+)
+from disputes.previews import schedule_previews_on_commit
+from disputes.uploads import get_part_path, remove_part
+
+
+def is_cascade(origin, model):
+    """Check whether the deletion was started from another model."""
+    if origin is None:
+        return False
+    return getattr(origin, 'model', type(origin)) is not model
+
+
+def is_dispute_deletion(origin):
+    """Check whether the deletion was started from disputes."""
+    if origin is None:
+        return False
+    return getattr(origin, 'model', type(origin)) is Dispute
+
+
+def get_reindexed_disputes(origin, instance):
+    """
+    Return the ids of the disputes to reindex after the deletion.
+
+    The set is kept on the object the deletion was started from, so
+    the comments deleted together share it.
+    """
+    holder = instance if origin is None else origin
+    return vars(holder).setdefault('_reindexed_dispute_ids', set())
+
+
+def touch_disputes(**lookup):
+    """Move 'updated_at' of the disputes matching the lookup to now."""
+    Dispute.objects.filter(**lookup).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Dispute)
+def sync_dispute_participants(sender, instance, created, **kwargs):
+    """Add the creator and apply 'add_opponent' to the opponents."""
+    if created:
+        DisputeParticipant.objects.create(
+            dispute=instance,
+            user_id=instance.creator_id,
+            role=DisputeParticipant.CREATOR,
+            is_visible=True,
+        )
+        return
+    DisputeParticipant.objects.filter(
+        dispute=instance,
+        role=DisputeParticipant.OPPONENT,
+    ).exclude(
+        is_visible=instance.add_opponent,
+    ).update(is_visible=instance.add_opponent)
+
+
+@receiver(m2m_changed, sender=Dispute.opponent.through)
+def sync_opponent_participants(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    """Mirror the changes of the opponents in the participant index."""
+    opponents = DisputeParticipant.objects.filter(
+        role=DisputeParticipant.OPPONENT
+    )
+    if reverse:
+        opponents = opponents.filter(user=instance)
+        related_field = 'dispute_id'
+    else:
+        opponents = opponents.filter(dispute=instance)
+        related_field = 'user_id'
+
+    if action == 'post_clear':
+        opponents.delete()
+    elif action == 'post_remove':
+        opponents.filter(**{f'{related_field}__in': pk_set}).delete()
+    elif action == 'post_add':
+        if reverse:
+            visibility = dict(
+                Dispute.objects.filter(id__in=pk_set)
+                .values_list('id', 'add_opponent')
+            )
+            pairs = [(dispute_id, instance.pk) for dispute_id in pk_set]
+        else:
+            visibility = {instance.pk: instance.add_opponent}
+            pairs = [(instance.pk, user_id) for user_id in pk_set]
+        DisputeParticipant.objects.bulk_create(
+            [
+                DisputeParticipant(
+                    dispute_id=dispute_id,
+                    user_id=user_id,
+                    role=DisputeParticipant.OPPONENT,
+                    is_visible=visibility[dispute_id],
+                )
+                for dispute_id, user_id in pairs
+            ],
+            ignore_conflicts=True,
+        )
+
+
+@receiver(post_save, sender=Dispute)
+def update_dispute_search_document(sender, instance, created, **kwargs):
+    """Index a new dispute or a dispute with a new description."""
+    if created or instance.is_changed('description'):
+        search.rebuild_dispute_documents([instance.pk])
+
+
+@receiver(post_delete, sender=Dispute)
+def remove_dispute_search_document(sender, instance, **kwargs):
+    """Remove the search document of a deleted dispute."""
+    search.remove_dispute_documents([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_search_document(sender, instance, created, **kwargs):
+    """Add a new comment to the search document of its dispute."""
+    if created:
+        search.append_comment(instance)
+    else:
+        search.rebuild_dispute_documents([instance.dispute_id])
+
+
+@receiver(pre_delete, sender=Comment)
+def collect_comment_search_document(sender, instance, origin=None,
+                                    **kwargs):
+    """Remember the dispute of a comment about to be deleted."""
+    if not is_dispute_deletion(origin):
+        get_reindexed_disputes(origin, instance).add(instance.dispute_id)
+
+
+@receiver(post_delete, sender=Comment)
+def remove_comment_search_document(sender, instance, origin=None,
+                                   **kwargs):
+    """
+    Rebuild the search documents after comments were deleted.
+
+    The comments of one deletion, e.g. of a user with their comments
+    in other disputes, are all deleted before the first of them gets
+    here, so the documents of their disputes are rebuilt once. The
+    documents of deleted disputes are removed with them.
+    """
+    dispute_ids = get_reindexed_disputes(origin, instance)
+    if dispute_ids:
+        search.rebuild_dispute_documents(sorted(dispute_ids))
+        dispute_ids.clear()
+
+
+@receiver(post_save, sender=Comment)
+def add_comment_created_event(sender, instance, created, **kwargs):
+    """Notify the participants of a new comment."""
+    if created:
+        DisputeEvent.objects.create(
+            dispute_id=instance.dispute_id,
+            kind=DisputeEvent.COMMENT_CREATED,
+            payload={
+                'comment_id': instance.pk,
+                'sender_id': instance.sender_id,
+            },
+        )
+
+
+@receiver(post_save, sender=Dispute)
+def add_status_changed_event(sender, instance, created, **kwargs):
+    """Notify the participants of a new status of the dispute."""
+    if not created and instance.is_changed('status'):
+        DisputeEvent.objects.create(
+            dispute=instance,
+            kind=DisputeEvent.STATUS_CHANGED,
+            payload={
+                'status': instance.status,
+                'previous_status': instance._loaded_values.get('status'),
+            },
+        )
+
+
+@receiver(m2m_changed, sender=Dispute.opponent.through)
+def add_opponent_added_events(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """Notify the participants of the new opponents."""
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        events = [
+            DisputeEvent(
+                dispute_id=dispute_id,
+                kind=DisputeEvent.OPPONENT_ADDED,
+                payload={'user_ids': [instance.pk]},
+            )
+            for dispute_id in sorted(pk_set)
+        ]
+    else:
+        events = [
+            DisputeEvent(
+                dispute=instance,
+                kind=DisputeEvent.OPPONENT_ADDED,
+                payload={'user_ids': sorted(pk_set)},
+            )
+        ]
+    DisputeEvent.objects.bulk_create(events)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_dispute_of_comment(sender, instance, origin=None, **kwargs):
+    """Mark the dispute as changed after a change of its comments."""
+    if not is_cascade(origin, Comment):
+        touch_disputes(pk=instance.dispute_id)
+
+
+@receiver(post_save, sender=FileDispute)
+@receiver(post_delete, sender=FileDispute)
+def touch_dispute_of_file(sender, instance, origin=None, **kwargs):
+    """Mark the dispute as changed after a change of its files."""
+    if not is_cascade(origin, FileDispute):
+        touch_disputes(pk=instance.dispute_id)
+
+
+@receiver(post_save, sender=FileComment)
+@receiver(post_delete, sender=FileComment)
+def touch_dispute_of_comment_file(sender, instance, origin=None, **kwargs):
+    """Mark the dispute as changed after a change of comment files."""
+    if not is_cascade(origin, FileComment):
+        touch_disputes(comments=instance.comment_id)
+
+
+@receiver(m2m_changed, sender=Dispute.opponent.through)
+def touch_disputes_of_opponents(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """Mark the disputes as changed after a change of the opponents."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_disputes(pk=instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        touch_disputes(pk__in=pk_set)
+    elif action == 'pre_clear':
+        touch_disputes(opponent=instance)
+
+
+@receiver(pre_save, sender=FileDispute)
+@receiver(pre_save, sender=FileComment)
+def retain_file_blob(sender, instance, **kwargs):
+    """Add a reference to the blob of a new file before it is written."""
+    if instance.file and not instance.file._committed:
+        retain_blobs([
+            instance.file.field.generate_filename(
+                instance, instance.file.name
+            )
+        ])
+
+
+@receiver(post_save, sender=FileDispute)
+@receiver(post_save, sender=FileComment)
+def release_replaced_file_blob(sender, instance, **kwargs):
+    """
+    Release the blob of a file replaced or cleared in the row.
+
+    The previews of a new file are rendered after the commit.
+    """
+    loaded_name = getattr(instance, '_loaded_file_name', '')
+    if loaded_name != (instance.file.name or ''):
+        release_blobs([loaded_name])
+        schedule_previews_on_commit([instance])
+    instance._loaded_file_name = instance.file.name or ''
+
+
+@receiver(post_delete, sender=FileDispute)
+@receiver(post_delete, sender=FileComment)
+def release_file_blob(sender, instance, **kwargs):
+    """Release the blob of a deleted file."""
+    release_blobs([instance.file.name])
+
+
+@receiver(post_delete, sender=Upload)
+def remove_upload_part(sender, instance, **kwargs):
+    """Delete the received bytes once the upload is gone for good."""
+    # The primary key of the instance is cleared after the deletion.
+    path = get_part_path(instance)
+    transaction.on_commit(lambda: remove_part(path))
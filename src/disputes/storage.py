@@ -0,0 +1,99 @@
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+
+# Permissions of a new blob, mkstemp() would leave it readable by
+# the owner only and nginx has to read it.
+BLOB_PERMISSIONS = 0o644
+
+
+def get_blob_name(checksum):
+    """
+    Return the name the content with the checksum is stored under.
+
+    The blobs are spread over two levels of directories by the first
+    characters of the checksum, so no directory grows too large. The
+    name has no extension, so the same content is kept once whatever
+    the names of its files. The content type is sent by the download
+    view from the row of the file (see api.downloads).
+
+    Example:
+    blobs/9f/86/9f86d081884c7d65...0f00a08
+    """
+    return f'{BLOB_DIR}/{checksum[:2]}/{checksum[2:4]}/{checksum}'
+
+
+def is_blob_name(name):
+    """Check whether the file is stored by its content."""
+    return bool(name) and name.startswith(f'{BLOB_DIR}/')
+
+
+def get_blob_checksum(name):
+    """
+    Return the checksum of the content of the blob name.
+
+    The blobs stored before the names lost their extension are named
+    with it until moved by the move_files_to_blobs command.
+    """
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def get_attachment_name(instance, filename):
+    """Return the blob name of the attachment (the 'upload_to')."""
+    return get_blob_name(instance.checksum)
+
+
+@deconstructible
+class BlobStorage(FileSystemStorage):
+    """
+    File system storage keeping the same content once.
+
+    A blob name is derived from the checksum of the content, so an
+    existing blob already holds the same bytes: it is neither written
+    again nor renamed with a random suffix. A new blob is written to
+    a temporary file which is renamed at the end, so a blob is never
+    seen half-written. Other names are stored as usual.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        """Keep the name of a blob."""
+        if is_blob_name(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        """Write the blob unless it is already stored."""
+        if not is_blob_name(name):
+            return super()._save(name, content)
+        if self.exists(name):
+            return name
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=directory, prefix='.tmp-'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as blob:
+                for chunk in content.chunks():
+                    blob.write(chunk)
+            os.chmod(
+                temporary_path, self.file_permissions_mode or BLOB_PERMISSIONS
+            )
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        return name
+
+
+blob_storage = BlobStorage()
+
+
+def get_blob_storage():
+    """Return the storage of the attachments."""
+    return blob_storage
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from disputes import blobs, previews
+from disputes.models import DisputeEvent, Upload
+from jobs.queue import task
+
+# Incomplete uploads are deleted after this time.
+UPLOAD_MAX_AGE = timedelta(days=2)
+
+# Events are kept for the clients reconnecting to the event stream.
+EVENT_MAX_AGE = timedelta(days=30)
+
+PURGE_BATCH_SIZE = 1000
+
+
+@task()
+def render_previews(checksum, name, content_type):
+    """Render the thumbnail and the preview of an attachment."""
+    previews.render_file_previews(checksum, name, content_type)
+
+
+@task()
+def collect_blobs(names):
+    """Delete the blobs left without references."""
+    blobs.collect_blobs(names)
+
+
+@task()
+def purge_stale_uploads():
+    """
+    Delete the chunked uploads which were not attached in time.
+
+    The part files are removed after the commit by the signals.
+    """
+    uploads = Upload.objects.filter(
+        created_at__lt=timezone.now() - UPLOAD_MAX_AGE
+    )
+    for upload in uploads.iterator():
+        upload.delete()
+
+
+@task()
+def purge_dispute_events():
+    """
+    Delete the events older than EVENT_MAX_AGE.
+
+    The oldest events have the lowest ids, so every batch is read from
+    the start of the primary key index.
+    """
+    cutoff = timezone.now() - EVENT_MAX_AGE
+    while True:
+        ids = list(
+            DisputeEvent.objects.filter(created_at__lt=cutoff)
+            .order_by('id').values_list('id', flat=True)[:PURGE_BATCH_SIZE]
+        )
+        if not ids:
+            return
+        DisputeEvent.objects.filter(id__in=ids).delete()
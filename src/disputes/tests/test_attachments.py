@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from api.tests.utils import create_dispute, create_user
+from disputes.attachments import atomic_attachments
+from disputes.blobs import collect_blobs
+from disputes.models import Blob, FileDispute
+from disputes.storage import blob_storage, get_blob_name
+
+
+class AtomicAttachmentsTests(TestCase):
+    """The files of a failed block are deleted after the rollback."""
+
+    def setUp(self):
+        """Store the files in an empty directory."""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        media_root = override_settings(MEDIA_ROOT=location)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.dispute = create_dispute(create_user())
+
+    def add_files(self, attachments):
+        """Attach two files to the dispute."""
+        return attachments.add(FileDispute, [
+            ContentFile(b'first', 'first.txt'),
+            ContentFile(b'second', 'second.txt'),
+        ], dispute=self.dispute)
+
+    def test_commit(self):
+        """The files of a successful block are kept."""
+        with atomic_attachments() as attachments:
+            files = self.add_files(attachments)
+        for file in files:
+            self.assertTrue(blob_storage.exists(file.file.name))
+
+    def test_rollback(self):
+        """The rows and the files of a failed block are deleted."""
+        with self.assertRaises(ValueError):
+            with atomic_attachments() as attachments:
+                files = self.add_files(attachments)
+                raise ValueError()
+        self.assertFalse(FileDispute.objects.exists())
+        for file in files:
+            self.assertFalse(blob_storage.exists(file.file.name))
+
+    def test_outer_transaction(self):
+        """The block cannot run inside another transaction."""
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            with atomic_attachments():
+                pass
+
+
+class BlobTests(TestCase):
+    """The same content is stored once and counted by its files."""
+
+    def setUp(self):
+        """Store the files in an empty directory."""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        media_root = override_settings(MEDIA_ROOT=location)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def add_file(self, filename):
+        """Attach a file with the same content to a new dispute."""
+        dispute = create_dispute(create_user())
+        with atomic_attachments() as attachments:
+            [file] = attachments.add(
+                FileDispute, [ContentFile(b'content', filename)],
+                dispute=dispute,
+            )
+        return file
+
+    def test_dedup(self):
+        """The files of other disputes and names share the blob."""
+        first = self.add_file('claim.txt')
+        second = self.add_file('copy.pdf')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.file.name, get_blob_name(first.checksum))
+        self.assertEqual(Blob.objects.get().references, 2)
+        self.assertEqual(second.original_name, 'copy.pdf')
+
+    def test_delete(self):
+        """The blob is deleted with the last file referencing it."""
+        first = self.add_file('claim.txt')
+        second = self.add_file('copy.txt')
+        name = first.file.name
+        first.delete()
+        collect_blobs([name])
+        self.assertEqual(Blob.objects.get().references, 1)
+        self.assertTrue(blob_storage.exists(name))
+        second.delete()
+        collect_blobs([name])
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(blob_storage.exists(name))
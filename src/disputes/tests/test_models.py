@@ -0,0 +1,41 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase
+
+from disputes.models import get_original_name
+
+
+class OriginalNameTests(SimpleTestCase):
+    """The original names derived from the names in the storage."""
+
+    def setUp(self):
+        """Create an empty storage."""
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = FileSystemStorage(location=self.location)
+
+    def test_name_with_suffix(self):
+        """The suffix added to avoid an existing name is stripped."""
+        first = self.storage.save('uploads/hot_dog.jpg', ContentFile(b'1'))
+        second = self.storage.save('uploads/hot_dog.jpg', ContentFile(b'2'))
+        self.assertNotEqual(first, second)
+        self.assertEqual(
+            get_original_name(second, self.storage), 'hot_dog.jpg'
+        )
+
+    def test_name_like_suffix(self):
+        """A real part of the name which looks like a suffix is kept."""
+        name = self.storage.save('uploads/tax_receipt.pdf', ContentFile(b'1'))
+        self.assertEqual(
+            get_original_name(name, self.storage), 'tax_receipt.pdf'
+        )
+
+    def test_without_storage(self):
+        """Without the storage the name is not guessed."""
+        self.assertEqual(
+            get_original_name('uploads/hot_dog_KXxIrPe.jpg'),
+            'hot_dog_KXxIrPe.jpg',
+        )
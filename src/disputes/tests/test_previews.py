@@ -0,0 +1,107 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from api.tests.utils import create_dispute, create_user
+from disputes import previews
+from disputes.models import FileDispute
+from disputes.storage import blob_storage
+from jobs.models import Job
+from jobs.queue import claim_job, run_job
+
+
+def get_image_content():
+    """Return the content of a small PNG image."""
+    content = io.BytesIO()
+    Image.new('RGB', (640, 480), 'red').save(content, 'PNG')
+    return content.getvalue()
+
+
+class PreviewTests(TestCase):
+    """The previews are rendered by one job per content."""
+
+    def setUp(self):
+        """Store the files in an empty directory."""
+        cache.clear()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        media_root = override_settings(MEDIA_ROOT=location)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.dispute = create_dispute(create_user())
+
+    def add_file(self, content, filename='photo.png'):
+        """Attach the content to the dispute and commit it."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return FileDispute.objects.create(
+                dispute=self.dispute, file=ContentFile(content, filename)
+            )
+
+    def get_jobs(self):
+        """Return the keys of the queued preview jobs."""
+        return list(
+            Job.objects.filter(name='disputes.render_previews')
+            .values_list('key', flat=True)
+        )
+
+    def run_jobs(self):
+        """Run the due jobs."""
+        job = claim_job()
+        while job is not None:
+            run_job(job)
+            job = claim_job()
+
+    def test_one_job(self):
+        """The same content is queued once until its job has run."""
+        content = get_image_content()
+        file = self.add_file(content)
+        self.add_file(content, 'copy.png')
+        previews.schedule_previews([file])
+        self.assertEqual(
+            self.get_jobs(), [previews.get_job_key(file.checksum)]
+        )
+
+        self.run_jobs()
+        self.assertEqual(self.get_jobs(), [])
+        for size in previews.PREVIEW_SIZES:
+            name = previews.get_preview_name(file.checksum, size)
+            self.assertTrue(blob_storage.exists(name))
+        previews.schedule_previews([file])
+        self.assertEqual(self.get_jobs(), [])
+
+    def test_waiting_job(self):
+        """A job waiting longer than a lease is not queued twice."""
+        file = self.add_file(get_image_content())
+        Job.objects.update(run_at=timezone.now() + timedelta(
+            seconds=2 * settings.JOB_LEASE_SECONDS
+        ))
+        cache.clear()
+        previews.schedule_previews([file])
+        self.assertEqual(len(self.get_jobs()), 1)
+
+    def test_not_previewable(self):
+        """A file of another type gets no job."""
+        self.add_file(b'text', 'notes.txt')
+        self.assertEqual(self.get_jobs(), [])
+
+    def test_failure(self):
+        """A content which cannot be rendered is not queued again."""
+        file = self.add_file(b'not an image')
+        self.assertFalse(previews.has_failed(file.checksum))
+        self.run_jobs()
+        self.assertTrue(previews.has_failed(file.checksum))
+        self.assertFalse(Job.objects.exists())
+        previews.schedule_previews([file])
+        self.assertEqual(self.get_jobs(), [])
+
+        cache.delete(previews.get_failure_key(file.checksum))
+        previews.schedule_previews([file])
+        self.assertEqual(len(self.get_jobs()), 1)
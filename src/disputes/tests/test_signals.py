@@ -0,0 +1,159 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from api.tests.utils import TEXT, create_dispute, create_user
+from disputes import search
+from disputes.models import (
+    Comment,
+    Dispute,
+    DisputeEvent,
+    DisputeParticipant,
+)
+
+
+class SearchDocumentTests(TestCase):
+    """The search documents follow the deleted comments."""
+
+    def setUp(self):
+        """Create a dispute commented by another user."""
+        self.dispute = create_dispute(create_user())
+        self.commenter = create_user()
+
+    def comment(self, dispute, content):
+        """Add a comment of the other user."""
+        return Comment.objects.create(
+            dispute=dispute, sender=self.commenter, content=content
+        )
+
+    def find(self, word):
+        """Return the ids of the disputes matching the word."""
+        return [
+            dispute.pk
+            for dispute in search.search_disputes(Dispute.objects, word)
+        ]
+
+    def test_user_deletion(self):
+        """The comments of a deleted user leave the documents."""
+        self.comment(self.dispute, f'{TEXT} Перевозчик')
+        self.assertEqual(self.find('Перевозчик'), [self.dispute.pk])
+        self.commenter.delete()
+        self.assertEqual(self.find('Перевозчик'), [])
+
+    def test_batched_rebuild(self):
+        """The documents are rebuilt once for a deletion of comments."""
+        other = create_dispute(create_user())
+        for dispute in (self.dispute, self.dispute, other):
+            self.comment(dispute, TEXT)
+        with mock.patch.object(
+            search, 'rebuild_dispute_documents'
+        ) as rebuild:
+            Comment.objects.all().delete()
+        rebuild.assert_called_once_with(
+            sorted([self.dispute.pk, other.pk])
+        )
+
+    def test_dispute_deletion(self):
+        """The comments of a deleted dispute are not reindexed."""
+        self.comment(self.dispute, TEXT)
+        with mock.patch.object(
+            search, 'rebuild_dispute_documents'
+        ) as rebuild:
+            self.dispute.delete()
+        rebuild.assert_not_called()
+
+
+class ParticipantIndexTests(TestCase):
+    """The participant index follows the opponents and 'add_opponent'."""
+
+    def setUp(self):
+        """Create a dispute with two opponents."""
+        self.creator = create_user()
+        self.opponent, self.other = create_user(), create_user()
+        self.dispute = create_dispute(
+            self.creator, [self.opponent, self.other]
+        )
+
+    def get_index(self):
+        """Return the roles and visibility of the users in the index."""
+        return {
+            user_id: (role, is_visible)
+            for user_id, role, is_visible in DisputeParticipant.objects
+            .filter(dispute=self.dispute)
+            .values_list('user_id', 'role', 'is_visible')
+        }
+
+    def assertVisible(self, user, visible):
+        """Assert whether the dispute is visible to the user."""
+        self.assertEqual(
+            Dispute.objects.visible_to(user).filter(
+                pk=self.dispute.pk
+            ).exists(),
+            visible,
+        )
+
+    def test_add_opponent(self):
+        """The opponents are hidden and shown with 'add_opponent'."""
+        creator = (DisputeParticipant.CREATOR, True)
+        for add_opponent in (False, True):
+            with self.subTest(add_opponent=add_opponent):
+                self.dispute.add_opponent = add_opponent
+                self.dispute.save()
+                opponent = (DisputeParticipant.OPPONENT, add_opponent)
+                self.assertEqual(self.get_index(), {
+                    self.creator.pk: creator,
+                    self.opponent.pk: opponent,
+                    self.other.pk: opponent,
+                })
+                self.assertVisible(self.creator, True)
+                self.assertVisible(self.opponent, add_opponent)
+
+    def test_new_opponent_hidden(self):
+        """An opponent added to a hidden dispute stays hidden."""
+        self.dispute.add_opponent = False
+        self.dispute.save()
+        newcomer = create_user()
+        newcomer.disputes_opponent.add(self.dispute)
+        self.assertEqual(
+            self.get_index()[newcomer.pk],
+            (DisputeParticipant.OPPONENT, False),
+        )
+        self.assertVisible(newcomer, False)
+
+    def test_remove_opponent(self):
+        """A removed opponent leaves the index and loses the access."""
+        self.dispute.opponent.remove(self.opponent)
+        self.assertNotIn(self.opponent.pk, self.get_index())
+        self.assertIn(self.other.pk, self.get_index())
+        self.assertVisible(self.opponent, False)
+
+        self.other.disputes_opponent.clear()
+        self.assertEqual(list(self.get_index()), [self.creator.pk])
+        self.assertVisible(self.other, False)
+
+
+class DeferredFieldsTests(TestCase):
+    """The deferred fields of a dispute are not reported as changed."""
+
+    def test_status_event(self):
+        """A save of a partly loaded dispute adds no status event."""
+        dispute = create_dispute(create_user())
+        dispute = Dispute.objects.only('id', 'add_opponent').get(
+            pk=dispute.pk
+        )
+        dispute.add_opponent = False
+        dispute.save()
+        self.assertFalse(dispute.is_changed('status'))
+        self.assertFalse(DisputeEvent.objects.filter(
+            kind=DisputeEvent.STATUS_CHANGED
+        ).exists())
+
+    def test_changed_deferred_field(self):
+        """A deferred field set before the save is changed."""
+        dispute = create_dispute(create_user())
+        dispute = Dispute.objects.only('id').get(pk=dispute.pk)
+        dispute.status = Dispute.STARTED
+        dispute.save()
+        self.assertEqual(DisputeEvent.objects.filter(
+            kind=DisputeEvent.STATUS_CHANGED
+        ).count(), 1)
@@ -0,0 +1,227 @@
+import hashlib
+import mimetypes
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from disputes.models import Upload
+
+# Bytes read from the request and written to the part file at once.
+BLOCK_SIZE = 64 * 1024
+
+DOCX = (
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+)
+
+# The bytes every file of an allowed type starts with.
+SIGNATURES = {
+    'application/pdf': (b'%PDF-',),
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+    'image/gif': (b'GIF87a', b'GIF89a'),
+    'application/msword': (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',),
+    DOCX: (b'PK\x03\x04',),
+}
+SIGNATURE_LENGTH = max(
+    len(signature)
+    for signatures in SIGNATURES.values() for signature in signatures
+)
+
+# Checksums of the uploads received by this process, so the bytes
+# are hashed once while the parts arrive at the same process.
+RUNNING_CHECKSUMS = {}
+MAX_RUNNING_CHECKSUMS = 1000
+
+
+class UploadError(Exception):
+    """The part of an upload was rejected."""
+
+    OFFSET = 'offset'
+    BUSY = 'busy'
+    SIZE = 'size'
+    TYPE = 'type'
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def get_allowed_content_type(filename):
+    """Return the content type of the file name if it is allowed."""
+    content_type = mimetypes.guess_type(filename)[0]
+    return content_type if content_type in SIGNATURES else None
+
+
+def get_part_path(upload):
+    """Return the path of the file the upload is received into."""
+    return os.path.join(settings.UPLOAD_CHUNK_DIR, f'{upload.pk}.part')
+
+
+def remove_part(path):
+    """Delete the part file of an upload if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_running_checksum(upload):
+    """
+    Return the checksum of the bytes of the upload received so far.
+
+    If the previous part was received by another process the bytes
+    are read back from the part file once.
+    """
+    offset, checksum = RUNNING_CHECKSUMS.pop(upload.pk, (None, None))
+    if offset == upload.offset:
+        return checksum
+    checksum = hashlib.sha256()
+    if upload.offset:
+        with open(get_part_path(upload), 'rb') as part:
+            remaining = upload.offset
+            while remaining:
+                block = part.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                checksum.update(block)
+                remaining -= len(block)
+    return checksum
+
+
+def remember_checksum(upload, checksum):
+    """Keep the checksum of the upload for its next part."""
+    if len(RUNNING_CHECKSUMS) >= MAX_RUNNING_CHECKSUMS:
+        del RUNNING_CHECKSUMS[next(iter(RUNNING_CHECKSUMS))]
+    RUNNING_CHECKSUMS[upload.pk] = (upload.offset, checksum)
+
+
+def read_head(stream, length):
+    """Read up to length bytes from the stream."""
+    head = b''
+    while len(head) < length:
+        block = stream.read(length - len(head))
+        if not block:
+            break
+        head += block
+    return head
+
+
+def claim_upload(upload, start):
+    """
+    Take the lease of the upload for a part starting at start.
+
+    The lease is taken by one UPDATE without holding a lock, so the
+    part is read from the network outside of any transaction. The
+    fields of the upload are refreshed if it cannot be claimed.
+
+    Raises UploadError if the upload continues at another offset or
+    another part is being received.
+    """
+    now = timezone.now()
+    lease_end = now + timedelta(seconds=settings.UPLOAD_PART_LEASE_SECONDS)
+    claimed = Upload.objects.filter(
+        Q(receiving_until__isnull=True) | Q(receiving_until__lt=now),
+        pk=upload.pk,
+        offset=start,
+    ).update(receiving_until=lease_end)
+    if not claimed:
+        upload.refresh_from_db(fields=['offset', 'receiving_until'])
+        if upload.offset != start:
+            raise UploadError(
+                UploadError.OFFSET,
+                f'The upload continues at {upload.offset}.',
+            )
+        raise UploadError(
+            UploadError.BUSY, 'Another part of the upload is being received.'
+        )
+    upload.receiving_until = lease_end
+
+
+def save_progress(upload, lease_end):
+    """
+    Save the offset and the checksum and release the lease.
+
+    The row is updated in its own statement, so the progress is kept
+    even if the part was interrupted. If the lease has ended and the
+    upload was claimed by another part in the meantime, that part
+    owns the offset and nothing is saved.
+    """
+    Upload.objects.filter(
+        pk=upload.pk, receiving_until=lease_end
+    ).update(
+        offset=upload.offset,
+        checksum=upload.checksum,
+        receiving_until=None,
+    )
+    upload.receiving_until = None
+
+
+def receive_part(upload, stream, start, length):
+    """
+    Append the next part of the upload read from the stream.
+
+    The part has to start at the offset of the upload and fit into
+    its size, otherwise it is rejected before anything is read. The
+    upload is claimed for the part (see claim_upload()), so it must
+    not be called in a transaction holding a lock on the upload. The
+    first bytes of the file have to match its type, so a disguised
+    file is rejected before the rest of it is received. The bytes are
+    written to the part file as they arrive while the checksum is
+    updated. If the client disconnects the bytes received so far are
+    kept, and the upload is resumed from its new offset.
+
+    Raises UploadError if the part is rejected.
+    """
+    if start + length > upload.size:
+        raise UploadError(
+            UploadError.SIZE, 'The part does not fit into the file size.'
+        )
+    claim_upload(upload, start)
+    lease_end = upload.receiving_until
+    try:
+        os.makedirs(settings.UPLOAD_CHUNK_DIR, exist_ok=True)
+        path = get_part_path(upload)
+        checksum = get_running_checksum(upload)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+            # Drop the bytes of a part whose offset was not saved.
+            part.truncate(upload.offset)
+            part.seek(upload.offset)
+            receive_bytes(upload, stream, length, part, checksum)
+    finally:
+        save_progress(upload, lease_end)
+
+
+def receive_bytes(upload, stream, length, part, checksum):
+    """Write the bytes of the part to the file advancing the offset."""
+    remaining = length
+    if upload.offset == 0:
+        head = read_head(stream, min(SIGNATURE_LENGTH, remaining))
+        if len(head) < min(SIGNATURE_LENGTH, remaining):
+            return
+        if not head.startswith(SIGNATURES[upload.content_type]):
+            raise UploadError(
+                UploadError.TYPE,
+                'The content does not match the type of the file.',
+            )
+        block = head
+    else:
+        block = stream.read(min(BLOCK_SIZE, remaining))
+    try:
+        while block:
+            part.write(block)
+            checksum.update(block)
+            upload.offset += len(block)
+            remaining -= len(block)
+            if not remaining:
+                break
+            block = stream.read(min(BLOCK_SIZE, remaining))
+    finally:
+        part.flush()
+        if upload.is_complete:
+            upload.checksum = checksum.hexdigest()
+        else:
+            remember_checksum(upload, checksum)
@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    """
+    A class that displays the interface of the Job in the admin panel.
+
+    Contains a list_display, search_fields, list_filter.
+    """
+
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at']
+    search_fields = ['name']
+    list_filter = ['status', 'name']
+
+
+admin.site.register(Job, JobAdmin)
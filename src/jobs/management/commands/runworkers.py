@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import schedule_periodic_jobs, work
+from jobs.worker import run_worker
+
+# Seconds between the checks of the worker processes.
+SUPERVISE_INTERVAL = 1
+
+# Seconds between the checks of the periodic jobs.
+SCHEDULE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    """
+    Run the workers of the background job queue.
+
+    Starts the worker processes, which claim the due jobs from the
+    jobs table (see jobs.queue), restarts a worker which exited and
+    keeps the periodic jobs of JOB_SCHEDULE queued. SIGTERM or SIGINT
+    lets the workers finish their current job and stops them. Any
+    number of these commands may run against the same database.
+    """
+
+    help = 'Run the background job workers.'
+
+    def add_arguments(self, parser):
+        """Add the workers, poll interval and burst arguments."""
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.JOB_WORKERS,
+            help='Number of worker processes.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help='Seconds between the checks of an empty queue.',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Run the due jobs in this process and exit.',
+        )
+
+    def handle(self, *args, **options):
+        """Supervise the worker processes until a stop signal."""
+        if options['burst']:
+            work(threading.Event(), options['poll_interval'], burst=True)
+            return
+        context = multiprocessing.get_context('spawn')
+        stop = context.Event()
+        # Only recorded by the handler: setting the Event there could
+        # deadlock on its lock, which the interrupted code may hold.
+        signals = []
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(
+                signal_number, lambda number, frame: signals.append(number)
+            )
+        workers = [None] * options['workers']
+        scheduled_at = None
+        while not signals:
+            if (
+                scheduled_at is None
+                or time.monotonic() - scheduled_at >= SCHEDULE_INTERVAL
+            ):
+                schedule_periodic_jobs()
+                # The connection is not needed between the checks.
+                connections.close_all()
+                scheduled_at = time.monotonic()
+            for index, process in enumerate(workers):
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    self.stderr.write(
+                        f'Worker {index} exited with {process.exitcode}, '
+                        'restarting.'
+                    )
+                workers[index] = process = context.Process(
+                    target=run_worker,
+                    args=(stop, os.getpid(), options['poll_interval']),
+                    daemon=False,
+                )
+                process.start()
+            time.sleep(SUPERVISE_INTERVAL)
+        self.stdout.write('Stopping the workers.')
+        stop.set()
+        for process in workers:
+            if process is not None:
+                process.join()
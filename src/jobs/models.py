@@ -0,0 +1,89 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Job of the background queue run by 'manage.py runworkers'.
+
+    A queued job is due at 'run_at'. A worker claims it by moving it
+    to running and 'run_at' to the end of its lease, so the job of a
+    worker which died is claimed again once the lease is over (see
+    jobs.queue). A done job is deleted, or queued again after
+    'interval' seconds if it is periodic, and a job which failed
+    'max_attempts' times is kept as failed.
+    """
+
+    MAX_LENGTH_NAME = 100
+    MAX_LENGTH_STATUS = 10
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+
+    JOB_STATUS = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(
+        max_length=MAX_LENGTH_NAME,
+        verbose_name='Задача',
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name='Аргументы',
+    )
+    key = models.CharField(
+        max_length=MAX_LENGTH_NAME,
+        unique=True,
+        blank=True,
+        null=True,
+        verbose_name='Ключ',
+    )
+    status = models.CharField(
+        max_length=MAX_LENGTH_STATUS,
+        choices=JOB_STATUS,
+        default=QUEUED,
+        verbose_name='Статус',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Количество попыток',
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name='Максимум попыток',
+    )
+    interval = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Интервал повторения в секундах',
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Время запуска',
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания',
+    )
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['run_at'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='job_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
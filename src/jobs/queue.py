@@ -0,0 +1,204 @@
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+
+# Tasks by name, registered with @task in the 'tasks' modules.
+TASKS = {}
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Seconds before the first retry, doubled with every next attempt.
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+
+
+def task(name=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Register the function as a task of the background jobs.
+
+    The task is enqueued by its name, 'app.function' by default, and
+    called with the keyword arguments of the job, so they have to be
+    JSON serializable and cannot be named 'delay' or 'key'. A task
+    raising an exception is retried up to max_attempts times in total.
+    """
+    def register(function):
+        task_name = name or (
+            f'{function.__module__.split(".")[0]}.{function.__name__}'
+        )
+        function.max_attempts = max_attempts
+        TASKS[task_name] = function
+        return function
+    return register
+
+
+def create_job(name, /, delay=0, key=None, interval=None, **payload):
+    """Build a job of the registered task."""
+    if name not in TASKS:
+        raise LookupError(f'Unknown task "{name}".')
+    return Job(
+        name=name,
+        payload=payload,
+        key=key,
+        interval=interval,
+        max_attempts=TASKS[name].max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue(name, /, delay=0, key=None, **payload):
+    """
+    Add a job of the task to the queue, due after delay seconds.
+
+    The job is inserted in the current transaction, so it is run only
+    if the transaction commits. A job with a key is not added while
+    another job with the same key is waiting.
+    """
+    job = create_job(name, delay=delay, key=key, **payload)
+    if key is None:
+        job.save()
+    else:
+        Job.objects.bulk_create([job], ignore_conflicts=True)
+
+
+def enqueue_on_commit(name, /, delay=0, key=None, **payload):
+    """Add a job like enqueue() once the current transaction commits."""
+    # Checked now, so a wrong name fails in the code which enqueues.
+    create_job(name, **payload)
+    transaction.on_commit(
+        lambda: enqueue(name, delay=delay, key=key, **payload)
+    )
+
+
+def schedule_periodic_jobs():
+    """
+    Add the missing jobs of JOB_SCHEDULE.
+
+    Every periodic task has one job keyed by its name, which is queued
+    again after every run, so any number of supervisors may call this.
+    """
+    Job.objects.bulk_create(
+        [
+            create_job(name, key=f'periodic:{name}', interval=interval)
+            for name, interval in settings.JOB_SCHEDULE.items()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def get_backoff(attempts):
+    """Return the seconds before the next attempt, with jitter."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim_job():
+    """
+    Claim the next due job or return None.
+
+    The due jobs are locked with SKIP LOCKED, so concurrent workers
+    claim different jobs without waiting for each other. The claim
+    is an update conditional on the state read, which also keeps two
+    workers from claiming one job where rows are not locked.
+
+    A due job which has used up its attempts lost its last worker
+    before recording a result, e.g. the task ran out of memory and
+    the worker was killed. It is marked as failed instead of being
+    claimed again at the end of every lease.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        while True:
+            job = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(status__in=(Job.QUEUED, Job.RUNNING), run_at__lte=now)
+                .order_by('run_at')
+                .first()
+            )
+            if job is None:
+                return None
+            state = Job.objects.filter(
+                pk=job.pk, status=job.status, run_at=job.run_at
+            )
+            if job.attempts < job.max_attempts:
+                break
+            # The key is freed, so a periodic job is added again.
+            state.update(status=Job.FAILED, key=None, last_error=(
+                f'The worker was lost during all {job.attempts} attempts.'
+            ))
+        lease_end = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        claimed = state.update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            run_at=lease_end,
+        )
+    if not claimed:
+        return None
+    job.status = Job.RUNNING
+    job.attempts += 1
+    job.run_at = lease_end
+    return job
+
+
+def run_job(job):
+    """
+    Run the claimed job and record the result.
+
+    The updates are conditional on the attempt, so a job claimed
+    again after its lease ended is left to the newer attempt.
+    """
+    claim = Job.objects.filter(pk=job.pk, attempts=job.attempts)
+    function = TASKS.get(job.name)
+    try:
+        if function is None:
+            raise LookupError(f'Unknown task "{job.name}".')
+        function(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if function is None or job.attempts >= job.max_attempts:
+            # The key is freed, so a periodic job is added again.
+            claim.update(status=Job.FAILED, key=None, last_error=error)
+        else:
+            claim.update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(
+                    seconds=get_backoff(job.attempts)
+                ),
+                last_error=error,
+            )
+        return False
+    if job.interval:
+        claim.update(
+            status=Job.QUEUED,
+            attempts=0,
+            run_at=timezone.now() + timedelta(seconds=job.interval),
+            last_error='',
+        )
+    else:
+        claim.delete()
+    return True
+
+
+def work(stop, poll_interval, burst=False):
+    """
+    Run the due jobs one by one until stop is set.
+
+    stop is an Event-like object, it is waited on for poll_interval
+    seconds while the queue is empty. In burst mode the worker returns
+    once there are no due jobs.
+    """
+    while not stop.is_set():
+        close_old_connections()
+        job = claim_job()
+        if job is None:
+            if burst:
+                return
+            stop.wait(poll_interval)
+            continue
+        run_job(job)
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim_job, create_job
+
+TASK = 'users.purge_expired_tokens'
+
+
+class ClaimJobTests(TestCase):
+    """The jobs whose workers were lost are claimed again up to a cap."""
+
+    def setUp(self):
+        """Read the attempts of the task."""
+        self.max_attempts = create_job(TASK).max_attempts
+
+    def create_job(self, **fields):
+        """Save a due job of the task with the fields."""
+        job = create_job(TASK, key=f'test:{Job.objects.count()}')
+        job.run_at = timezone.now() - timedelta(seconds=1)
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.save()
+        return job
+
+    def test_lost_job(self):
+        """A job with an ended lease is claimed again."""
+        job = self.create_job(status=Job.RUNNING, attempts=1)
+        claimed = claim_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_attempts_used_up(self):
+        """A lost job with no attempts left fails instead of running."""
+        job = self.create_job(status=Job.RUNNING, attempts=self.max_attempts)
+        self.assertIsNone(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(job.key)
+        self.assertTrue(job.last_error)
+
+    def test_next_job_claimed(self):
+        """The next due job is claimed after a failed one."""
+        self.create_job(status=Job.RUNNING, attempts=self.max_attempts)
+        job = self.create_job()
+        self.assertEqual(claim_job().pk, job.pk)
@@ -0,0 +1,40 @@
+import os
+import signal
+
+import django
+
+
+class SupervisedStop:
+    """
+    Stop event of a worker process, also set when the supervisor is gone.
+
+    Wraps the multiprocessing Event set by the supervisor, so a worker
+    left behind by a killed supervisor does not run forever.
+    """
+
+    def __init__(self, event, supervisor_pid):
+        self.event = event
+        self.supervisor_pid = supervisor_pid
+
+    def is_set(self):
+        """Check whether the worker has to stop."""
+        return self.event.is_set() or os.getppid() != self.supervisor_pid
+
+    def wait(self, timeout):
+        """Wait for the stop at most timeout seconds."""
+        return self.event.wait(timeout)
+
+
+def run_worker(event, supervisor_pid, poll_interval):
+    """
+    Run the jobs in a worker process started by 'runworkers'.
+
+    The process is spawned, so Django is set up here. The signals
+    are left to the supervisor, which stops the workers after their
+    current job.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    django.setup()
+    from jobs.queue import work
+    work(SupervisedStop(event, supervisor_pid), poll_interval)
@@ -5,7 +5,7 @@ from django.contrib.auth.forms import ReadOnlyPasswordHashField
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
 
-from users.models import CustomUser
+from users.models import AuthToken, CustomUser
 
 
 class UserCreationForm(forms.ModelForm):
@@ -85,5 +85,15 @@ class UserAdmin(BaseUserAdmin):
     filter_horizontal = []
 
 
+class AuthTokenAdmin(admin.ModelAdmin):
+    """Admin of the API tokens."""
+
+    list_display = ['key', 'user', 'created', 'expires_at']
+    search_fields = ['user__email']
+    raw_id_fields = ['user']
+    ordering = ['-created']
+
+
 admin.site.register(CustomUser, UserAdmin)
+admin.site.register(AuthToken, AuthTokenAdmin)
 admin.site.unregister(Group)
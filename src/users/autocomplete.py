@@ -0,0 +1,142 @@
+import threading
+from bisect import bisect_left
+
+from config.db_router import PRIMARY
+from users.models import CustomUser
+from users.versions import get_directory_version
+
+# The fields of the users the snapshot is made of.
+DIRECTORY_FIELDS = ('first_name', 'last_name', 'email', 'role', 'is_active')
+
+_lock = threading.Lock()
+_index = None
+
+
+def normalize(text):
+    """Bring the text to the form used by the index."""
+    return text.casefold().replace('ё', 'е')
+
+
+class UserPrefixIndex:
+    """
+    Prefix index over a compact snapshot of the users to pick from.
+
+    The users are indexed by the last name, the first name and the
+    email, every field in its own sorted list of (token, id) pairs.
+    The users whose field starts with a prefix are found with a
+    binary search instead of a LIKE '%...%' scan of the user table,
+    and since the lists are sorted the matches come out already
+    ranked, so the search stops as soon as enough users are found.
+    """
+
+    FIELDS = ('last_name', 'first_name', 'email')
+
+    def __init__(self, users, version):
+        """
+        Initialize the UserPrefixIndex.
+
+        Args:
+            users: Iterable of (id, first_name, last_name, email, role).
+            version: The version of the users the snapshot was made of.
+        """
+        self.version = version
+        self.cards = {}
+        self.tokens = {}
+        for user_id, first_name, last_name, email, role in users:
+            card = {
+                'id': user_id,
+                'first_name': first_name,
+                'last_name': last_name,
+                'email': email,
+                'role': role,
+            }
+            self.cards[user_id] = card
+            self.tokens[user_id] = tuple(
+                normalize(card[field]) for field in self.FIELDS
+            )
+        self.keys = [
+            sorted(
+                (tokens[position], user_id)
+                for user_id, tokens in self.tokens.items()
+                if tokens[position]
+            )
+            for position in range(len(self.FIELDS))
+        ]
+
+    def iter_prefix(self, keys, prefix):
+        """Yield the (token, id) pairs of keys starting with prefix."""
+        position = bisect_left(keys, (prefix,))
+        while position < len(keys):
+            token, user_id = keys[position]
+            if not token.startswith(prefix):
+                return
+            yield token, user_id
+            position += 1
+
+    def matches(self, user_id, terms):
+        """Return whether every term is a prefix of a user field."""
+        tokens = self.tokens[user_id]
+        return all(
+            any(token.startswith(term) for token in tokens)
+            for term in terms
+        )
+
+    def search(self, query, limit, exclude=()):
+        """
+        Return at most limit user cards matching the query.
+
+        Every word of the query has to be a prefix of the last name,
+        the first name or the email of the user. Exact matches of the
+        first word come first, then the matches by the last name, the
+        first name and the email, each in the alphabetical order.
+        """
+        terms = normalize(query).split()
+        if not terms or limit <= 0:
+            return []
+        first, rest = terms[0], terms[1:]
+        seen = set(exclude)
+        found = []
+        for exact in (True, False):
+            for keys in self.keys:
+                for token, user_id in self.iter_prefix(keys, first):
+                    if exact and token != first:
+                        break
+                    if user_id in seen or not self.matches(user_id, rest):
+                        continue
+                    seen.add(user_id)
+                    found.append(self.cards[user_id])
+                    if len(found) == limit:
+                        return found
+        return found
+
+
+def get_index():
+    """
+    Return the prefix index of the current users.
+
+    The snapshot holds the users who can be opponents of a dispute,
+    the active users who are not mediators (see OpponentField). It is
+    tagged with the version of the autocomplete fields kept in the
+    shared cache, so every process rebuilds it once after a user was
+    added, deleted or renamed, but not after other changes. The
+    version is bumped once the change is committed, so the snapshot is
+    read from the primary: a lagging replica would keep the old users
+    under the new version until the next change.
+    """
+    global _index
+    version = get_directory_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        if _index is None or _index.version != version:
+            users = CustomUser.objects.using(PRIMARY).filter(
+                is_active=True
+            ).exclude(role=CustomUser.MEDIATOR)
+            _index = UserPrefixIndex(
+                users.values_list(
+                    'id', 'first_name', 'last_name', 'email', 'role'
+                ).order_by().iterator(),
+                version,
+            )
+        return _index
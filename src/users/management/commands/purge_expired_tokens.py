@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from users.models import TOKEN_PURGE_BATCH_SIZE, AuthToken
+
+
+class Command(BaseCommand):
+    """
+    Delete the API tokens which have expired.
+
+    Does at once what the periodic job of the same name (see
+    users.tasks) does on schedule.
+    """
+
+    help = 'Delete expired API tokens.'
+
+    def add_arguments(self, parser):
+        """Add the batch size argument."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TOKEN_PURGE_BATCH_SIZE,
+            help='Number of tokens deleted at a time.',
+        )
+
+    def handle(self, *args, **options):
+        """Delete the expired tokens batch by batch."""
+        deleted = AuthToken.objects.purge_expired(options['batch_size'])
+        self.stdout.write(f'{deleted} expired tokens deleted.')
@@ -0,0 +1,47 @@
+# Generated by Django 4.1 on 2026-10-18 19:07
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def copy_tokens(apps, schema_editor):
+    connection = schema_editor.connection
+    if 'authtoken_token' not in connection.introspection.table_names():
+        return
+    # The copied tokens expire like the ones of a login made now.
+    expires_at = None
+    if settings.TOKEN_TTL_DAYS:
+        expires_at = timezone.now() + timedelta(days=settings.TOKEN_TTL_DAYS)
+    schema_editor.execute(
+        'INSERT INTO users_authtoken (key, user_id, created, expires_at) '
+        'SELECT key, user_id, created, %s FROM authtoken_token',
+        [connection.ops.adapt_datetimefield_value(expires_at)],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_add_phone_number_validator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthToken',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Действует до')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='auth_token', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Токен',
+                'verbose_name_plural': 'Токены',
+            },
+        ),
+        migrations.RunPython(copy_tokens, migrations.RunPython.noop),
+    ]
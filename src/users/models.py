@@ -1,9 +1,14 @@
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 from config.settings import USER_FIELD
 from users.validators import phone_number_validator
@@ -149,6 +154,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     is_superuser = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
 
     objects = CustomUserManager()
 
@@ -177,3 +186,104 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+
+# Expired tokens deleted in one transaction by purge_expired().
+TOKEN_PURGE_BATCH_SIZE = 1000
+
+
+class AuthTokenManager(models.Manager):
+    """Manager of the API tokens aware of their expiry."""
+
+    def expired(self):
+        """Return the tokens which have expired."""
+        return self.filter(expires_at__lte=timezone.now())
+
+    def purge_expired(self, batch_size=TOKEN_PURGE_BATCH_SIZE):
+        """
+        Delete the tokens which have expired and return their number.
+
+        The expired tokens are found by the index on their expiry and
+        deleted in batches, each in its own short transaction, so the
+        token table is never locked for long.
+        """
+        deleted = 0
+        while True:
+            keys = list(
+                self.expired().order_by('expires_at')
+                .values_list('key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            with transaction.atomic():
+                self.filter(key__in=keys).delete()
+            deleted += len(keys)
+
+    def get_or_create(self, defaults=None, **kwargs):
+        """Replace an expired token instead of returning it on login."""
+        self.expired().filter(**kwargs).delete()
+        return super().get_or_create(defaults, **kwargs)
+
+
+class AuthToken(models.Model):
+    """
+    API token of a user.
+
+    Replaces the token model of rest_framework.authtoken to add
+    an optional expiry. When TOKEN_TTL_DAYS is set, the tokens
+    expire that many days after the login.
+    """
+
+    key = models.CharField(
+        verbose_name='Ключ',
+        max_length=40,
+        primary_key=True,
+    )
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='auth_token',
+        verbose_name='Пользователь',
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+    expires_at = models.DateTimeField(
+        verbose_name='Действует до',
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+
+    objects = AuthTokenManager()
+
+    class Meta:
+        verbose_name = 'Токен'
+        verbose_name_plural = 'Токены'
+
+    def __str__(self):
+        return self.key
+
+    def save(self, *args, **kwargs):
+        """Generate the key and the expiry of a new token."""
+        if not self.key:
+            self.key = secrets.token_hex(20)
+        if self._state.adding and self.expires_at is None:
+            self.expires_at = self.get_expiry()
+        return super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_expiry():
+        """Return the expiry of a token created now or None."""
+        if not settings.TOKEN_TTL_DAYS:
+            return None
+        return timezone.now() + timedelta(days=settings.TOKEN_TTL_DAYS)
+
+    @property
+    def is_expired(self):
+        """Check if the token has expired."""
+        return (
+            self.expires_at is not None
+            and self.expires_at <= timezone.now()
+        )
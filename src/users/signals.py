@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.autocomplete import DIRECTORY_FIELDS
+from users.models import CustomUser
+from users.versions import bump_user_version
+
+
+def bump_on_commit(user_id, using, directory=True):
+    """Bump the version of the user once the transaction is committed."""
+    transaction.on_commit(
+        lambda: bump_user_version(user_id, directory), using=using
+    )
+
+
+@receiver(pre_save, sender=CustomUser)
+def check_directory_fields(sender, instance, using, update_fields=None,
+                           **kwargs):
+    """Remember whether the fields of the autocomplete change."""
+    if instance._state.adding:
+        instance._directory_changed = True
+    elif update_fields is not None and not (
+        set(update_fields) & set(DIRECTORY_FIELDS)
+    ):
+        instance._directory_changed = False
+    else:
+        saved = CustomUser.objects.using(using).filter(
+            pk=instance.pk
+        ).values_list(*DIRECTORY_FIELDS).first()
+        instance._directory_changed = saved != tuple(
+            getattr(instance, field) for field in DIRECTORY_FIELDS
+        )
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_version_on_save(sender, instance, using, update_fields=None,
+                         **kwargs):
+    """Change the version of the user unless only last_login changed."""
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_on_commit(
+            instance.pk, using,
+            directory=getattr(instance, '_directory_changed', True),
+        )
+
+
+@receiver(post_delete, sender=CustomUser)
+def bump_version_on_delete(sender, instance, using, **kwargs):
+    """Change the version of the user after the user was deleted."""
+    bump_on_commit(instance.pk, using)
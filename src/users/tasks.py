@@ -0,0 +1,8 @@
+from jobs.queue import task
+from users.models import AuthToken
+
+
+@task()
+def purge_expired_tokens():
+    """Delete the API tokens which have expired."""
+    AuthToken.objects.purge_expired()
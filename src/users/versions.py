@@ -0,0 +1,66 @@
+import time
+
+from django.core.cache import cache
+
+DIRECTORY_VERSION_KEY = 'users:directory:version'
+
+
+def get_version(key):
+    """
+    Return the version kept in the shared cache under the key.
+
+    A version is the time of the last change it tracks. When it is
+    missing it is set to the current time, which invalidates the data
+    built under it once.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_directory_version():
+    """Return the time of the last change of the autocomplete fields."""
+    return get_version(DIRECTORY_VERSION_KEY)
+
+
+def get_user_version_key(user_id):
+    """Return the cache key of the version of a user."""
+    return f'user:version:{user_id}'
+
+
+def get_user_versions(user_ids):
+    """
+    Return the versions of the users as a dict by id.
+
+    The version of a user is the time of the last change of the user,
+    so the data built from some users is keyed by their versions only
+    and outlives the changes of the other users. The versions are read
+    with one get_many(), the missing ones are set like in get_version().
+    """
+    keys = {user_id: get_user_version_key(user_id) for user_id in user_ids}
+    versions = cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in versions]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, None)
+        added = cache.get_many(missing)
+        versions.update({key: added.get(key, now) for key in missing})
+    return {user_id: versions[key] for user_id, key in keys.items()}
+
+
+def bump_user_version(user_id, directory=True):
+    """
+    Mark the user data as changed.
+
+    Called once the change is committed, so a request reading the
+    user in the meantime does not store the old data under the new
+    version. 'directory' also marks the autocomplete fields changed.
+    """
+    now = time.time()
+    versions = {get_user_version_key(user_id): now}
+    if directory:
+        versions[DIRECTORY_VERSION_KEY] = now
+    cache.set_many(versions, None)